@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import uuid
+import math
+import atexit
+import tempfile
+import threading
+try:
+    import fcntl
+except ImportError:
+    #Windows
+    fcntl = None
+    import msvcrt
+
+#Counters and histograms for the REST service, served in the Prometheus text format
+#When the service runs in several processes, each process writes its own metrics to a file in a shared directory, and whichever
+#process serves /metrics adds up the files of every process. Counters only go up, so the metrics of processes that have exited are
+#still counted: they're added up into one merged file, and their own files removed
+
+#Latency buckets, in seconds
+REQUEST_LATENCY_BUCKETS_SEC = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+#Extension of each process's metrics file in the shared directory
+METRICS_FILE_EXTENSION = ".metrics.json"
+#Each process holds a lock on a file with this extension for as long as it runs, so other processes can tell when it has exited
+PROCESS_LOCK_FILE_EXTENSION = ".metrics.lock"
+#Metrics of processes that have exited are added up in this file
+MERGED_METRICS_FILE_NAME = "merged" + METRICS_FILE_EXTENSION
+#Held while merging or reading the metrics files, so no process's metrics are ever counted twice or missed
+MERGE_LOCK_FILE_NAME = "merge.lock"
+
+#Each process writes its metrics this often (if they've changed), and whenever it serves /metrics
+FLUSH_INTERVAL_SEC = 5
+
+#Get histogram buckets that go up by a factor of 4, from start to at least end
+def getExponentialBuckets(start, end):
+    buckets = [start]
+    while buckets[-1] < end:
+        buckets.append(buckets[-1] * 4)
+    return buckets
+
+#Format the labels of a sample, like {route="/sessions",status="200"}
+def _formatLabels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(name + '="' + str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"' for name, value in labels) + "}"
+
+#Lock an open file, which is released when it's unlocked or closed, or the process exits
+#@param blocking - If False, don't wait for the lock if another process (or another open of the file) has it
+#@return True if locked
+def _lockFile(file, blocking):
+    try:
+        if fcntl:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            #Blocking retries for up to 10 seconds
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+def _isOpenFileAt(file, filePath):
+    try:
+        return os.fstat(file.fileno()).st_ino == os.stat(filePath).st_ino
+    except FileNotFoundError:
+        return False
+
+def _unlockFile(file):
+    if fcntl:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+#Add the values of a metrics file (as saved by MetricsRegistry.flush) to aggregated values
+#@param names - Only add the metrics with these names. If None, add all of them
+def _addFileValues(aggregatedValues, state, names = None):
+    for name, values in state.items():
+        if names != None and name not in names:
+            continue
+        aggregated = aggregatedValues.setdefault(name, {})
+        for key, value in values:
+            key = tuple(tuple(label) for label in key)
+            if isinstance(value, list):
+                bucketCounts, total = aggregated.get(key, ([0] * len(value[0]), 0))
+                aggregated[key] = ([a + b for a, b in zip(bucketCounts, value[0])], total + value[1])
+            else:
+                aggregated[key] = aggregated.get(key, 0) + value
+
+#Get metric values in the form they're saved in the metrics files. Labels tuples become lists
+def _getValuesForSerialization(valuesByName):
+    return {name : [[[list(label) for label in key], list(value) if isinstance(value, (list, tuple)) else value] for key, value in values.items()]
+            for name, values in valuesByName.items()}
+
+#Read a metrics file
+#@return Its values, or None if it was deleted
+def _readMetricsFile(filePath):
+    try:
+        with open(filePath, "r") as file:
+            return json.loads(file.read())
+    except FileNotFoundError:
+        return None
+
+def _writeFileAtomically(directory, filePath, content):
+    fd, tempPath = tempfile.mkstemp(dir = directory, prefix = ".tmp.")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        os.replace(tempPath, filePath)
+    except BaseException:
+        os.remove(tempPath)
+        raise
+
+def _formatValue(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+class MetricsRegistry:
+    #@param multiprocessDir - Directory that every process of the service writes its metrics to. If None, only this process's metrics are served
+    def __init__(self, multiprocessDir = None):
+        self.mLock = threading.Lock()
+        #Name -> (type, help)
+        self.mDescriptions = {}
+        #Histogram name -> upper bounds of its buckets (not including +Inf)
+        self.mBuckets = {}
+        #Name -> { labels tuple : value } for counters, or { labels tuple : [count in each bucket (not cumulative, last one is +Inf), sum] } for histograms
+        self.mValues = {}
+
+        #True if the values have changed since they were last flushed
+        self.mChanged = False
+
+        self.mMultiprocessDir = multiprocessDir
+        self.mFilePath = None
+        #Process that mFilePath belongs to. A process forked from this one gets its own file the first time it records something
+        self.mPid = None
+        self.mProcessLockFile = None
+        if multiprocessDir != None:
+            os.makedirs(multiprocessDir, exist_ok = True)
+            self._startProcessFile()
+            atexit.register(self.flush)
+
+    #Start this process's metrics file, and the thread that flushes to it
+    def _startProcessFile(self):
+        self.mPid = os.getpid()
+        #The pid alone could be reused by a later process, which would overwrite the metrics of the one before it
+        fileID = str(self.mPid) + "-" + uuid.uuid4().hex[:8]
+        self.mFilePath = os.path.join(self.mMultiprocessDir, fileID + METRICS_FILE_EXTENSION)
+        #Locked before the metrics file is first written, and never unlocked, so a metrics file whose lock is free is from a process that has exited
+        lockFilePath = os.path.join(self.mMultiprocessDir, fileID + PROCESS_LOCK_FILE_EXTENSION)
+        while True:
+            self.mProcessLockFile = open(lockFilePath, "a+b")
+            _lockFile(self.mProcessLockFile, True)
+            #Another process merging could have taken the new lock file for an exited process's, and removed it before we locked it
+            if _isOpenFileAt(self.mProcessLockFile, lockFilePath):
+                break
+            self.mProcessLockFile.close()
+        threading.Thread(target = self._flushPeriodically, daemon = True).start()
+
+    def _flushPeriodically(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL_SEC)
+            try:
+                self.flush()
+            except OSError as e:
+                print("Could not write metrics to", self.mFilePath, "-", e)
+
+    #Must hold mLock
+    def _recordingValues(self):
+        self.mChanged = True
+        #A forked process starts with a copy of the values, which are already in the file of the process it was forked from
+        if self.mPid != None and self.mPid != os.getpid():
+            for values in self.mValues.values():
+                values.clear()
+            #Closing the copy of the other process's lock file doesn't unlock it, since that process still has it open
+            self.mProcessLockFile.close()
+            self._startProcessFile()
+
+    def describeCounter(self, name, help):
+        self.mDescriptions[name] = ("counter", help)
+        self.mValues.setdefault(name, {})
+
+    #@param buckets - Upper bounds of the buckets, in increasing order. A +Inf bucket is always added
+    def describeHistogram(self, name, help, buckets):
+        self.mDescriptions[name] = ("histogram", help)
+        self.mBuckets[name] = list(buckets)
+        self.mValues.setdefault(name, {})
+
+    #@param labels - Dict of label name to value
+    def incrementCounter(self, name, labels = None, amount = 1):
+        key = tuple(sorted(labels.items())) if labels else ()
+        with self.mLock:
+            self._recordingValues()
+            values = self.mValues[name]
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, value, labels = None):
+        key = tuple(sorted(labels.items())) if labels else ()
+        buckets = self.mBuckets[name]
+        #Index of the first bucket the value fits in. len(buckets) is the +Inf bucket
+        bucketIndex = next((i for i, upperBound in enumerate(buckets) if value <= upperBound), len(buckets))
+        with self.mLock:
+            self._recordingValues()
+            values = self.mValues[name]
+            if key not in values:
+                values[key] = [[0] * (len(buckets) + 1), 0]
+            values[key][0][bucketIndex] += 1
+            values[key][1] += value
+
+    #Write this process's metrics to its file in the shared directory, if there is one and they've changed since the last flush
+    #Done every FLUSH_INTERVAL_SEC, when serving /metrics and when the process exits, so requests never wait on it. Not fsynced, since
+    #losing the last few on a crash doesn't matter
+    def flush(self):
+        if self.mFilePath == None or self.mPid != os.getpid():
+            return
+        with self.mLock:
+            if not self.mChanged:
+                return
+            self.mChanged = False
+            content = json.dumps(_getValuesForSerialization(self.mValues))
+        _writeFileAtomically(self.mMultiprocessDir, self.mFilePath, content)
+
+    #Add up the metrics files of processes that have exited into the merged file, and remove their files (and their lock files, including
+    #those of processes that never wrote any metrics). Must hold the merge lock
+    def _mergeExitedProcesses(self):
+        fileIDs = set()
+        for fileName in os.listdir(self.mMultiprocessDir):
+            for extension in [METRICS_FILE_EXTENSION, PROCESS_LOCK_FILE_EXTENSION]:
+                if fileName.endswith(extension) and fileName != MERGED_METRICS_FILE_NAME:
+                    fileIDs.add(fileName[:-len(extension)])
+        if self.mFilePath != None:
+            fileIDs.discard(os.path.basename(self.mFilePath)[:-len(METRICS_FILE_EXTENSION)])
+
+        #(metrics file path, lock file path, open lock file) of each process that has exited
+        exitedProcesses = []
+        try:
+            for fileID in fileIDs:
+                lockFilePath = os.path.join(self.mMultiprocessDir, fileID + PROCESS_LOCK_FILE_EXTENSION)
+                lockFile = open(lockFilePath, "a+b")
+                if _lockFile(lockFile, False):
+                    exitedProcesses.append((os.path.join(self.mMultiprocessDir, fileID + METRICS_FILE_EXTENSION), lockFilePath, lockFile))
+                else:
+                    lockFile.close()
+
+            exitedFilePaths = [filePath for filePath, lockFilePath, lockFile in exitedProcesses if os.path.exists(filePath)]
+            if exitedFilePaths:
+                mergedFilePath = os.path.join(self.mMultiprocessDir, MERGED_METRICS_FILE_NAME)
+                mergedValues = {}
+                for filePath in [mergedFilePath] + exitedFilePaths:
+                    _addFileValues(mergedValues, _readMetricsFile(filePath) or {})
+                _writeFileAtomically(self.mMultiprocessDir, mergedFilePath, json.dumps(_getValuesForSerialization(mergedValues)))
+                for filePath in exitedFilePaths:
+                    os.remove(filePath)
+        finally:
+            for filePath, lockFilePath, lockFile in exitedProcesses:
+                lockFile.close()
+                #Only once its metrics are in the merged file
+                if not os.path.exists(filePath):
+                    try:
+                        os.remove(lockFilePath)
+                    except OSError:
+                        #On Windows, a process that just opened it to start up
+                        pass
+
+    #Get the values of every process that has written to the shared directory (or just this one, if there isn't one), added up
+    #@return Same as mValues, but with (bucket counts, sum) tuples for histograms
+    def getAggregatedValues(self):
+        if self.mFilePath == None:
+            with self.mLock:
+                return {name : {key : (list(value[0]), value[1]) if isinstance(value, list) else value for key, value in values.items()}
+                        for name, values in self.mValues.items()}
+
+        self.flush()
+        aggregatedValues = {name : {} for name in self.mDescriptions}
+        with open(os.path.join(self.mMultiprocessDir, MERGE_LOCK_FILE_NAME), "a+b") as mergeLockFile:
+            _lockFile(mergeLockFile, True)
+            try:
+                self._mergeExitedProcesses()
+                for fileName in os.listdir(self.mMultiprocessDir):
+                    if fileName.endswith(METRICS_FILE_EXTENSION):
+                        #Files are replaced atomically, so there's only nothing to read if a process's file was deleted after it was listed
+                        _addFileValues(aggregatedValues, _readMetricsFile(os.path.join(self.mMultiprocessDir, fileName)) or {}, self.mDescriptions)
+            finally:
+                _unlockFile(mergeLockFile)
+        return aggregatedValues
+
+    #Get every metric in the Prometheus text format
+    #@param gauges - List of (name, help, [(labels dict, value), ...]) for gauges, which are current values (like the number of
+    #saved builds) rather than something counted by each process
+    #@param aggregatedValues - From getAggregatedValues, if they were already needed for the gauges
+    def getAsPrometheusText(self, gauges = [], aggregatedValues = None):
+        if aggregatedValues == None:
+            aggregatedValues = self.getAggregatedValues()
+        lines = []
+        for name, (metricType, help) in self.mDescriptions.items():
+            lines.append("# HELP " + name + " " + help)
+            lines.append("# TYPE " + name + " " + metricType)
+            for key, value in sorted(aggregatedValues.get(name, {}).items()):
+                if metricType == "counter":
+                    lines.append(name + _formatLabels(key) + " " + _formatValue(value))
+                    continue
+                bucketCounts, total = value
+                cumulativeCount = 0
+                for upperBound, bucketCount in zip(self.mBuckets[name] + [math.inf], bucketCounts):
+                    cumulativeCount += bucketCount
+                    lines.append(name + "_bucket" + _formatLabels(key + (("le", _formatValue(upperBound)),)) + " " + str(cumulativeCount))
+                lines.append(name + "_sum" + _formatLabels(key) + " " + _formatValue(total))
+                lines.append(name + "_count" + _formatLabels(key) + " " + str(cumulativeCount))
+
+        for name, help, samples in gauges:
+            lines.append("# HELP " + name + " " + help)
+            lines.append("# TYPE " + name + " gauge")
+            for labels, value in samples:
+                lines.append(name + _formatLabels(tuple(sorted(labels.items()))) + " " + _formatValue(value))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,454 @@
+import os
+import json
+import time
+import pathlib
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import contextlib
+try:
+    import fcntl
+except ImportError:
+    #Windows
+    fcntl = None
+    import msvcrt
+
+SAVED_BUILD_STORE_SQLITE = "sqlite"
+SAVED_BUILD_STORE_FLAT_FILE = "flatfile"
+
+#Builds are written to a temp file with this prefix and then moved into place, so a build file is never seen half written
+TEMP_FILE_PREFIX = ".tmp-"
+
+#Raised when a build is updated with an expected ETag (e.g. from If-Match) that doesn't match the build's current ETag
+class ETagMismatchError(Exception):
+    pass
+
+#Strong ETag based on a hash of the content
+def computeETag(content):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+#Get the race(s) and total number of actions from a saved build's ordered action list JSON, for the index
+#Saved builds aren't validated, so anything we can't parse will just be indexed with no race and no actions
+def getBuildSummary(content):
+    try:
+        teamBuildOrdersList = json.loads(content)
+        races = []
+        numActions = 0
+        for buildOrderDict in teamBuildOrdersList:
+            races.append(buildOrderDict['race'])
+            numActions += len(buildOrderDict['orderedActionList'])
+        return ",".join(races), numActions
+    except (ValueError, TypeError, KeyError):
+        return "", 0
+
+#Returns the smallest string that is greater than every string starting with prefix, so a prefix
+#filter can be done as a range query on the index instead of a scan
+def getPrefixUpperBound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+#Exclusive lock on a single saved build name, shared by every thread and every process using the same lock directory
+#Other builds can still be written while it is held
+class SavedBuildLock:
+    #Only one thread per process can hold the file lock on a name, so threads queue up on these first
+    mThreadLocks = {}
+    mThreadLocksGuard = threading.Lock()
+
+    def __init__(self, lockDir, name):
+        self.mLockFilePath = os.path.join(lockDir, name + ".lock")
+        with SavedBuildLock.mThreadLocksGuard:
+            self.mThreadLock = SavedBuildLock.mThreadLocks.setdefault(self.mLockFilePath, threading.Lock())
+        self.mLockFile = None
+
+    def __enter__(self):
+        self.mThreadLock.acquire()
+        try:
+            while True:
+                self.mLockFile = open(self.mLockFilePath, "a+b")
+                if not fcntl:
+                    self.mLockFile.seek(0)
+                    #Blocks (retrying for up to 10 seconds) until the first byte of the lock file is free
+                    msvcrt.locking(self.mLockFile.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                fcntl.flock(self.mLockFile.fileno(), fcntl.LOCK_EX)
+                #If the lock file was removed (see removeLockFile) while we were waiting for it, we have a lock on a file that nobody else
+                #can open any more, so try again with a new one
+                if self._isLockFileCurrent():
+                    break
+                self.mLockFile.close()
+        except BaseException:
+            if self.mLockFile:
+                self.mLockFile.close()
+            self.mThreadLock.release()
+            raise
+        return self
+
+    def _isLockFileCurrent(self):
+        try:
+            return os.fstat(self.mLockFile.fileno()).st_ino == os.stat(self.mLockFilePath).st_ino
+        except FileNotFoundError:
+            return False
+
+    #Remove the lock file, so names that aren't used any more don't leave lock files behind. Must hold the lock
+    #On Windows, a lock file can't be removed while another process has it open, so it's left there
+    def removeLockFile(self):
+        if fcntl:
+            os.remove(self.mLockFilePath)
+
+    def __exit__(self, excType, excValue, traceback):
+        try:
+            if fcntl:
+                fcntl.flock(self.mLockFile.fileno(), fcntl.LOCK_UN)
+            else:
+                self.mLockFile.seek(0)
+                msvcrt.locking(self.mLockFile.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.mLockFile.close()
+            self.mThreadLock.release()
+
+#Write a file so that readers (and crashes) only ever see the old content or the new content, never a partial write
+def writeFileAtomically(filePath, content):
+    directory, fileName = os.path.split(filePath)
+    fd, tempPath = tempfile.mkstemp(dir = directory, prefix = TEMP_FILE_PREFIX + fileName + ".")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, filePath)
+    except BaseException:
+        os.remove(tempPath)
+        raise
+
+#Information about a saved build that is kept in the index, so that listing builds never needs to read the builds themselves
+class SavedBuildInfo:
+    def __init__(self, name, race, size, numActions, modifiedTime, etag):
+        self.mName = name
+        #Comma separated if the build is a team build
+        self.mRace = race
+        #Size of the saved build, in bytes
+        self.mSize = size
+        self.mNumActions = numActions
+        #Seconds since the epoch
+        self.mModifiedTime = modifiedTime
+        self.mETag = etag
+
+    def getAsDictForSerialization(self):
+        dict = {
+            'name' : self.mName,
+            'race' : self.mRace,
+            'size' : self.mSize,
+            'numActions' : self.mNumActions,
+            'modifiedTime' : self.mModifiedTime
+        }
+
+        return dict
+
+#Base class for saved build storage. Keeps an index (in SQLite) of every saved build
+#Derived classes decide where the build content itself is kept
+class SavedBuildStore:
+    def __init__(self, databasePath):
+        self.mDatabasePath = databasePath
+        #sqlite3 connections can't be shared between threads, so each thread gets its own
+        self.mThreadLocal = threading.local()
+
+        pathlib.Path(databasePath).parent.mkdir(parents=True, exist_ok=True)
+        connection = self._getConnection()
+        #WAL lets readers keep going while another process is writing
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS savedBuilds (name TEXT PRIMARY KEY, race TEXT NOT NULL, size INTEGER NOT NULL, "
+                               "numActions INTEGER NOT NULL, modifiedTime REAL NOT NULL, etag TEXT NOT NULL, content TEXT)")
+            #Compressed simulated timelines JSON for each saved build. Only valid for the build ETag and engine version it was simulated with
+            connection.execute("CREATE TABLE IF NOT EXISTS simulatedTimelines (name TEXT PRIMARY KEY, buildETag TEXT NOT NULL, engineVersion TEXT NOT NULL, timelines BLOB NOT NULL)")
+
+    def _getConnection(self):
+        connection = getattr(self.mThreadLocal, 'connection', None)
+        if connection == None:
+            connection = sqlite3.connect(self.mDatabasePath, timeout = 30)
+            self.mThreadLocal.connection = connection
+        return connection
+
+    #Save a new build
+    #@return the ETag of the new build, or None if a build with that name already exists
+    def createBuild(self, name, content):
+        raise NotImplementedError()
+
+    #Get a saved build
+    #@return (content, ETag), or None if no build with that name exists
+    def getBuild(self, name):
+        raise NotImplementedError()
+
+    #Overwrite an existing build
+    #@param expectedETags - If not None, only overwrite the build if its current ETag is one of these. Raises ETagMismatchError otherwise
+    #@return the new ETag of the build, or None if no build with that name exists
+    def updateBuild(self, name, content, expectedETags = None):
+        raise NotImplementedError()
+
+    #@return True if the build was deleted, False if no build with that name exists
+    def deleteBuild(self, name):
+        raise NotImplementedError()
+
+    #Start a transaction that holds the database write lock from the beginning, instead of from the first write
+    #This way, checking a build and then writing it can't be interleaved with a write from another thread or process
+    @contextlib.contextmanager
+    def _writeTransaction(self):
+        connection = self._getConnection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+
+    def _getETag(self, connection, name):
+        row = connection.execute("SELECT etag FROM savedBuilds WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    #Raise if the build's current ETag isn't one of the expected ones
+    def _checkETag(self, currentETag, expectedETags):
+        if expectedETags != None and currentETag not in expectedETags:
+            raise ETagMismatchError("Saved build has been changed. Its ETag is now " + currentETag)
+
+    #Get the ETag of a saved build from the index, without reading the build. Returns None if no build with that name exists
+    def getETag(self, name):
+        return self._getETag(self._getConnection(), name)
+
+    #Get the index entries for saved builds, sorted by name
+    #@param prefix - Only return builds whose name starts with this
+    #@param offset - Number of matching builds to skip, for pagination
+    #@param limit - Max number of builds to return. If None, return all of them
+    def listBuilds(self, prefix = "", offset = 0, limit = None):
+        query = "SELECT name, race, size, numActions, modifiedTime, etag FROM savedBuilds"
+        params = []
+        if prefix:
+            query += " WHERE name >= ? AND name < ?"
+            params += [prefix, getPrefixUpperBound(prefix)]
+        #SQLite uses a negative limit to mean no limit
+        query += " ORDER BY name LIMIT ? OFFSET ?"
+        params += [limit if limit != None else -1, offset]
+
+        rows = self._getConnection().execute(query, params).fetchall()
+        return [SavedBuildInfo(*row) for row in rows]
+
+    #Store the compressed simulated timelines for a saved build
+    #Won't store anything if the build has been changed or deleted since buildETag was read, so a slow simulation can't overwrite a newer one
+    #@return True if stored
+    def setSimulatedTimelines(self, name, buildETag, engineVersion, compressedTimelines):
+        connection = self._getConnection()
+        with connection:
+            return connection.execute("INSERT OR REPLACE INTO simulatedTimelines (name, buildETag, engineVersion, timelines) "
+                                      "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM savedBuilds WHERE name = ? AND etag = ?)",
+                                      (name, buildETag, engineVersion, compressedTimelines, name, buildETag)).rowcount != 0
+
+    #Get the compressed simulated timelines for a saved build
+    #@return None if they haven't been stored for this version of the build and this version of the engine
+    def getSimulatedTimelines(self, name, buildETag, engineVersion):
+        row = self._getConnection().execute("SELECT timelines FROM simulatedTimelines WHERE name = ? AND buildETag = ? AND engineVersion = ?",
+                                            (name, buildETag, engineVersion)).fetchone()
+        return row[0] if row else None
+
+    #Must be done whenever a build changes or is deleted
+    def _invalidateSimulatedTimelines(self, connection, name):
+        connection.execute("DELETE FROM simulatedTimelines WHERE name = ?", (name,))
+
+    def getNumBuilds(self):
+        return self._getConnection().execute("SELECT COUNT(*) FROM savedBuilds").fetchone()[0]
+
+    #Get the total size of all saved builds, in bytes
+    def getTotalSize(self):
+        return self._getConnection().execute("SELECT COALESCE(SUM(size), 0) FROM savedBuilds").fetchone()[0]
+
+    #Insert or replace the index entry for a build. Content is only stored in the index if passed in
+    def _writeIndexEntry(self, connection, name, content, modifiedTime, storeContent):
+        race, numActions = getBuildSummary(content)
+        etag = computeETag(content)
+        connection.execute("INSERT OR REPLACE INTO savedBuilds (name, race, size, numActions, modifiedTime, etag, content) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (name, race, len(content.encode("utf-8")), numActions, modifiedTime, etag, content if storeContent else None))
+        return etag
+
+#Default store. The builds are kept in the SQLite database along with the index
+class SQLiteSavedBuildStore(SavedBuildStore):
+    def __init__(self, databasePath):
+        super().__init__(databasePath)
+        connection = self._getConnection()
+        with connection:
+            #Things that have been done to the store once, like importing the flat file builds
+            connection.execute("CREATE TABLE IF NOT EXISTS storeInfo (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    #Import the builds saved by the flat file store (the default store before this one), so they're still there after switching stores
+    #Only done once per database, so builds deleted after that don't come back. A build that already exists in the database is kept
+    #@return The number of builds imported
+    def importFlatFileBuilds(self, storageDir):
+        if not os.path.isdir(storageDir):
+            return 0
+        numImported = 0
+        #The write lock is held throughout, so only one process imports the builds
+        with self._writeTransaction() as connection:
+            if connection.execute("SELECT 1 FROM storeInfo WHERE key = 'flatFileBuildsImported'").fetchone() != None:
+                return 0
+            with os.scandir(storageDir) as entries:
+                for entry in entries:
+                    #Temp files are either being written right now, or were left behind by a crash
+                    if not entry.is_file() or entry.name.startswith(TEMP_FILE_PREFIX) or self._getETag(connection, entry.name) != None:
+                        continue
+                    try:
+                        with open(entry.path, "r") as f:
+                            content = f.read()
+                    except (OSError, UnicodeDecodeError) as e:
+                        print("Could not import saved build", entry.path, "-", e)
+                        continue
+                    self._writeIndexEntry(connection, entry.name, content, entry.stat().st_mtime, storeContent = True)
+                    numImported += 1
+            connection.execute("INSERT INTO storeInfo (key, value) VALUES ('flatFileBuildsImported', ?)", (str(time.time()),))
+        return numImported
+
+    def createBuild(self, name, content):
+        with self._writeTransaction() as connection:
+            if self._getETag(connection, name) != None:
+                return None
+            return self._writeIndexEntry(connection, name, content, time.time(), storeContent = True)
+
+    def getBuild(self, name):
+        row = self._getConnection().execute("SELECT content, etag FROM savedBuilds WHERE name = ?", (name,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def updateBuild(self, name, content, expectedETags = None):
+        with self._writeTransaction() as connection:
+            currentETag = self._getETag(connection, name)
+            if currentETag == None:
+                return None
+            self._checkETag(currentETag, expectedETags)
+            self._invalidateSimulatedTimelines(connection, name)
+            return self._writeIndexEntry(connection, name, content, time.time(), storeContent = True)
+
+    def deleteBuild(self, name):
+        with self._writeTransaction() as connection:
+            self._invalidateSimulatedTimelines(connection, name)
+            return connection.execute("DELETE FROM savedBuilds WHERE name = ?", (name,)).rowcount != 0
+
+#Compatibility store, for the original layout of one file per build in the saved builds directory
+#The index lives in a SQLite database next to that directory
+#Every write to a build holds that build's SavedBuildLock, so several processes can share the directory
+class FlatFileSavedBuildStore(SavedBuildStore):
+    def __init__(self, databasePath, storageDir, lockDir):
+        super().__init__(databasePath)
+        self.mStorageDir = storageDir
+        self.mLockDir = lockDir
+        pathlib.Path(storageDir).mkdir(parents=True, exist_ok=True)
+        pathlib.Path(lockDir).mkdir(parents=True, exist_ok=True)
+        self._reconcileIndex()
+
+    #Bring the index up to date with the files in the storage directory. Only done once, at startup, since
+    #builds may have been added or removed while we weren't running
+    def _reconcileIndex(self):
+        connection = self._getConnection()
+        indexedBuilds = {}
+        for row in connection.execute("SELECT name, size, modifiedTime FROM savedBuilds"):
+            indexedBuilds[row[0]] = (row[1], row[2])
+
+        with connection:
+            with os.scandir(self.mStorageDir) as entries:
+                for entry in entries:
+                    #Temp files are either being written right now, or were left behind by a crash
+                    if not entry.is_file() or entry.name.startswith(TEMP_FILE_PREFIX):
+                        continue
+                    stat = entry.stat()
+                    if indexedBuilds.pop(entry.name, None) != (stat.st_size, stat.st_mtime):
+                        self._indexFile(connection, entry.name)
+            #Anything left wasn't found on disk
+            for name in indexedBuilds:
+                connection.execute("DELETE FROM savedBuilds WHERE name = ?", (name,))
+
+    def _getFilePath(self, name):
+        return os.path.join(self.mStorageDir, name)
+
+    def _lock(self, name):
+        return SavedBuildLock(self.mLockDir, name)
+
+    def _indexFile(self, connection, name):
+        filePath = self._getFilePath(name)
+        with open(filePath, "r") as f:
+            content = f.read()
+        return content, self._writeIndexEntry(connection, name, content, os.stat(filePath).st_mtime, storeContent = False)
+
+    #Must hold the build's lock
+    def _writeBuild(self, name, content):
+        filePath = self._getFilePath(name)
+        writeFileAtomically(filePath, content)
+        with self._writeTransaction() as connection:
+            self._invalidateSimulatedTimelines(connection, name)
+            return self._writeIndexEntry(connection, name, content, os.stat(filePath).st_mtime, storeContent = False)
+
+    #Index a file that was added to the directory after startup
+    def _indexNewFile(self, name):
+        with self._lock(name):
+            if not os.path.exists(self._getFilePath(name)):
+                return None
+            with self._writeTransaction() as connection:
+                return self._indexFile(connection, name)
+
+    def createBuild(self, name, content):
+        with self._lock(name):
+            if os.path.exists(self._getFilePath(name)):
+                return None
+            return self._writeBuild(name, content)
+
+    def getETag(self, name):
+        etag = super().getETag(name)
+        if etag == None and os.path.exists(self._getFilePath(name)):
+            indexedFile = self._indexNewFile(name)
+            etag = indexedFile[1] if indexedFile else None
+        return etag
+
+    def getBuild(self, name):
+        filePath = self._getFilePath(name)
+        #Read the ETag first. If the build is replaced after this, the ETag will just be stale (and the client will
+        #get the new build the next time), rather than the ETag of the new content being served with the old content
+        etag = super().getETag(name)
+        if etag == None:
+            return self._indexNewFile(name)
+        try:
+            with open(filePath, "r") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        return content, etag
+
+    def updateBuild(self, name, content, expectedETags = None):
+        with self._lock(name):
+            if not os.path.exists(self._getFilePath(name)):
+                return None
+            currentETag = super().getETag(name)
+            if currentETag == None:
+                #Added to the directory after startup. Index it here, since _indexNewFile would take the lock we're already holding
+                with self._writeTransaction() as connection:
+                    currentETag = self._indexFile(connection, name)[1]
+            self._checkETag(currentETag, expectedETags)
+            return self._writeBuild(name, content)
+
+    def deleteBuild(self, name):
+        filePath = self._getFilePath(name)
+        with self._lock(name) as lock:
+            with self._writeTransaction() as connection:
+                self._invalidateSimulatedTimelines(connection, name)
+                connection.execute("DELETE FROM savedBuilds WHERE name = ?", (name,))
+            lock.removeLockFile()
+            if not os.path.exists(filePath):
+                return False
+            os.remove(filePath)
+            return True
+
+#Create the store for the type passed in (SAVED_BUILD_STORE_SQLITE or SAVED_BUILD_STORE_FLAT_FILE)
+#@param storageRootDir - Directory that all saved build storage lives under
+def createSavedBuildStore(storeType, storageRootDir):
+    if storeType == SAVED_BUILD_STORE_SQLITE:
+        store = SQLiteSavedBuildStore(os.path.join(storageRootDir, "SavedBuilds.db"))
+        numImported = store.importFlatFileBuilds(os.path.join(storageRootDir, "SavedBuilds"))
+        if numImported > 0:
+            print("Imported", numImported, "saved builds from", os.path.join(storageRootDir, "SavedBuilds"), "into the SQLite saved build store")
+        return store
+    elif storeType == SAVED_BUILD_STORE_FLAT_FILE:
+        return FlatFileSavedBuildStore(os.path.join(storageRootDir, "SavedBuildsIndex.db"), os.path.join(storageRootDir, "SavedBuilds"),
+                                       os.path.join(storageRootDir, "SavedBuildLocks"))
+    else:
+        raise ValueError("Unknown saved build store type: " + str(storeType))
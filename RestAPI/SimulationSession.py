@@ -0,0 +1,197 @@
+import time
+import secrets
+import threading
+import collections
+from SimEngine.SimulationEngine import SimulationEngine
+from SimEngine.SimulationConstants import Race
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.Action import Action
+
+SESSION_EDIT_APPEND = "append"
+SESSION_EDIT_INSERT = "insert"
+SESSION_EDIT_DELETE = "delete"
+
+#A copy of each build order is kept every this many actions, so edits only re-simulate from the nearest one before the edit
+SESSION_CHECKPOINT_INTERVAL = 10
+
+#A build (or team build) being edited by a client. Keeps a live SimulationEngine, so edits don't have to re-simulate everything
+#Callers must hold mLock while using a session, since requests for the same session can come in on different threads
+class SimulationSession:
+    #@param teamBuildOrdersList - Ordered action lists for the team build orders, already converted from JSON
+    def __init__(self, sessionID, teamBuildOrdersList):
+        self.mSessionID = sessionID
+        self.mLock = threading.Lock()
+        self.mLastAccessTime = time.monotonic()
+
+        self.mRaces = []
+        #The action dicts of each build order, in order. This is the build as the client sees it, including any actions after one that failed
+        self.mActionDictLists = []
+        for buildOrderDict in teamBuildOrdersList:
+            self.mRaces.append(Race[buildOrderDict['race']])
+            self.mActionDictLists.append(list(buildOrderDict['orderedActionList']))
+
+        self.mSimEngine = SimulationEngine()
+        self.mSimEngine.newBuildOrder(self.mRaces)
+        #Whether simulating each build order stopped at an action that failed. Nothing after that action is simulated
+        self.mSimulationFailed = [False] * len(self.mRaces)
+        #For each build order, a list of (number of actions simulated, copied BuildOrder), in order
+        #These are never simulated further themselves, only copied again
+        self.mCheckpoints = [[] for race in self.mRaces]
+        for i in range(len(self.mRaces)):
+            self._resimulateBuildOrder(i, 0)
+
+    def getSimEngine(self):
+        return self.mSimEngine
+
+    def getNumActions(self):
+        return sum(len(actionDicts) for actionDicts in self.mActionDictLists)
+
+    #The number of actions simulated in the build orders and all their checkpoints, which is roughly what the session's memory use grows with
+    def getNumSimulatedActions(self):
+        numCheckpointedActions = sum(numActions for checkpoints in self.mCheckpoints for numActions, buildOrder in checkpoints)
+        return self.getNumActions() + numCheckpointedActions
+
+    #Simulate an action on a build order that has simulated every action before it, keeping a checkpoint when it's time to
+    #@return True if successful, False otherwise
+    def _simulateNextAction(self, buildOrderIndex, buildOrder, action):
+        if not buildOrder.simulateAction(action):
+            print("Failed to simulate action in action order list. Stopping")
+            self.mSimulationFailed[buildOrderIndex] = True
+            return False
+
+        numActions = len(buildOrder.mOrderedActionList)
+        if numActions % SESSION_CHECKPOINT_INTERVAL == 0:
+            self.mCheckpoints[buildOrderIndex].append( (numActions, buildOrder.deepCopy()) )
+        return True
+
+    #Re-simulate a build order after an edit that changed actions that were already simulated
+    #@param firstChangedActionIndex - The index of the first action that changed. Everything simulated before it is still valid
+    def _resimulateBuildOrder(self, buildOrderIndex, firstChangedActionIndex):
+        checkpoints = self.mCheckpoints[buildOrderIndex]
+        #Checkpoints that include the changed action are out of date
+        while checkpoints and checkpoints[-1][0] > firstChangedActionIndex:
+            checkpoints.pop()
+
+        if checkpoints:
+            numActionsSimulated, checkpointBuildOrder = checkpoints[-1]
+            #Copy the checkpoint, so it can be used again for the next edit
+            buildOrder = checkpointBuildOrder.deepCopy()
+        else:
+            numActionsSimulated = 0
+            buildOrder = BuildOrder(self.mRaces[buildOrderIndex])
+        self.mSimEngine.getTeamBuildOrders()[buildOrderIndex] = buildOrder
+
+        self.mSimulationFailed[buildOrderIndex] = False
+        for actionDict in self.mActionDictLists[buildOrderIndex][numActionsSimulated:]:
+            if not self._simulateNextAction(buildOrderIndex, buildOrder, Action.getActionFromDict(actionDict)):
+                return
+
+    def _checkBuildOrderIndex(self, buildOrderIndex):
+        if buildOrderIndex < 0 or buildOrderIndex >= len(self.mRaces):
+            raise IndexError("No build order with index " + str(buildOrderIndex))
+
+    #Add an action to the end of a build order. Only this action is simulated
+    def appendAction(self, buildOrderIndex, actionDict):
+        self._checkBuildOrderIndex(buildOrderIndex)
+        #Convert before changing anything, so an invalid action leaves the session as it was
+        action = Action.getActionFromDict(actionDict)
+        self.mActionDictLists[buildOrderIndex].append(actionDict)
+
+        #Simulating from scratch would stop at the failed action, so nothing after it is simulated here either
+        if not self.mSimulationFailed[buildOrderIndex]:
+            self._simulateNextAction(buildOrderIndex, self.mSimEngine.getTeamBuildOrders()[buildOrderIndex], action)
+
+    #Insert an action before the action at actionIndex. Inserting at the end is the same as appending
+    def insertAction(self, buildOrderIndex, actionIndex, actionDict):
+        self._checkBuildOrderIndex(buildOrderIndex)
+        actionDicts = self.mActionDictLists[buildOrderIndex]
+        if actionIndex < 0 or actionIndex > len(actionDicts):
+            raise IndexError("Can't insert an action at index " + str(actionIndex))
+        if actionIndex == len(actionDicts):
+            self.appendAction(buildOrderIndex, actionDict)
+            return
+
+        #Convert first, so an invalid action leaves the session as it was
+        Action.getActionFromDict(actionDict)
+        actionDicts.insert(actionIndex, actionDict)
+        self._resimulateBuildOrder(buildOrderIndex, actionIndex)
+
+    def deleteAction(self, buildOrderIndex, actionIndex):
+        self._checkBuildOrderIndex(buildOrderIndex)
+        actionDicts = self.mActionDictLists[buildOrderIndex]
+        if actionIndex < 0 or actionIndex >= len(actionDicts):
+            raise IndexError("No action at index " + str(actionIndex))
+
+        actionDicts.pop(actionIndex)
+        self._resimulateBuildOrder(buildOrderIndex, actionIndex)
+
+    #Apply an edit from a client
+    #@param editDict - { "op" : "append" | "insert" | "delete", "buildOrderIndex" : <int, default 0>, "actionIndex" : <int, for insert and delete>, "action" : <action dict, for append and insert> }
+    def applyEdit(self, editDict):
+        op = editDict['op']
+        buildOrderIndex = int(editDict.get('buildOrderIndex', 0))
+        if op == SESSION_EDIT_APPEND:
+            self.appendAction(buildOrderIndex, editDict['action'])
+        elif op == SESSION_EDIT_INSERT:
+            self.insertAction(buildOrderIndex, int(editDict['actionIndex']), editDict['action'])
+        elif op == SESSION_EDIT_DELETE:
+            self.deleteAction(buildOrderIndex, int(editDict['actionIndex']))
+        else:
+            raise ValueError("Unknown edit op: " + str(op))
+
+#Keeps the live sessions, and gets rid of them when they've been idle too long or there are too many
+class SimulationSessionManager:
+    #@param maxSessions - Max number of sessions. The least recently used ones are dropped past this
+    #@param maxTotalActions - Max number of actions simulated across all sessions, including their checkpoints. Memory use grows
+    #with the number of actions simulated, so the least recently used sessions are dropped past this too
+    #@param idleTimeoutSec - Sessions that haven't been used for this long are dropped
+    def __init__(self, maxSessions, maxTotalActions, idleTimeoutSec):
+        self.mMaxSessions = maxSessions
+        self.mMaxTotalActions = maxTotalActions
+        self.mIdleTimeoutSec = idleTimeoutSec
+        #Least recently used first
+        self.mSessions = collections.OrderedDict()
+        self.mLock = threading.Lock()
+
+    #Create and simulate a new session
+    #Will raise an exception if the ordered action lists can't be simulated
+    def createSession(self, teamBuildOrdersList):
+        #Simulate before taking the lock, so other sessions aren't held up
+        session = SimulationSession(secrets.token_urlsafe(16), teamBuildOrdersList)
+        with self.mLock:
+            self.mSessions[session.mSessionID] = session
+            self._dropIdleSessions()
+            self._dropLeastRecentlyUsedSessions()
+        return session
+
+    #@return None if there's no session with that ID (or it expired)
+    def getSession(self, sessionID):
+        with self.mLock:
+            self._dropIdleSessions()
+            session = self.mSessions.get(sessionID)
+            if session:
+                session.mLastAccessTime = time.monotonic()
+                self.mSessions.move_to_end(sessionID)
+            self._dropLeastRecentlyUsedSessions()
+            return session
+
+    #@return True if the session was deleted, False if there's no session with that ID
+    def deleteSession(self, sessionID):
+        with self.mLock:
+            return self.mSessions.pop(sessionID, None) != None
+
+    def getNumSessions(self):
+        with self.mLock:
+            return len(self.mSessions)
+
+    def _dropIdleSessions(self):
+        now = time.monotonic()
+        for sessionID in [sessionID for sessionID, session in self.mSessions.items() if now - session.mLastAccessTime > self.mIdleTimeoutSec]:
+            del self.mSessions[sessionID]
+
+    #Drop the least recently used sessions until we're within the limits. The most recently used session is always kept
+    def _dropLeastRecentlyUsedSessions(self):
+        totalActions = sum(session.getNumSimulatedActions() for session in self.mSessions.values())
+        while len(self.mSessions) > 1 and (len(self.mSessions) > self.mMaxSessions or totalActions > self.mMaxTotalActions):
+            sessionID, session = self.mSessions.popitem(last = False)
+            totalActions -= session.getNumSimulatedActions()
@@ -1,100 +1,644 @@
-from flask import Flask, request
+from flask import Flask, Response, request, g
 import os
+import gzip
+import time
+import zlib
 import pathlib
-from SimEngine.SimulationEngine import SimulationEngine
+from concurrent.futures import ThreadPoolExecutor
+from SimEngine.SimulationEngine import SimulationEngine, encodeJSON
+from SimEngine.SimulationConstants import SIMULATION_ENGINE_VERSION, Race
+from SimEngine.TimelineFilter import TimelineFilter
+from SimEngine.VariantComparison import compareVariants
+from SimEngine.Profiler import profileCall, writeCollapsedStacks, PROFILER_TYPES
+from SimEngine.WorkerPool import createProcessPoolExecutor, ENGINE_PRELOAD_MODULES
+from SimEngine.OpeningBook import OpeningBook
+from SimEngine.ResultCache import ResultCache, getResultKey, compressTimelines, decompressTimelines
+from RestAPI.SavedBuildStore import createSavedBuildStore, computeETag, ETagMismatchError, SAVED_BUILD_STORE_SQLITE
+from RestAPI.SimulationSession import SimulationSessionManager
+from RestAPI.Metrics import MetricsRegistry, REQUEST_LATENCY_BUCKETS_SEC, getExponentialBuckets
 import json
 
-SAVED_BUILD_STORAGE_DIR = os.path.join(pathlib.Path.home(), "WC3BuildOrderPlanner/SavedBuilds")
+SAVED_BUILD_STORAGE_ROOT_DIR = os.path.join(pathlib.Path.home(), "WC3BuildOrderPlanner")
+#Only used by the flat file store
+SAVED_BUILD_STORAGE_DIR = os.path.join(SAVED_BUILD_STORAGE_ROOT_DIR, "SavedBuilds")
+#Either "sqlite" (default) or "flatfile", to keep using one file per build in SAVED_BUILD_STORAGE_DIR
+SAVED_BUILD_STORE_TYPE = os.environ.get("WC3_SAVED_BUILD_STORE", SAVED_BUILD_STORE_SQLITE)
+
+#Clients should always revalidate with the ETag, since saved builds can change and simulation results depend on the engine version
+CACHE_CONTROL_REVALIDATE = "no-cache"
+
+#Limits for live editing sessions. Sessions keep a simulation in memory, so these bound how much memory they can use
+MAX_SESSIONS = int(os.environ.get("WC3_MAX_SESSIONS", 100))
+MAX_SESSION_ACTIONS = int(os.environ.get("WC3_MAX_SESSION_ACTIONS", 20000))
+SESSION_IDLE_TIMEOUT_SEC = int(os.environ.get("WC3_SESSION_IDLE_TIMEOUT_SEC", 30 * 60))
+
+#Variants of a build being compared are simulated in this many worker processes. 1 simulates them in the request's thread
+VARIANT_SIMULATION_WORKERS = int(os.environ.get("WC3_VARIANT_SIMULATION_WORKERS", min(4, os.cpu_count() or 1)))
+#Max number of variants that can be compared in one request
+MAX_VARIANTS = int(os.environ.get("WC3_MAX_VARIANTS", 16))
+
+#gzip defaults to 9, which is much slower for barely smaller timelines
+GZIP_COMPRESS_LEVEL = 6
+
+SIMULATION_STATS_HEADER = "X-Simulation-Stats"
+
+#Opening book that timelines requests starting with a common opening are simulated from (see SimEngine/OpeningBook.py). Loaded once at startup,
+#so restart the service after rebuilding it. There's no book until one is made with py -m SimEngine.OpeningBook
+OPENING_BOOK_FILE = os.environ.get("WC3_OPENING_BOOK_FILE", os.path.join(SAVED_BUILD_STORAGE_ROOT_DIR, "OpeningBook.pickle"))
+
+#Timelines requests are looked up in this on-disk cache of simulated timelines before simulating, and the timelines are added to it after
+#(see SimEngine/ResultCache.py). Every process of the service shares it, and it's kept across restarts
+RESULT_CACHE_FILE = os.environ.get("WC3_RESULT_CACHE_FILE", os.path.join(SAVED_BUILD_STORAGE_ROOT_DIR, "ResultCache.db"))
+#Max size of the compressed timelines in the result cache, after which the least recently used are evicted. 0 turns the cache off
+RESULT_CACHE_MAX_MB = int(os.environ.get("WC3_RESULT_CACHE_MAX_MB", 256))
+
+#Requests can only be profiled if this is set to true, since profiling slows the server down and profiles show the server's code
+ALLOW_PROFILING = os.environ.get("WC3_ALLOW_PROFILING", "false").lower() == "true"
+#Profiles requested with profileOutput=file are written here
+PROFILES_DIR = os.environ.get("WC3_PROFILES_DIR", os.path.join(SAVED_BUILD_STORAGE_ROOT_DIR, "Profiles"))
+PROFILE_FILE_HEADER = "X-Profile-File"
+
+#When serving with several processes, set this to a directory they all share, so /metrics includes the requests of every process
+METRICS_DIR = os.environ.get("WC3_METRICS_DIR")
 
 app = Flask(__name__)
 
-def createSavedBuildsDir():
-    pathlib.Path(SAVED_BUILD_STORAGE_DIR).mkdir(parents=True, exist_ok=True)
+#Storage is set up once here, rather than on every request
+savedBuildStore = createSavedBuildStore(SAVED_BUILD_STORE_TYPE, SAVED_BUILD_STORAGE_ROOT_DIR)
+
+simulationSessionManager = SimulationSessionManager(MAX_SESSIONS, MAX_SESSION_ACTIONS, SESSION_IDLE_TIMEOUT_SEC)
+
+metricsRegistry = MetricsRegistry(METRICS_DIR)
+metricsRegistry.describeCounter("wc3_http_requests_total", "Requests handled, by route, method and status code")
+metricsRegistry.describeHistogram("wc3_http_request_duration_seconds", "Time to handle requests, by route and method. Streamed responses are only timed until they start streaming",
+                                  REQUEST_LATENCY_BUCKETS_SEC)
+metricsRegistry.describeHistogram("wc3_http_payload_bytes", "Size of request and response bodies, by route and direction. Streamed responses aren't included",
+                                  getExponentialBuckets(256, 64 * 1024 * 1024))
+metricsRegistry.describeHistogram("wc3_simulated_simtime", "Simtime each simulated build order was simulated to", getExponentialBuckets(150, 36000))
+metricsRegistry.describeHistogram("wc3_simulation_events_executed", "Events executed (forwards or in reverse) while simulating each build order",
+                                  getExponentialBuckets(100, 1000000))
+metricsRegistry.describeCounter("wc3_cache_requests_total", "Lookups in the service's caches, by cache and result (hit or miss). The etag cache is conditional GETs "
+                                "that could be answered with a 304, the saved_build_timelines cache is timelines stored with saved builds, the opening_book "
+                                "cache is build orders simulated from an opening book state, and the result_cache cache is timelines requests found in the "
+                                "on-disk result cache")
+
+openingBook = OpeningBook.load(OPENING_BOOK_FILE)
+
+resultCache = ResultCache(RESULT_CACHE_FILE, RESULT_CACHE_MAX_MB * 1024 * 1024) if RESULT_CACHE_MAX_MB > 0 else None
+
+#Saved builds are simulated in the background after they are saved, so their timelines are ready by the time they're loaded
+#One worker is enough, and keeps the simulations from competing with requests for the CPU
+backgroundSimulationExecutor = ThreadPoolExecutor(max_workers = 1)
+
+#Worker processes are only started once variants are first compared. They're forked from a process with just the engine imported, not from the service
+variantSimulationExecutor = createProcessPoolExecutor(VARIANT_SIMULATION_WORKERS, ENGINE_PRELOAD_MODULES + ["SimEngine.VariantComparison"]) \
+                            if VARIANT_SIMULATION_WORKERS > 1 else None
+
+def getETagHeaders(etag):
+    return { "ETag": '"' + etag + '"', "Cache-Control": CACHE_CONTROL_REVALIDATE }
+
+#Returns True if the request's If-None-Match header matches the ETag passed in
+def requestMatchesETag(etag):
+    if not request.if_none_match:
+        return False
+    matches = request.if_none_match.contains(etag)
+    countCacheLookup("etag", matches)
+    return matches
+
+def countCacheLookup(cacheName, hit):
+    metricsRegistry.incrementCounter("wc3_cache_requests_total", { 'cache' : cacheName, 'result' : "hit" if hit else "miss" })
+
+#Record the simtime simulated and events executed of each of the engine's build orders
+def observeSimulation(simEngine):
+    for buildOrder in simEngine.getTeamBuildOrders():
+        metricsRegistry.observe("wc3_simulated_simtime", buildOrder.getCurrentSimTime())
+        metricsRegistry.observe("wc3_simulation_events_executed", len(buildOrder.mEventHandler.mEventsExecutedInOrder))
+        if openingBook.getNumOpenings() > 0 and buildOrder.getStats() == None:
+            countCacheLookup("opening_book", buildOrder.mNumActionsFromOpeningBook > 0)
+
+@app.before_request
+def startRequestTimer():
+    g.requestStartTime = time.perf_counter()
+
+@app.after_request
+def recordRequestMetrics(response):
+    #Label by the route's rule rather than the path, so there's one series per route, not one per saved build or session
+    route = request.url_rule.rule if request.url_rule != None else "unmatched"
+    metricsRegistry.incrementCounter("wc3_http_requests_total", { 'route' : route, 'method' : request.method, 'status' : response.status_code })
+    metricsRegistry.observe("wc3_http_request_duration_seconds", time.perf_counter() - g.requestStartTime, { 'route' : route, 'method' : request.method })
+    if request.content_length:
+        metricsRegistry.observe("wc3_http_payload_bytes", request.content_length, { 'route' : route, 'direction' : "request" })
+    if not response.is_streamed and response.content_length != None:
+        metricsRegistry.observe("wc3_http_payload_bytes", response.content_length, { 'route' : route, 'direction' : "response" })
+    return response
+
+#Request bodies are usually a JSON string of the JSON, but also accept the JSON itself
+def getRequestJSON():
+    requestJSON = request.get_json()
+    if isinstance(requestJSON, str):
+        requestJSON = json.loads(requestJSON)
+    return requestJSON
+
+#Timeline responses are compact JSON, unless the pretty=true query parameter is passed (for debugging)
+def isPrettyRequested():
+    return request.args.get("pretty", "false").lower() == "true"
+
+#Timeline responses are streamed in chunks if the stream=true query parameter is passed, so that long builds don't need the whole
+#response in memory. Not done for pretty responses, which are only for debugging
+def isStreamRequested():
+    return not isPrettyRequested() and request.args.get("stream", "false").lower() == "true"
+
+#Get the TimelineFilter from the request's query parameters (see get_timelines), or None if there aren't any
+#Will raise a ValueError if any of them are invalid
+def getTimelineFilterFromRequest():
+    args = request.args
+    if not any(arg in args for arg in ["startTime", "endTime", "timelineTypes", "timelineIDs", "activeOnly"]):
+        return None
+
+    startTime = int(args["startTime"]) if "startTime" in args else None
+    endTime = int(args["endTime"]) if "endTime" in args else None
+    timelineTypes = args["timelineTypes"].split(",") if "timelineTypes" in args else None
+    timelineIDs = [int(timelineID) for timelineID in args["timelineIDs"].split(",")] if "timelineIDs" in args else None
+    activeOnly = args.get("activeOnly", "false").lower() == "true"
+    return TimelineFilter(startTime, endTime, timelineTypes, timelineIDs, activeOnly)
+
+#Simulation stats (see SimulationStats) are added to timeline responses in the X-Simulation-Stats header if the stats=true query parameter is passed
+def isStatsRequested():
+    return request.args.get("stats", "false").lower() == "true"
+
+#@return Headers with the stats of each of the engine's build orders, as compact JSON
+def getStatsHeaders(simEngine):
+    return { SIMULATION_STATS_HEADER : encodeJSON(simEngine.getStatsAsDictsForSerialization(), False) }
+
+def isGzipAccepted():
+    return request.accept_encodings.quality("gzip") > 0
+
+#Each encoding of the same timelines (pretty or compact, gzipped or not) needs its own ETag
+#Streamed JSON is the same as compact JSON, but it's gzipped differently
+def getTimelinesETag(etag, pretty, gzipped, streamed = False):
+    if pretty:
+        etag += "-pretty"
+    if gzipped:
+        etag += "-gzip"
+        if streamed:
+            etag += "-stream"
+    return etag
+
+#@param extraHeaders - Any other headers to add, like the simulation stats
+def getTimelinesHeaders(etag, gzipped, extraHeaders = None):
+    headers = getETagHeaders(etag) if etag != None else {}
+    if extraHeaders:
+        headers.update(extraHeaders)
+    headers["Content-Type"] = "application/json"
+    headers["Vary"] = "Accept-Encoding"
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return headers
+
+#Gzip chunks of a str as they are generated
+def gzipChunks(chunks):
+    #31 means a gzip header and trailer, rather than zlib's
+    compressor = zlib.compressobj(GZIP_COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressedChunk = compressor.compress(chunk.encode("utf-8"))
+        if compressedChunk:
+            yield compressedChunk
+    yield compressor.flush()
+
+#@param body - The timelines JSON, either as a str or as already gzipped bytes
+def makeTimelinesResponse(body, etag, gzipped, extraHeaders = None):
+    if gzipped and isinstance(body, str):
+        #A fixed mtime keeps the gzipped bytes the same every time, to match the ETag
+        body = gzip.compress(body.encode("utf-8"), GZIP_COMPRESS_LEVEL, mtime = 0)
+
+    #Code 200, OK
+    return (body, 200, getTimelinesHeaders(etag, gzipped, extraHeaders))
+
+#@param compressedTimelines - Gzipped compact timelines JSON, as stored with saved builds and in the result cache
+def makeCompressedTimelinesResponse(compressedTimelines, etag, pretty, gzipped):
+    #Serve the stored gzip directly if the client can take it
+    if gzipped and not pretty:
+        return makeTimelinesResponse(compressedTimelines, etag, gzipped)
+
+    timelinesJSON = decompressTimelines(compressedTimelines)
+    if pretty:
+        timelinesJSON = encodeJSON(json.loads(timelinesJSON), pretty)
+    return makeTimelinesResponse(timelinesJSON, etag, gzipped)
+
+#@param chunks - Generator of the timelines JSON, in chunks
+def makeStreamedTimelinesResponse(chunks, etag, gzipped, extraHeaders = None):
+    if gzipped:
+        chunks = gzipChunks(chunks)
+
+    #Code 200, OK
+    return Response(chunks, 200, getTimelinesHeaders(etag, gzipped, extraHeaders))
+
+#Get the ETags from the request's If-Match header
+#@return None if the request doesn't have one (or has "*", since updating already requires the build to exist)
+def getIfMatchETags():
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    return request.if_match.as_set()
+
+#Simulate an ordered action list JSON and return the simulation engine
+#Will raise an exception if the action list can't be simulated
+def simulateActionLists(orderedActionList, collectStats = False):
+    simEngine = SimulationEngine()
+    simEngine.loadStateFromActionListsJSON(orderedActionList, collectStats, openingBook)
+    observeSimulation(simEngine)
+    return simEngine
+
+#Simulate an ordered action list JSON and return the timelines JSON
+#Will raise an exception if the action list can't be simulated
+def simulateTimelinesJSON(orderedActionList, pretty = False):
+    return simulateActionLists(orderedActionList).getJSONStateAsTimelines(pretty)
+
+#Simulate a saved build and store the compressed (compact) timelines with it
+#@return The compressed timelines
+def precomputeSavedBuildTimelines(name, orderedActionList, buildETag):
+    compressedTimelines = gzip.compress(simulateTimelinesJSON(orderedActionList).encode("utf-8"), GZIP_COMPRESS_LEVEL, mtime = 0)
+    savedBuildStore.setSimulatedTimelines(name, buildETag, SIMULATION_ENGINE_VERSION, compressedTimelines)
+    return compressedTimelines
+
+def _precomputeSavedBuildTimelinesInBackground(name, orderedActionList, buildETag):
+    try:
+        precomputeSavedBuildTimelines(name, orderedActionList, buildETag)
+    except Exception as e:
+        #Builds don't have to be valid to be saved. These will just be simulated (and return the error) when their timelines are requested
+        print("Could not precompute timelines for saved build", name, "-", e)
+
+def schedulePrecomputeSavedBuildTimelines(name, orderedActionList, buildETag):
+    backgroundSimulationExecutor.submit(_precomputeSavedBuildTimelinesInBackground, name, orderedActionList, buildETag)
+
+#Get the result cache key of a timelines request, or None if the result cache isn't used for it
+#Streamed responses and ones with stats need the simulation itself, so they aren't cached
+#Will raise a ValueError if the ordered action list isn't valid JSON
+def getTimelinesResultKey(orderedActionList, timelineFilter, streamed, collectStats):
+    if resultCache == None or streamed or collectStats:
+        return None
+    if isinstance(orderedActionList, str):
+        orderedActionList = json.loads(orderedActionList)
+    options = {}
+    if timelineFilter != None:
+        options['timelineFilter'] = { 'startTime' : timelineFilter.mStartTime, 'endTime' : timelineFilter.mEndTime,
+                                      'timelineTypes' : sorted(timelineFilter.mTimelineTypes) if timelineFilter.mTimelineTypes != None else None,
+                                      'timelineIDs' : sorted(timelineFilter.mTimelineIDs) if timelineFilter.mTimelineIDs != None else None,
+                                      'activeOnly' : timelineFilter.mActiveOnly }
+    return getResultKey(orderedActionList, options)
+
+#Simulate the request's ordered action list and encode its timelines under a profiler (see Profiler.py)
+#By default, the collapsed stacks of the profile are returned instead of the timelines. With profileOutput=file, they are written to
+#PROFILES_DIR, named after the hash of the request, and the timelines are returned with the file's name in the X-Profile-File header
+def makeProfiledTimelinesResponse(profilerType):
+    if not ALLOW_PROFILING:
+        #Code 403, Forbidden
+        return ("Profiling is not allowed on this server", 403)
+    if profilerType not in PROFILER_TYPES:
+        #Code 400, Bad Request
+        return ("Unknown profiler: " + profilerType + ". Must be one of " + ", ".join(PROFILER_TYPES), 400)
+
+    orderedActionList = request.get_json()
+    pretty = isPrettyRequested()
+    try:
+        timelineFilter = getTimelineFilterFromRequest()
+        timelinesJSON, collapsedStacks = profileCall(lambda: simulateActionLists(orderedActionList).getJSONStateAsTimelines(pretty, timelineFilter), profilerType)
+    except KeyError as keyError:
+        #Code 400, Bad Request
+        return ("KeyError: " + str(keyError), 400)
+    except Exception as e:
+        return ("Exception: " + str(e), 400)
+
+    if request.args.get("profileOutput", "inline").lower() == "file":
+        requestHash = computeETag(SIMULATION_ENGINE_VERSION.encode("utf-8") + b":" + request.get_data())
+        filePath = writeCollapsedStacks(PROFILES_DIR, requestHash + "." + profilerType, collapsedStacks)
+        return makeTimelinesResponse(timelinesJSON, None, isGzipAccepted(), { PROFILE_FILE_HEADER : os.path.basename(filePath) })
+
+    #Code 200, OK
+    return (collapsedStacks, 200, { "Content-Type" : "text/plain; charset=utf-8" })
 
 #Given an ordered action list as a JSON, simulate and return the timelines
+#Optional query parameters:
+#pretty - If true, return indented JSON
+#stream - If true, stream the JSON in chunks as it is encoded
+#startTime, endTime - Only return actions that overlap this simtime window
+#timelineTypes - Comma separated. Only return timelines of these types
+#timelineIDs - Comma separated. Only return timelines with these IDs
+#activeOnly - If true, don't return the inactive timelines
+#stats - If true, return what the engine did while simulating in the X-Simulation-Stats header
+#profile - sample or cprofile, to profile the simulation (see makeProfiledTimelinesResponse). Only if the server allows it
+#profileOutput - inline (default) or file
 @app.route("/simulation-results/timelines", methods=['GET'])
 def get_timelines():
+    profilerType = request.args.get("profile")
+    if profilerType != None:
+        return makeProfiledTimelinesResponse(profilerType)
+
+    pretty = isPrettyRequested()
+    streamed = isStreamRequested()
+    gzipped = isGzipAccepted()
+    collectStats = isStatsRequested()
+    try:
+        timelineFilter = getTimelineFilterFromRequest()
+    except ValueError as valueError:
+        #Code 400, Bad Request
+        return ("ValueError: " + str(valueError), 400)
+
+    #Simulation results only depend on the input, the query parameters and the engine version, so we can tell whether the client
+    #already has this result without simulating anything
+    etag = getTimelinesETag(computeETag(SIMULATION_ENGINE_VERSION.encode("utf-8") + b":" + request.query_string + b":" + request.get_data()),
+                            pretty, gzipped, streamed)
+    if requestMatchesETag(etag):
+        #Code 304, Not Modified
+        return ("", 304, getETagHeaders(etag))
+
     orderedActionList = request.get_json()
-    simEngine = SimulationEngine() 
     try:
-        simEngine.loadStateFromActionListsJSON(orderedActionList)
+        resultKey = getTimelinesResultKey(orderedActionList, timelineFilter, streamed, collectStats)
+    except ValueError:
+        #Simulating it will return the error
+        resultKey = None
+    if resultKey != None:
+        compressedTimelines = resultCache.get(resultKey)
+        countCacheLookup("result_cache", compressedTimelines != None)
+        if compressedTimelines != None:
+            return makeCompressedTimelinesResponse(compressedTimelines, etag, pretty, gzipped)
+
+    #Simulate before streaming anything, so errors can still be returned as a 400
+    try:
+        simEngine = simulateActionLists(orderedActionList, collectStats)
     except KeyError as keyError:
         #Code 400, Bad Request
         return ("KeyError: " + str(keyError), 400)
     except Exception as e:
         return ("Exception: " + str(e), 400)
 
-    #Code 200, OK
-    return (simEngine.getJSONStateAsTimelines(), 200)
+    if resultKey != None:
+        compressedTimelines = compressTimelines(simEngine.getJSONStateAsTimelines(False, timelineFilter))
+        resultCache.put(resultKey, compressedTimelines)
+        return makeCompressedTimelinesResponse(compressedTimelines, etag, pretty, gzipped)
+
+    extraHeaders = getStatsHeaders(simEngine) if collectStats else None
+    if streamed:
+        return makeStreamedTimelinesResponse(simEngine.iterJSONStateAsTimelines(timelineFilter = timelineFilter), etag, gzipped, extraHeaders)
+    return makeTimelinesResponse(simEngine.getJSONStateAsTimelines(pretty, timelineFilter), etag, gzipped, extraHeaders)
+
+#Given an ordered action list and the timeline versions the client already has, simulate and return only the timelines that changed
+#Takes a JSON of { "orderedActionLists" : <same as /simulation-results/timelines>, "knownTimelineVersions" : [{ timelineID : version }, ...] }
+#with one dict of versions for each build order. Leave knownTimelineVersions empty to get every timeline (and its version)
+@app.route("/simulation-results/timeline-deltas", methods=['GET'])
+def get_timeline_deltas():
+    gzipped = isGzipAccepted()
+    try:
+        deltaRequest = getRequestJSON()
+        simEngine = SimulationEngine()
+        simEngine.loadStateFromActionLists(deltaRequest['orderedActionLists'], openingBook = openingBook)
+        timelineDeltasJSON = simEngine.getJSONStateAsTimelineDeltas(deltaRequest.get('knownTimelineVersions', []), isPrettyRequested())
+    except KeyError as keyError:
+        #Code 400, Bad Request
+        return ("KeyError: " + str(keyError), 400)
+    except Exception as e:
+        return ("Exception: " + str(e), 400)
+
+    #No ETag, since the response depends on what the client already has
+    return makeTimelinesResponse(timelineDeltasJSON, None, gzipped)
+
+#Compare variants of a build that are the same up to some action, and differ after it. The shared actions are only simulated once
+#Takes a JSON of { "race" : <race>, "orderedActionList" : <the shared actions>, "variants" : [<the actions after the shared ones>, ...],
+#"summaryActionIndexes" : [<indexes of actions to compare the time and resources after>, ...] }
+#Returns the timelines and summary of each variant, and how its summary differs from the first variant's
+@app.route("/simulation-results/variants", methods=['GET'])
+def get_variants():
+    pretty = isPrettyRequested()
+    gzipped = isGzipAccepted()
+    #Same as for get_timelines, the result only depends on the input, the query parameters and the engine version
+    etag = getTimelinesETag(computeETag(SIMULATION_ENGINE_VERSION.encode("utf-8") + b":" + request.query_string + b":" + request.get_data()),
+                            pretty, gzipped)
+    if requestMatchesETag(etag):
+        #Code 304, Not Modified
+        return ("", 304, getETagHeaders(etag))
+
+    try:
+        variantsRequest = getRequestJSON()
+        variants = variantsRequest['variants']
+        if len(variants) == 0 or len(variants) > MAX_VARIANTS:
+            #Code 400, Bad Request
+            return ("Must have between 1 and " + str(MAX_VARIANTS) + " variants", 400)
+        comparison = compareVariants(Race[variantsRequest['race']], variantsRequest['orderedActionList'], variants,
+                                     variantsRequest.get('summaryActionIndexes', []), variantSimulationExecutor)
+    except KeyError as keyError:
+        #Code 400, Bad Request
+        return ("KeyError: " + str(keyError), 400)
+    except Exception as e:
+        return ("Exception: " + str(e), 400)
+
+    return makeTimelinesResponse(encodeJSON(comparison, pretty), etag, gzipped)
+
+#Get the response for a live editing session's timelines. Takes the same query parameters as get_timelines, except for stream
+#Must hold the session's lock
+def makeSessionTimelinesResponse(session):
+    try:
+        timelineFilter = getTimelineFilterFromRequest()
+    except ValueError as valueError:
+        #Code 400, Bad Request
+        return ("ValueError: " + str(valueError), 400)
+    #Not streamed, since the session could be edited while the response is streaming
+    timelinesJSON = session.getSimEngine().getJSONStateAsTimelines(isPrettyRequested(), timelineFilter)
+    return makeTimelinesResponse(timelinesJSON, None, isGzipAccepted())
+
+#Start a live editing session. Takes the same ordered action list JSON as /simulation-results/timelines
+#The session keeps the simulation in memory, so edits to it only re-simulate what they have to
+@app.route("/sessions", methods=['POST'])
+def create_session():
+    try:
+        session = simulationSessionManager.createSession(getRequestJSON())
+    except KeyError as keyError:
+        #Code 400, Bad Request
+        return ("KeyError: " + str(keyError), 400)
+    except Exception as e:
+        return ("Exception: " + str(e), 400)
+
+    #Code 201, Created
+    return (json.dumps({ 'sessionID' : session.mSessionID }), 201, { "Location": "/sessions/" + session.mSessionID, "Content-Type": "application/json" })
+
+#Get the timelines of a live editing session
+@app.route("/sessions/<string:sessionID>/timelines", methods=['GET'])
+def get_session_timelines(sessionID):
+    session = simulationSessionManager.getSession(sessionID)
+    if session == None:
+        #404, Not Found
+        return ("", 404)
+
+    with session.mLock:
+        return makeSessionTimelinesResponse(session)
+
+#Edit the actions of a live editing session, and get the updated timelines
+#Takes a JSON of { "op" : "append" | "insert" | "delete", "buildOrderIndex" : <default 0>, "actionIndex" : <for insert and delete>, "action" : <for append and insert> }
+@app.route("/sessions/<string:sessionID>/actions", methods=['PATCH'])
+def edit_session_actions(sessionID):
+    session = simulationSessionManager.getSession(sessionID)
+    if session == None:
+        #404, Not Found
+        return ("", 404)
+
+    with session.mLock:
+        try:
+            session.applyEdit(getRequestJSON())
+        except KeyError as keyError:
+            #Code 400, Bad Request
+            return ("KeyError: " + str(keyError), 400)
+        except Exception as e:
+            return ("Exception: " + str(e), 400)
+
+        return makeSessionTimelinesResponse(session)
+
+#End a live editing session
+@app.route("/sessions/<string:sessionID>", methods=['DELETE'])
+def delete_session(sessionID):
+    if not simulationSessionManager.deleteSession(sessionID):
+        #404, Not Found
+        return ("", 404)
+
+    #Code 204, No Content
+    return ("", 204)
 
 #Get all saved build names as a JSON
+#Optional query parameters:
+#prefix - Only return builds whose names start with this
+#offset, limit - For pagination
+#details - If true, return the index entry (name, race, size, numActions, modifiedTime) for each build instead of just the name
 @app.route("/saved-builds", methods=['GET'])
 def get_builds():
-    createSavedBuildsDir()
-    builds = os.listdir(SAVED_BUILD_STORAGE_DIR)
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = request.args.get("limit")
+        limit = int(limit) if limit != None else None
+    except ValueError as valueError:
+        #Code 400, Bad Request
+        return ("ValueError: " + str(valueError), 400)
+
+    buildInfos = savedBuildStore.listBuilds(request.args.get("prefix", ""), offset, limit)
+    if request.args.get("details", "false").lower() == "true":
+        builds = [buildInfo.getAsDictForSerialization() for buildInfo in buildInfos]
+    else:
+        builds = [buildInfo.mName for buildInfo in buildInfos]
+
     #Code 200, OK
     return (json.dumps(builds), 200)
 
 #Save a build (CREATE)
 @app.route("/saved-builds/<string:name>", methods=['POST'])
 def create_build(name):
-    createSavedBuildsDir()
     orderedActionList = request.get_json()
-    filePath = os.path.join(SAVED_BUILD_STORAGE_DIR, name)
 
-    if not os.path.exists(filePath):
-        with open(filePath, "w") as f:
-            f.write(orderedActionList)
-    else:
+    etag = savedBuildStore.createBuild(name, orderedActionList)
+    if etag == None:
         #Code 409, Conflict
         return ("", 409)
+    schedulePrecomputeSavedBuildTimelines(name, orderedActionList, etag)
 
     #Code 201, Created
-    return ("", 201)
+    return ("", 201, getETagHeaders(etag))
 
 #Load a saved build (READ)
 @app.route("/saved-builds/<string:name>", methods=['GET'])
 def get_build(name):
-    createSavedBuildsDir()
-    filePath = os.path.join(SAVED_BUILD_STORAGE_DIR, name)
+    #Only the ETag in the index is needed to answer a conditional GET
+    etag = savedBuildStore.getETag(name)
+    if etag != None and requestMatchesETag(etag):
+        #Code 304, Not Modified
+        return ("", 304, getETagHeaders(etag))
 
-    fileAsStr = ""
-    if os.path.exists(filePath):
-        with open(filePath, "r") as f:
-            fileAsStr = f.read()
-    else:
+    savedBuild = savedBuildStore.getBuild(name)
+    if savedBuild == None:
         #404, Not Found
         return ("", 404)
+    buildAsStr, etag = savedBuild
 
     #Code 200, OK
-    return (fileAsStr, 200)
+    return (buildAsStr, 200, getETagHeaders(etag))
+
+#Get the simulated timelines for a saved build
+#These are simulated and stored when the build is saved, so this normally doesn't need to simulate anything
+#Optional query parameters:
+#pretty - If true, return indented JSON
+@app.route("/saved-builds/<string:name>/timelines", methods=['GET'])
+def get_build_timelines(name):
+    buildETag = savedBuildStore.getETag(name)
+    if buildETag == None:
+        #404, Not Found
+        return ("", 404)
+
+    pretty = isPrettyRequested()
+    gzipped = isGzipAccepted()
+    #Timelines only change if the build or the engine version changes
+    etag = getTimelinesETag(computeETag(SIMULATION_ENGINE_VERSION + ":" + buildETag), pretty, gzipped)
+    if requestMatchesETag(etag):
+        #Code 304, Not Modified
+        return ("", 304, getETagHeaders(etag))
+
+    compressedTimelines = savedBuildStore.getSimulatedTimelines(name, buildETag, SIMULATION_ENGINE_VERSION)
+    countCacheLookup("saved_build_timelines", compressedTimelines != None)
+    if compressedTimelines == None:
+        #Not simulated yet (or simulated by an older engine version), so simulate now
+        savedBuild = savedBuildStore.getBuild(name)
+        if savedBuild == None:
+            return ("", 404)
+        try:
+            compressedTimelines = precomputeSavedBuildTimelines(name, savedBuild[0], savedBuild[1])
+        except KeyError as keyError:
+            #Code 400, Bad Request
+            return ("KeyError: " + str(keyError), 400)
+        except Exception as e:
+            return ("Exception: " + str(e), 400)
+
+    return makeCompressedTimelinesResponse(compressedTimelines, etag, pretty, gzipped)
 
 #Update an existing build (UPDATE)
+#If the request has an If-Match header, the build is only updated if it hasn't been changed since the client got that ETag
 @app.route("/saved-builds/<string:name>", methods=['PUT'])
 def update_build(name):
-    createSavedBuildsDir()
     orderedActionList = request.get_json()
-    filePath = os.path.join(SAVED_BUILD_STORAGE_DIR, name)
 
-    if os.path.exists(filePath):
-        with open(filePath, "w") as f:
-            f.write(orderedActionList)
-    else:
+    #Updating the build also invalidates its stored timelines
+    try:
+        etag = savedBuildStore.updateBuild(name, orderedActionList, getIfMatchETags())
+    except ETagMismatchError as etagMismatchError:
+        #Code 412, Precondition Failed
+        return ("ETagMismatchError: " + str(etagMismatchError), 412, getETagHeaders(savedBuildStore.getETag(name)))
+    if etag == None:
         return ("", 404)
+    schedulePrecomputeSavedBuildTimelines(name, orderedActionList, etag)
 
     #Code 204, No Content
-    return ("", 204)
+    return ("", 204, getETagHeaders(etag))
 
 #Delete a saved build (DELETE)
 @app.route("/saved-builds/<string:name>", methods=['DELETE'])
 def delete_build(name):
-    createSavedBuildsDir()
-    filePath = os.path.join(SAVED_BUILD_STORAGE_DIR, name)
-
-    if os.path.exists(filePath):
-        os.remove(filePath)
-    else:
+    if not savedBuildStore.deleteBuild(name):
         return ("", 404)
 
     #Code 204, no content
-    return ("", 204)
\ No newline at end of file
+    return ("", 204)
+
+#Get the service's metrics in the Prometheus text format
+#Counters and histograms include every process sharing WC3_METRICS_DIR. The gauges are current values, read when this is requested
+@app.route("/metrics", methods=['GET'])
+def get_metrics():
+    aggregatedValues = metricsRegistry.getAggregatedValues()
+    cacheLookups = {}
+    for labels, count in aggregatedValues["wc3_cache_requests_total"].items():
+        labels = dict(labels)
+        hits, total = cacheLookups.get(labels['cache'], (0, 0))
+        cacheLookups[labels['cache']] = (hits + (count if labels['result'] == "hit" else 0), total + count)
+
+    gauges = [
+        ("wc3_saved_builds", "Number of saved builds", [({}, savedBuildStore.getNumBuilds())]),
+        ("wc3_saved_builds_bytes", "Total size of the saved builds", [({}, savedBuildStore.getTotalSize())]),
+        ("wc3_result_cache_bytes", "Total size of the compressed timelines in the result cache", [({}, resultCache.getTotalSize())] if resultCache != None else []),
+        ("wc3_sessions", "Number of live editing sessions in this process", [({}, simulationSessionManager.getNumSessions())]),
+        ("wc3_cache_hit_ratio", "Fraction of lookups in each cache that were hits", [({ 'cache' : cache }, hits / total) for cache, (hits, total) in sorted(cacheLookups.items())])
+    ]
+
+    #Code 200, OK
+    return (metricsRegistry.getAsPrometheusText(gauges, aggregatedValues), 200, { "Content-Type" : "text/plain; version=0.0.4; charset=utf-8" })
@@ -1,7 +1,6 @@
 from enum import Enum, auto
 from SimEngine.Worker import WorkerTask
 from SimEngine.Trigger import Trigger
-from pydoc import locate
 
 class ActionType(Enum):
     BuildUnit = auto()
@@ -59,8 +58,8 @@ class Action:
     #This base class method just gets action arguments that are common to all actions and then determines which sub-class method to call
     @staticmethod
     def getActionFromDict(actionDict):
-        #See https://stackoverflow.com/questions/11775460/lexical-cast-from-string-to-type - locate is used to find the type
-        actionType = locate('SimEngine.Action.' + actionDict['actionType'])
+        #Will raise a KeyError for an unknown action type
+        actionType = ACTION_CLASSES_BY_NAME[actionDict['actionType']]
 
         trigger = Trigger.getTriggerFromDict(actionDict['trigger'])
 
@@ -298,4 +297,8 @@ class AutomaticAction(Action):
     #Automatic actions don't concern the user and won't be deserialized
     @staticmethod
     def getActionFromDict(actionDict, trigger, name, goldCost, lumberCost, duration, requiredTimelineType, actionID, travelTime):
-        return None
\ No newline at end of file
+        return None
+
+#Action sub-classes by their name, which is the 'actionType' of their dicts. Looked up directly rather than with pydoc.locate, which is slow to import
+ACTION_CLASSES_BY_NAME = { actionClass.__name__ : actionClass for actionClass in [BuildUnitAction, BuildStructureAction, ShopAction, WorkerMovementAction,
+                                                                                  BuildUpgradeAction, AutomaticAction] }
@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+
+#Reads builds from files, for the tools that work on many of them (like main.py and the opening book)
+#A build file is a list of build orders like the body of /simulation-results/timelines, or a single build order. A JSONL file has one on each line
+
+#Get the team build orders of a build file's JSON. A single build order is treated as a team of one
+def getTeamBuildOrders(buildJSON):
+    return buildJSON if isinstance(buildJSON, list) else [buildJSON]
+
+#Yields (name, team build orders list) for every build in the inputs, in order
+#Each input is a build file (.json), a JSONL file (.jsonl), a directory of either, or "-" for JSONL on stdin
+#Builds in JSONL are named <file name>:<line number>. Others are named after their file, without the extension
+def iterBuilds(inputPaths):
+    for inputPath in inputPaths:
+        if inputPath == "-":
+            yield from _iterJSONLBuilds("stdin", sys.stdin)
+        elif os.path.isdir(inputPath):
+            for fileName in sorted(os.listdir(inputPath)):
+                filePath = os.path.join(inputPath, fileName)
+                if (fileName.endswith(".json") or fileName.endswith(".jsonl")) and os.path.isfile(filePath):
+                    yield from _iterFileBuilds(filePath)
+        else:
+            yield from _iterFileBuilds(inputPath)
+
+def _iterFileBuilds(filePath):
+    fileName = os.path.basename(filePath)
+    with open(filePath, 'r') as file:
+        if fileName.endswith(".jsonl"):
+            yield from _iterJSONLBuilds(os.path.splitext(fileName)[0], file)
+        else:
+            yield os.path.splitext(fileName)[0], getTeamBuildOrders(json.loads(file.read()))
+
+def _iterJSONLBuilds(name, lines):
+    for lineNumber, line in enumerate(lines, 1):
+        if line.strip():
+            yield name + ":" + str(lineNumber), getTeamBuildOrders(json.loads(line))
@@ -7,56 +7,91 @@ from SimEngine.ResourceSourceTimeline import GoldMineTimeline, CopseOfTreesTimel
 from SimEngine.Action import ActionType, Action
 from SimEngine.Event import Event
 from SimEngine.ResourceBank import ResourceBank
+from SimEngine.SimulationStats import SimulationStats
+
+import pickle
+from time import perf_counter
 
 class MapStartingPosition:
-    def __init__(self, name, lumberTripTravelTimeSec, goldTripTravelTimeSec):
+    #@param timeToWalkToMineSec - Time it takes a peon or peasant to walk between the town hall and the gold mine, one way
+    def __init__(self, name, lumberTripTravelTimeSec, goldTripTravelTimeSec, timeToWalkToMineSec = 2):
         self.mName = name
         self.mLumberTripTravelTimeSec = lumberTripTravelTimeSec
         self.mLumberTravelTimeIncreasePerTreeChoppedSec = 0
         self.mGoldTripTravelTimeSec = goldTripTravelTimeSec
         #Only applies when fewer than 5 workers. Otherwise will just be 5s each
         self.mGoldTripTravelTimeWithMicroSec = 5
+        self.mTimeToWalkToMineSec = timeToWalkToMineSec
+
+#(race, time to walk to the mine) -> the timelines build orders start with. Built once per process, since cloning them is much faster than
+#constructing them for every build order
+_startingTimelineTemplates = {}
+
+#Get the timelines a build order of the race starts with on the map, in timeline ID order
+#They're shared by every build order, so they have no event handler or resources and must not be changed. Clone them with Timeline.cloneForBuildOrder
+def getStartingTimelineTemplates(race, mapStartingPosition):
+    key = (race, mapStartingPosition.mTimeToWalkToMineSec)
+    templates = _startingTimelineTemplates.get(key)
+    if templates == None:
+        templates = tuple(_createStartingTimelines(race, mapStartingPosition.mTimeToWalkToMineSec))
+        _startingTimelineTemplates[key] = templates
+    return templates
+
+def _createStartingTimelines(race, timeToWalkToMineSec):
+    timelines = []
+    getNextTimelineID = lambda: len(timelines)
+
+    timelines.append(GoldMineTimeline(timelineType = TIMELINE_TYPE_GOLD_MINE, timelineID = getNextTimelineID(), race = race, currentResources = None, eventHandler = None,
+                                      timeToWalkToMineSec = timeToWalkToMineSec))
+    #TODO: Maps generally have juse two sides of the trees to gather from that you think of as distinct. However, one side is closer, so we will just use the one side, for now...
+    timelines.append(CopseOfTreesTimeline(timelineType = TIMELINE_TYPE_COPSE_OF_TREES, timelineID = getNextTimelineID(), eventHandler = None, currentResources = None))
+
+    #TODO: Adding these always for now, but later can have them only on some maps
+    timelines.append(Timeline(timelineType = "Tavern", timelineID = getNextTimelineID(), eventHandler = None))
+    timelines.append(Timeline(timelineType = "Goblin Merchant", timelineID = getNextTimelineID(), eventHandler = None))
+
+    if race == Race.NIGHT_ELF:
+        #Give initial starting units
+        for i in range(5):
+            timelines.append(WispTimeline(timelineID = getNextTimelineID(), eventHandler = None))
+        timelines.append(Timeline(timelineType = "Tree of Life", timelineID = getNextTimelineID(), eventHandler = None))
+    elif race == Race.ORC:
+        #Give initial starting units
+        for i in range(5):
+            timelines.append(PeonTimeline(timelineID = getNextTimelineID(), eventHandler = None))
+        timelines.append(Timeline(timelineType = "Great Hall", timelineID = getNextTimelineID(), eventHandler = None))
+    elif race == Race.HUMAN:
+        #Give initial starting units
+        for i in range(5):
+            timelines.append(PeasantTimeline(timelineID = getNextTimelineID(), eventHandler = None))
+        timelines.append(Timeline(timelineType = "Town Hall", timelineID = getNextTimelineID(), eventHandler = None))
+    return timelines
 
 class BuildOrder:
-    def __init__(self, race):
+    #@param mapStartingPosition - The MapStartingPosition to simulate on. Defaults to the ideal map and position
+    #@param collectStats - If True, count what the engine does while simulating (see SimulationStats and getStats)
+    def __init__(self, race, mapStartingPosition = None, collectStats = False):
         #All actions that have been executed, in order. If an action in a list of actions we are executing fails, we won't add the rest (so that last one in this list will be the failed one)
         self.mOrderedActionList = []
         self.mActiveTimelines = []
         self.mInactiveTimelines = []
         self.mRace = race
-        self.mMapStartingPosition = MapStartingPosition(name = "Ideal_Map_Ideal_Position", lumberTripTravelTimeSec=15, goldTripTravelTimeSec=5) 
-
-        self.mNextTimelineID = 0
+        self.mMapStartingPosition = mapStartingPosition
+        if self.mMapStartingPosition == None:
+            self.mMapStartingPosition = MapStartingPosition(name = "Ideal_Map_Ideal_Position", lumberTripTravelTimeSec=15, goldTripTravelTimeSec=5) 
 
         self.mCurrentResources = ResourceBank(race)
         self.mEventHandler = EventHandler()
         self.mCurrentSimTime = 0
 
-        goldMineTimeline = GoldMineTimeline(timelineType = TIMELINE_TYPE_GOLD_MINE, timelineID = self.getNextTimelineID(), race = self.mRace, currentResources = self.mCurrentResources, eventHandler=self.mEventHandler)
-        self.mInactiveTimelines.append(goldMineTimeline)
-        #TODO: Maps generally have juse two sides of the trees to gather from that you think of as distinct. However, one side is closer, so we will just use the one side, for now...
-        copseOfTreesTimeline = CopseOfTreesTimeline(timelineType = TIMELINE_TYPE_COPSE_OF_TREES, timelineID = self.getNextTimelineID(), eventHandler = self.mEventHandler, currentResources = self.mCurrentResources)
-        self.mInactiveTimelines.append(copseOfTreesTimeline)
-
-        #TODO: Adding these always for now, but later can have them only on some maps
-        self.mInactiveTimelines.append(Timeline(timelineType = "Tavern", timelineID = self.getNextTimelineID(), eventHandler = self.mEventHandler))
-        self.mInactiveTimelines.append(Timeline(timelineType = "Goblin Merchant", timelineID = self.getNextTimelineID(), eventHandler = self.mEventHandler))
+        self.mStats = SimulationStats() if collectStats else None
+        self.mEventHandler.mStats = self.mStats
+        #Number of the first actions that weren't simulated by this build order, but were in the opening book state it started from
+        self.mNumActionsFromOpeningBook = 0
 
-        if self.mRace == Race.NIGHT_ELF:
-            #Give initial starting units
-            for i in range(5):
-                self.mInactiveTimelines.append(WispTimeline(timelineID = self.getNextTimelineID(), eventHandler=self.mEventHandler))
-            self.mInactiveTimelines.append(Timeline(timelineType = "Tree of Life", timelineID = self.getNextTimelineID(), eventHandler = self.mEventHandler))
-        elif self.mRace == Race.ORC:
-            #Give initial starting units
-            for i in range(5):
-                self.mInactiveTimelines.append(PeonTimeline(timelineID = self.getNextTimelineID(), eventHandler=self.mEventHandler))
-            self.mInactiveTimelines.append(Timeline(timelineType = "Great Hall", timelineID = self.getNextTimelineID(), eventHandler = self.mEventHandler))
-        elif self.mRace == Race.HUMAN:
-            #Give initial starting units
-            for i in range(5):
-                self.mInactiveTimelines.append(PeasantTimeline(timelineID = self.getNextTimelineID(), eventHandler=self.mEventHandler))
-            self.mInactiveTimelines.append(Timeline(timelineType = "Town Hall", timelineID = self.getNextTimelineID(), eventHandler = self.mEventHandler))
+        for templateTimeline in getStartingTimelineTemplates(race, self.mMapStartingPosition):
+            self.mInactiveTimelines.append(templateTimeline.cloneForBuildOrder(self.mEventHandler, self.mCurrentResources))
+        self.mNextTimelineID = len(self.mInactiveTimelines)
 
     def simulateOrderedActionList(self, orderedActionList):
         for action in orderedActionList:
@@ -67,6 +102,16 @@ class BuildOrder:
         return True
 
     def simulateAction(self, action):
+        if self.mStats == None:
+            return self._simulateAction(action)
+
+        startTime = perf_counter()
+        try:
+            return self._simulateAction(action)
+        finally:
+            self.mStats.addAction(action.getTrigger().mTriggerType, perf_counter() - startTime)
+
+    def _simulateAction(self, action):
         self.mOrderedActionList.append(action)
         if action.getTrigger().mTriggerType == TriggerType.GOLD_AMOUNT:
             if not self._simulateUntilResourcesAvailable( action.getTrigger().mValue, 0, 0 ):
@@ -117,16 +162,41 @@ class BuildOrder:
         if self.mCurrentSimTime == untilSimTime:
             return
 
+        startTime = perf_counter() if self.mStats != None else None
         for time in range(self.mCurrentSimTime, untilSimTime, -1):
             self.mEventHandler.reverseEvents(time)
             self.mCurrentSimTime -= 1
+        if startTime != None:
+            self.mStats.mSimulateBackwardSec += perf_counter() - startTime
         #We should now be at the correct simtime, but shouldn't reverse anything at the new current simtime
 
+    #Get a copy of this build order that can be simulated further without affecting this one, for trying out what-ifs
+    #without re-simulating everything up to this point
+    #Nothing is shared with this build order, so it takes time and memory proportional to everything simulated so far
+    #(though less time than simulating it again). A pickle round trip is much faster than copy.deepcopy
+    def deepCopy(self):
+        return pickle.loads(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+
+    #Get the simtime that the last of the simulated actions finishes at
+    #Actions without a duration (like moving a worker) finish when they start
+    def getEndTime(self):
+        endTime = 0
+        for action in self.mOrderedActionList:
+            #An action that failed may not have been given a start time
+            if action.mStartTime == None:
+                continue
+            endTime = max(endTime, action.mStartTime if action.mDuration == None else action.getEndTime())
+        return endTime
+
     def getNextTimelineID(self):
         timelineID = self.mNextTimelineID
         self.mNextTimelineID += 1
         return timelineID
 
+    #@return The SimulationStats of everything simulated so far, or None if they aren't being collected
+    def getStats(self):
+        return self.mStats
+
     def getCurrentSimTime(self):
         return self.mCurrentSimTime
 
@@ -142,6 +212,9 @@ class BuildOrder:
     def getActiveTimelines(self):
         return self.mActiveTimelines
 
+    def getInactiveTimelines(self):
+        return self.mInactiveTimelines
+
     def _getWorkerTimelineForAction(self, action):
         workerTimeline = None
         #Only worker movement action has this attribute
@@ -224,31 +297,75 @@ class BuildOrder:
         return dict
 
     #Get this build order's current simtime and timelines as dicts to easily serialize to JSON
-    def getSimTimeAndTimelinesAsDictForSerialization(self):
+    #@param timelineFilter - If passed in, only the timelines and actions it includes will be serialized
+    def getSimTimeAndTimelinesAsDictForSerialization(self, timelineFilter = None):
         dict = { 
             'currentSimTime' : self.mCurrentSimTime,
             'activeTimelines' : [],
             'inactiveTimelines' : [],
             'currentResources' : self.mCurrentResources.getAsDictForSerialization()
         }
-        for timeline in self.mActiveTimelines:
-            dict['activeTimelines'].append(timeline.getAsDictForSerialization())
-        for timeline in self.mInactiveTimelines:
-            dict['inactiveTimelines'].append(timeline.getAsDictForSerialization())
+        for timeline in self.getTimelinesForSerialization(self.mActiveTimelines, timelineFilter):
+            dict['activeTimelines'].append(timeline.getAsDictForSerialization(timelineFilter))
+        if not timelineFilter or not timelineFilter.mActiveOnly:
+            for timeline in self.getTimelinesForSerialization(self.mInactiveTimelines, timelineFilter):
+                dict['inactiveTimelines'].append(timeline.getAsDictForSerialization(timelineFilter))
 
         return dict
 
+    #Like getSimTimeAndTimelinesAsDictForSerialization, but only serializes the timelines that are different from the versions the client already has
+    #The IDs of all current timelines (in order) are included, so the client can tell which timelines were deleted or moved between active and inactive
+    #@param knownTimelineVersions - Dict of timeline ID to the version tag (see Timeline.getVersionTag) of that timeline the client has
+    def getSimTimeAndTimelineDeltasAsDictForSerialization(self, knownTimelineVersions):
+        dict = { 
+            'currentSimTime' : self.mCurrentSimTime,
+            'changedTimelines' : [],
+            'deletedTimelineIDs' : [],
+            'activeTimelineIDs' : [timeline.getTimelineID() for timeline in self.mActiveTimelines],
+            'inactiveTimelineIDs' : [timeline.getTimelineID() for timeline in self.mInactiveTimelines],
+            'currentResources' : self.mCurrentResources.getAsDictForSerialization()
+        }
+        for timeline in self.mActiveTimelines + self.mInactiveTimelines:
+            versionTag = timeline.getVersionTag()
+            if knownTimelineVersions.get(timeline.getTimelineID()) != versionTag:
+                timelineDict = timeline.getAsDictForSerialization()
+                timelineDict['version'] = versionTag
+                dict['changedTimelines'].append(timelineDict)
+
+        currentTimelineIDs = set(dict['activeTimelineIDs'] + dict['inactiveTimelineIDs'])
+        for timelineID in knownTimelineVersions:
+            if timelineID not in currentTimelineIDs:
+                dict['deletedTimelineIDs'].append(timelineID)
+
+        return dict
+
+    @staticmethod
+    def getTimelinesForSerialization(timelines, timelineFilter):
+        if not timelineFilter:
+            return timelines
+        return [timeline for timeline in timelines if timelineFilter.includesTimeline(timeline)]
+
     #Used to deserialize JSON (after converting the JSON to dict)
     #Returns the build order object after simulating the specified ordered action list
+    #@param openingBook - If passed in, start from the book's state after the longest of its openings that the actions start with (see OpeningBook.py)
+    #The book's states are simulated on the default map without stats, so it isn't used with a map starting position or stats
     @staticmethod
-    def simulateBuildOrderFromDict(buildOrderDict):
-        buildOrder = BuildOrder(Race[buildOrderDict['race']])
+    def simulateBuildOrderFromDict(buildOrderDict, mapStartingPosition = None, collectStats = False, openingBook = None):
+        race = Race[buildOrderDict['race']]
 
         orderedActionList = []
         for actionDict in buildOrderDict['orderedActionList']:
             orderedActionList.append( Action.getActionFromDict(actionDict) )
 
-        buildOrder.simulateOrderedActionList(orderedActionList)
+        buildOrder = None
+        numActionsFromOpeningBook = 0
+        if openingBook != None and mapStartingPosition == None and not collectStats:
+            buildOrder, numActionsFromOpeningBook = openingBook.getBuildOrderForActions(race, orderedActionList)
+        if buildOrder == None:
+            buildOrder = BuildOrder(race, mapStartingPosition, collectStats)
+        buildOrder.mNumActionsFromOpeningBook = numActionsFromOpeningBook
+
+        buildOrder.simulateOrderedActionList(orderedActionList[numActionsFromOpeningBook:])
 
         return buildOrder
 
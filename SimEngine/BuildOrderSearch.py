@@ -0,0 +1,217 @@
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.Action import Action
+
+import io
+import time
+import pickle
+import contextlib
+
+#Searches for the ordering (and trigger choices) of a pool of actions that finishes a goal soonest, using beam search
+#Candidates are build orders simulated one action further than their parent, from a pickled copy of the parent, so nothing
+#before the new action is ever re-simulated
+
+#A goal for the search, like "Altar of Elders + 2 Hunter's Hall + 4 Huntress by 5 minutes"
+class BuildOrderGoal:
+    #@param targetCounts - Dict of action name to the number of actions with that name that must be finished
+    #@param deadlineSimTime - The goal must be finished by this simtime. None for no deadline
+    def __init__(self, targetCounts, deadlineSimTime = None):
+        self.mTargetCounts = targetCounts
+        self.mDeadlineSimTime = deadlineSimTime
+
+    #Get the simtime the goal is finished at, or None if not enough of the actions have been simulated yet
+    #@param endTimesByName - Dict of action name to the sorted end times of the actions with that name (see _getEndTimesByName)
+    def getCompletionTime(self, endTimesByName):
+        completionTime = 0
+        for name, targetCount in self.mTargetCounts.items():
+            endTimes = endTimesByName.get(name, [])
+            if len(endTimes) < targetCount:
+                return None
+            if targetCount > 0:
+                completionTime = max(completionTime, endTimes[targetCount - 1])
+        return completionTime
+
+    #Get a lower bound on when the goal can be finished, without simulating any further
+    #Actions can't start before the current simtime, so every action still missing from the goal finishes at least its
+    #(shortest) duration after it
+    #@param minDurationsByName - Dict of action name to the shortest travel time + duration of the pool's actions with that name
+    def getCompletionTimeLowerBound(self, endTimesByName, currentSimTime, minDurationsByName):
+        lowerBound = 0
+        for name, targetCount in self.mTargetCounts.items():
+            endTimes = endTimesByName.get(name, [])
+            if len(endTimes) >= targetCount:
+                if targetCount > 0:
+                    lowerBound = max(lowerBound, endTimes[targetCount - 1])
+            else:
+                lowerBound = max(lowerBound, currentSimTime + minDurationsByName.get(name, 0))
+        return lowerBound
+
+#Get the end times of a build order's actions with a name, sorted, by name. Actions without a duration are left out
+def _getEndTimesByName(buildOrder):
+    endTimesByName = {}
+    for action in buildOrder.mOrderedActionList:
+        if action.mName == None or action.mStartTime == None or action.mDuration == None:
+            continue
+        endTimesByName.setdefault(action.mName, []).append(action.getEndTime())
+    for endTimes in endTimesByName.values():
+        endTimes.sort()
+    return endTimesByName
+
+#Simulate each of the candidate actions on its own copy of a build order. Module-level, so it can run in a worker process
+#@return For each candidate, None if it failed to simulate, otherwise (pickled build order, current simtime, end times by name)
+def _evaluateCandidates(pickledBuildOrder, candidateActionDicts):
+    results = []
+    for actionDict in candidateActionDicts:
+        #Unpickling makes the copy
+        buildOrder = pickle.loads(pickledBuildOrder)
+        #Lots of candidates are expected to fail, so don't print why
+        with contextlib.redirect_stdout(io.StringIO()):
+            succeeded = buildOrder.simulateAction(Action.getActionFromDict(actionDict))
+        if succeeded:
+            results.append( (pickle.dumps(buildOrder), buildOrder.getCurrentSimTime(), _getEndTimesByName(buildOrder)) )
+        else:
+            results.append(None)
+    return results
+
+#A partial build order in the beam
+class _SearchNode:
+    def __init__(self, pickledBuildOrder, chosenActionDicts, remainingCounts, currentSimTime, endTimesByName, lowerBound):
+        self.mPickledBuildOrder = pickledBuildOrder
+        #The action dicts added after the starting actions, in order
+        self.mChosenActionDicts = chosenActionDicts
+        #Number of each of the pool's actions left to add
+        self.mRemainingCounts = remainingCounts
+        self.mCurrentSimTime = currentSimTime
+        self.mEndTimesByName = endTimesByName
+        self.mLowerBound = lowerBound
+
+class BuildOrderSearch:
+    #@param race - Race of the build order
+    #@param startingActionDicts - Actions that every candidate starts with, in order (like the opening worker movements)
+    #@param actionPool - List of { "action" : <action dict>, "count" : <number of times to add it, default 1>,
+    #"triggers" : <optional list of trigger dicts to try for it, instead of its own trigger> }
+    #Every action in the pool is added to every finished candidate
+    #@param goal - The BuildOrderGoal to finish as soon as possible
+    #@param beamWidth - Number of partial build orders kept after each step
+    #@param executor - If passed in, a concurrent.futures.Executor to simulate candidates in. Must be a ProcessPoolExecutor
+    #for the simulations to actually run in parallel, since they don't release the GIL
+    def __init__(self, race, startingActionDicts, actionPool, goal, beamWidth = 16, executor = None):
+        self.mRace = race
+        self.mStartingActionDicts = startingActionDicts
+        self.mActionPool = actionPool
+        self.mGoal = goal
+        self.mBeamWidth = beamWidth
+        self.mExecutor = executor
+
+        #For each action in the pool, the action dicts to try for it (one for each trigger)
+        self.mCandidateActionDictsByPoolIndex = []
+        self.mMinDurationsByName = {}
+        for poolEntry in actionPool:
+            actionDict = poolEntry['action']
+            triggers = poolEntry.get('triggers', [actionDict['trigger']])
+            self.mCandidateActionDictsByPoolIndex.append([dict(actionDict, trigger = trigger) for trigger in triggers])
+
+            name = actionDict.get('name')
+            if name != None and actionDict.get('duration') != None:
+                fullDuration = actionDict['duration'] + (actionDict.get('travelTime') or 0)
+                self.mMinDurationsByName[name] = min(self.mMinDurationsByName.get(name, fullDuration), fullDuration)
+
+        #Actions added by the search get IDs after the starting actions'
+        self.mFirstActionID = max([actionDict.get('actionID', -1) for actionDict in startingActionDicts], default = -1) + 1
+
+        self.mNumEvaluations = 0
+        self.mNumPruned = 0
+        self.mElapsedSec = 0
+
+    #Simulations per second while searching. This is what limits how wide and deep a search can practically go
+    def getEvaluationsPerSecond(self):
+        if self.mElapsedSec == 0:
+            return 0
+        return self.mNumEvaluations / self.mElapsedSec
+
+    #Whether a candidate can't beat the best finished candidate so far, or can't make the deadline
+    def _canPrune(self, lowerBound, bestCompletionTime):
+        if self.mGoal.mDeadlineSimTime != None and lowerBound > self.mGoal.mDeadlineSimTime:
+            return True
+        return bestCompletionTime != None and lowerBound >= bestCompletionTime
+
+    #Simulate all the candidate actions for every node in the beam
+    #@return List of (node, candidateActionDict, poolIndex, result), with the result as returned by _evaluateCandidates
+    def _expandBeam(self, beam):
+        jobs = []
+        for node in beam:
+            nextActionID = self.mFirstActionID + len(node.mChosenActionDicts)
+            candidates = []
+            for poolIndex, remainingCount in enumerate(node.mRemainingCounts):
+                if remainingCount == 0:
+                    continue
+                for actionDict in self.mCandidateActionDictsByPoolIndex[poolIndex]:
+                    candidates.append( (dict(actionDict, actionID = nextActionID), poolIndex) )
+            jobs.append( (node, candidates) )
+
+        candidateActionDictLists = [[actionDict for actionDict, poolIndex in candidates] for node, candidates in jobs]
+        if self.mExecutor != None:
+            futures = [self.mExecutor.submit(_evaluateCandidates, node.mPickledBuildOrder, actionDicts) for (node, candidates), actionDicts in zip(jobs, candidateActionDictLists)]
+            resultLists = [future.result() for future in futures]
+        else:
+            resultLists = [_evaluateCandidates(node.mPickledBuildOrder, actionDicts) for (node, candidates), actionDicts in zip(jobs, candidateActionDictLists)]
+
+        expansions = []
+        for (node, candidates), results in zip(jobs, resultLists):
+            self.mNumEvaluations += len(results)
+            for (actionDict, poolIndex), result in zip(candidates, results):
+                expansions.append( (node, actionDict, poolIndex, result) )
+        return expansions
+
+    #Run the search
+    #@return { "orderedActionList" : <the starting actions plus the best ordering of the pool's actions, or None if no candidate
+    #finished the goal (by the deadline)>, "completionTime", "numEvaluations", "numPruned", "elapsedSec", "evaluationsPerSecond" }
+    def search(self):
+        startTime = time.perf_counter()
+        self.mNumEvaluations = 0
+        self.mNumPruned = 0
+
+        buildOrder = BuildOrder.simulateBuildOrderFromDict({ 'race' : self.mRace.name, 'orderedActionList' : self.mStartingActionDicts })
+        endTimesByName = _getEndTimesByName(buildOrder)
+        remainingCounts = tuple(poolEntry.get('count', 1) for poolEntry in self.mActionPool)
+        beam = [_SearchNode(pickle.dumps(buildOrder), [], remainingCounts, buildOrder.getCurrentSimTime(), endTimesByName,
+                            self.mGoal.getCompletionTimeLowerBound(endTimesByName, buildOrder.getCurrentSimTime(), self.mMinDurationsByName))]
+
+        bestNode = None
+        bestCompletionTime = None
+        while beam:
+            children = []
+            for node, actionDict, poolIndex, result in self._expandBeam(beam):
+                if result == None:
+                    continue
+                pickledBuildOrder, currentSimTime, endTimesByName = result
+                remainingCounts = list(node.mRemainingCounts)
+                remainingCounts[poolIndex] -= 1
+                remainingCounts = tuple(remainingCounts)
+
+                lowerBound = self.mGoal.getCompletionTimeLowerBound(endTimesByName, currentSimTime, self.mMinDurationsByName)
+                if self._canPrune(lowerBound, bestCompletionTime):
+                    self.mNumPruned += 1
+                    continue
+
+                child = _SearchNode(pickledBuildOrder, node.mChosenActionDicts + [actionDict], remainingCounts, currentSimTime, endTimesByName, lowerBound)
+                if sum(remainingCounts) == 0:
+                    completionTime = self.mGoal.getCompletionTime(endTimesByName)
+                    if completionTime != None and not self._canPrune(completionTime, bestCompletionTime):
+                        bestNode = child
+                        bestCompletionTime = completionTime
+                else:
+                    children.append(child)
+
+            #Most promising first. Ties go to the candidate that has simulated less time, since it has more room left
+            children.sort(key = lambda child: (child.mLowerBound, child.mCurrentSimTime))
+            beam = [child for child in children[:self.mBeamWidth] if not self._canPrune(child.mLowerBound, bestCompletionTime)]
+
+        self.mElapsedSec = time.perf_counter() - startTime
+        return {
+            'orderedActionList' : self.mStartingActionDicts + bestNode.mChosenActionDicts if bestNode != None else None,
+            'completionTime' : bestCompletionTime,
+            'numEvaluations' : self.mNumEvaluations,
+            'numPruned' : self.mNumPruned,
+            'elapsedSec' : self.mElapsedSec,
+            'evaluationsPerSecond' : self.getEvaluationsPerSecond()
+        }
@@ -1,4 +1,45 @@
 from copy import copy
+from functools import partial
+
+#Event functions are partials of module-level functions rather than closures, so that copying or pickling an event
+#(along with the objects it acts on) gives an event that acts on the copies, rather than the originals
+def _modifyResources(currentResources, goldChange, lumberChange, foodChange, foodMaxChange, currSimTime):
+    currentResources.modifyResources(goldChange, lumberChange, foodChange, foodMaxChange)
+
+#Must return None unless the event needs to be delayed
+def _addWorkerToMine(goldMineTimeline, currSimTime):
+    #For Orc and Human workers, we may have to delay adding to the mine if a worker is already in it
+    delayVal = goldMineTimeline.addWorkerToMine(currSimTime)
+    if delayVal > 0:
+        return delayVal
+
+def _removeWorkerFromMine(goldMineTimeline, currSimTime):
+    goldMineTimeline.removeWorkerFromMine(currSimTime)
+
+#The links in a chain of recurring events (or event groups) are kept in a dict of object -> [previous, next] that is shared by everything
+#in the chain, rather than in each object. So copying or pickling any one of them gets the whole chain along with its links, without
+#following the chain link by link, which goes past Python's recursion limit for long chains
+PREV_RECURRENCE_LINK = 0
+NEXT_RECURRENCE_LINK = 1
+
+def getRecurrenceLink(recurringObject, linkIndex):
+    links = recurringObject.mRecurrenceLinks.get(recurringObject)
+    if links == None:
+        return None
+    return links[linkIndex]
+
+def setRecurrenceLink(recurringObject, linkIndex, linkedObject):
+    recurrenceLinks = recurringObject.mRecurrenceLinks
+    links = recurrenceLinks.get(recurringObject)
+    if links == None:
+        if linkedObject == None:
+            return
+        links = [None, None]
+        recurrenceLinks[recurringObject] = links
+    links[linkIndex] = linkedObject
+    #Nothing is kept for objects that aren't linked anymore
+    if links[PREV_RECURRENCE_LINK] == None and links[NEXT_RECURRENCE_LINK] == None:
+        del recurrenceLinks[recurringObject]
 
 class Event:
     def __init__(self, eventFunction, reverseFunction, eventTime, recurPeriodSimtime, eventID, eventName = ""):
@@ -10,9 +51,9 @@ class Event:
         self.mReverseFunction = reverseFunction
 
         self.setRecurPeriodSimTime(recurPeriodSimtime)
-        #If this event has recurred, this will point to the previous and next event in the chain of recurring events
-        self.mPrevRecurredEvent = None
-        self.mNextRecurredEvent = None
+        #If this event has recurred, mPrevRecurredEvent and mNextRecurredEvent will point to the previous and next event in the chain of
+        #recurring events. Their links are kept here, and shared with the events this one recurs as (see getRecurrenceLink)
+        self.mRecurrenceLinks = {}
         self.mEventName = eventName
         self.mEventID = eventID
 
@@ -29,10 +70,8 @@ class Event:
     #Convenience method for getting an event that modifies our current resources and can be reversed
     @staticmethod
     def getModifyResourceCountEvent(currentResources, simTime, eventName, eventID, goldChange, lumberChange, foodChange, foodMaxChange, recurPeriodSimTime = 0):
-        def eventFunc(currSimTime):
-            currentResources.modifyResources(goldChange, lumberChange, foodChange, foodMaxChange)
-        def reverseFunc(currSimTime):
-            currentResources.modifyResources(goldChange * -1, lumberChange * -1, foodChange * -1, foodMaxChange * -1)
+        eventFunc = partial(_modifyResources, currentResources, goldChange, lumberChange, foodChange, foodMaxChange)
+        reverseFunc = partial(_modifyResources, currentResources, goldChange * -1, lumberChange * -1, foodChange * -1, foodMaxChange * -1)
 
         event = Event(eventFunction = eventFunc, reverseFunction = reverseFunc, eventTime=simTime, recurPeriodSimtime = recurPeriodSimTime, 
                       eventName = eventName, eventID = eventID)
@@ -42,20 +81,30 @@ class Event:
     #Convenience method for getting an event that modifies the number of workers in the mine and can be reversed
     @staticmethod
     def getModifyWorkersInMineEvent(goldMineTimeline, simTime, eventName, eventID):
-        #Must use defined funcs instead of lamdbas so that the event function returns None
         #Must pass the current sim time, can't just use the simTime from the getModifyWorkersInMinEvent method,
         #since this Event could be recurred, and then that simTime would be inaccurate
-        def eventFunc(currSimTime):
-            #For Orc and Human workers, we may have to delay adding to the mine if a worker is already in it
-            delayVal = goldMineTimeline.addWorkerToMine(currSimTime)
-            if delayVal > 0:
-                return delayVal
-        def reverseFunc(currSimTime):
-            goldMineTimeline.removeWorkerFromMine(currSimTime)
+        eventFunc = partial(_addWorkerToMine, goldMineTimeline)
+        reverseFunc = partial(_removeWorkerFromMine, goldMineTimeline)
         event = Event(eventFunction = eventFunc, reverseFunction = reverseFunc, eventTime=simTime, recurPeriodSimtime = 0, 
                       eventName = eventName, eventID = eventID)
         return event
 
+    @property
+    def mPrevRecurredEvent(self):
+        return getRecurrenceLink(self, PREV_RECURRENCE_LINK)
+
+    @mPrevRecurredEvent.setter
+    def mPrevRecurredEvent(self, event):
+        setRecurrenceLink(self, PREV_RECURRENCE_LINK, event)
+
+    @property
+    def mNextRecurredEvent(self):
+        return getRecurrenceLink(self, NEXT_RECURRENCE_LINK)
+
+    @mNextRecurredEvent.setter
+    def mNextRecurredEvent(self, event):
+        setRecurrenceLink(self, NEXT_RECURRENCE_LINK, event)
+
     def __str__(self):
         disabledStr = ""
         if self.mIsDisabled:
@@ -100,6 +149,9 @@ class Event:
     #@param eventID - The event ID to give the new event
     def _duplicateEvent(self, eventID):
         newEvent = copy(self)
+        #The copy shares this event's chain, and starts out with the same links as it
+        newEvent.mPrevRecurredEvent = self.mPrevRecurredEvent
+        newEvent.mNextRecurredEvent = self.mNextRecurredEvent
         newEvent.mEventID = eventID
         newEvent.mIsDisabled = False
         newEvent.mDelayDisabledEvents = []
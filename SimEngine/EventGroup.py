@@ -1,3 +1,5 @@
+from SimEngine.Event import PREV_RECURRENCE_LINK, NEXT_RECURRENCE_LINK, getRecurrenceLink, setRecurrenceLink
+
 from copy import copy
 
 #Define an ordered group of events that will be temporally locked relative to each other, meaning:
@@ -13,9 +15,9 @@ class EventGroup:
         #A recurrence gap of 0 means it doesn't recur
         self.mRecurrenceGapSimTime = recurrenceGapSimTime
 
-        #If this event group has recurred, this will point to the previous and next event in the chain of recurring event groups
-        self.mPrevRecurredEventGroup = None
-        self.mNextRecurredEventGroup = None
+        #If this event group has recurred, mPrevRecurredEventGroup and mNextRecurredEventGroup will point to the previous and next event group
+        #in the chain of recurring event groups. Their links are kept here, shared by the whole chain, like for Event
+        self.mRecurrenceLinks = {}
 
     #Get all events in the event group starting at the event with the ID that is passed in
     def getRemainingEvents(self, eventID):
@@ -69,6 +71,22 @@ class EventGroup:
             print("Error: Tried to recur an event group that doesn't recur or doesn't have any events")
             return None
 
+    @property
+    def mPrevRecurredEventGroup(self):
+        return getRecurrenceLink(self, PREV_RECURRENCE_LINK)
+
+    @mPrevRecurredEventGroup.setter
+    def mPrevRecurredEventGroup(self, eventGroup):
+        setRecurrenceLink(self, PREV_RECURRENCE_LINK, eventGroup)
+
+    @property
+    def mNextRecurredEventGroup(self):
+        return getRecurrenceLink(self, NEXT_RECURRENCE_LINK)
+
+    @mNextRecurredEventGroup.setter
+    def mNextRecurredEventGroup(self, eventGroup):
+        setRecurrenceLink(self, NEXT_RECURRENCE_LINK, eventGroup)
+
     def __str__(self):
         return "EventGroup: " + str(self.mOrderedEventList)
 
@@ -15,6 +15,9 @@ class EventHandler:
         #String Events IDs of all the events executed in order - put an 'R' in front of any that were executed in reverse
         self.mEventsExecutedInOrder = []
 
+        #SimulationStats to count executed, reversed, delayed and recurred events in, or None to not count them
+        self.mStats = None
+
     def getNumberOfEvents(self):
         num = 0
         for simTime in self.mEvents:
@@ -69,6 +72,8 @@ class EventHandler:
 
     #Execute the reverse events, in reverse order. False otherwise
     def reverseEvents(self, simTime):
+        if self.mStats != None:
+            self.mStats.mTicksReversed += 1
         if simTime not in self.mEvents:
             return
 
@@ -106,6 +111,8 @@ class EventHandler:
     def _reverseEvent(self, event, eventGroup, currSimTime):
         if not event.mIsDisabled:
             self.mEventsExecutedInOrder.append('R' + str(event.getEventID()))
+            if self.mStats != None:
+                self.mStats.mEventsReversed += 1
             event.reverse(currSimTime)
             if eventGroup != None and eventGroup.doesRecur():
                 if event.doesRecur():
@@ -136,6 +143,8 @@ class EventHandler:
         event.mDelayDisabledEvents = []
 
     def executeEvents(self, simTime):
+        if self.mStats != None:
+            self.mStats.addTick(not self.mEvents.get(simTime))
         if simTime not in self.mEvents:
             return
 
@@ -163,6 +172,8 @@ class EventHandler:
             return
 
         self.mEventsExecutedInOrder.append(str(event.getEventID()))
+        if self.mStats != None:
+            self.mStats.mEventsExecuted += 1
         amtDelayedSimTime = event.execute(currSimTime)
         self.mLastEventExecuted = event.getEventID()
         #Events will return a simTime delay number if they could not be executed and need to be delayed
@@ -182,9 +193,13 @@ class EventHandler:
                 newEventGroup = eventGroup.recur(newEventIDs)
                 for newEvent in newEventGroup.mOrderedEventList:
                     self.registerEvent(newEvent, newEventGroup)
+                if self.mStats != None:
+                    self.mStats.mEventsRecurred += len(newEventIDs)
         elif event.doesRecur():
             newEvent = event.recur(self.getNewEventID())
             self.registerEvent(newEvent)
+            if self.mStats != None:
+                self.mStats.mEventsRecurred += 1
 
     #Reschedule an event by an amount given by amtToDelaySimTime
     #Any other events in the event group will also be rescheduled
@@ -226,6 +241,10 @@ class EventHandler:
         for newEvent in newEventsInOrder:
             self.registerEvent(newEvent, newEventGroup)
 
+        if self.mStats != None:
+            self.mStats.mEventsDelayed += 1
+            self.mStats.mDelaySpawnedEvents += len(newEventsInOrder)
+
     #Reschedule an event by an amount given by amtToDelaySimTime
     #Will only reschedule this event, does not affect other events in the group
     def rescheduleEvent(self, event, amtToDelaySimTime, eventGroup = None):
@@ -0,0 +1,27 @@
+import json
+#Optional. Much faster at encoding than the json module. Both are set up to write non-ASCII characters as they are rather than escaping them,
+#and to convert non-str dict keys (like timeline IDs) to strings, so the compact JSON (and its ETag) is the same whether or not orjson is
+#installed. They still differ on floats that are written in exponent form (1e+16 vs 1e16) and on NaN and infinity, which the engine doesn't output
+#Imported the first time something is encoded rather than with the engine, since importing it takes longer than simulating a small build
+orjson = None
+_triedImportingOrjson = False
+
+def _importOrjson():
+    global orjson, _triedImportingOrjson
+    _triedImportingOrjson = True
+    try:
+        import orjson as orjsonModule
+        orjson = orjsonModule
+    except ImportError:
+        pass
+
+#Encode an object as JSON
+#@param pretty - If True, indent the JSON to make it readable (for debugging). Otherwise, use no whitespace at all
+def encodeJSON(obj, pretty):
+    if pretty:
+        return json.dumps(obj, indent = 2)
+    if not _triedImportingOrjson:
+        _importOrjson()
+    if orjson:
+        return orjson.dumps(obj, option = orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, separators = (",", ":"), ensure_ascii = False)
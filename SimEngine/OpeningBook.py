@@ -0,0 +1,182 @@
+from SimEngine.SimulationConstants import Race, SIMULATION_ENGINE_VERSION
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.Action import Action
+from SimEngine.BuildFiles import iterBuilds, getTeamBuildOrders
+
+import io
+import os
+import sys
+import json
+import pickle
+import hashlib
+import argparse
+import tempfile
+import itertools
+import contextlib
+
+#An opening book: the engine's state after each of the openings that many builds start with, so a build that starts with one of them is
+#simulated from there instead of from scratch (see BuildOrder.simulateBuildOrderFromDict)
+#Openings are keyed by a hash of the race and the opening's actions as the engine serializes them, so the same actions with their keys in a
+#different order or with fields the engine ignores are the same opening. Action IDs are part of the key, since triggers refer to them
+#Books are saved as pickles, so only load books you made yourself. A book is only used with the engine version it was made with
+#To make a book from build files or saved builds (from the main directory):
+#py -m SimEngine.OpeningBook SavedBuilds builds.jsonl --output OpeningBook.pickle
+#py -m SimEngine.OpeningBook --savedBuildStoreDir ~/WC3BuildOrderPlanner --output ~/WC3BuildOrderPlanner/OpeningBook.pickle
+
+#An opening is only added if at least this many of the build orders start with it
+DEFAULT_MIN_BUILDS_PER_OPENING = 2
+#Openings are at most this many actions long
+DEFAULT_MAX_OPENING_ACTIONS = 30
+
+#Yields the key of each prefix of the actions, from just the first action up to maxNumActions of them (or all of them, if None)
+#The actions mustn't have been simulated yet, since their start times are part of how they're serialized
+def iterPrefixKeys(race, actions, maxNumActions = None):
+    prefixHash = hashlib.sha256(race.name.encode("utf-8"))
+    for action in actions[:maxNumActions]:
+        prefixHash.update(b"\n" + json.dumps(action.getAsDictForSerialization(), sort_keys = True, separators = (",", ":")).encode("utf-8"))
+        yield prefixHash.hexdigest()
+
+class OpeningBook:
+    def __init__(self, engineVersion = SIMULATION_ENGINE_VERSION):
+        self.mEngineVersion = engineVersion
+        #Prefix key -> (race, number of actions, pickled BuildOrder that has simulated them)
+        self.mOpenings = {}
+        #Race -> number of actions in its longest opening, so looking up a build doesn't hash more of its actions than that
+        self.mMaxNumActionsByRace = {}
+
+    def getNumOpenings(self):
+        return len(self.mOpenings)
+
+    #Simulate the actions from scratch, and add the state after them as an opening
+    #@return False (and nothing is added) if any of the actions fail to simulate
+    def addOpening(self, race, actions):
+        if not actions:
+            return False
+        key = list(iterPrefixKeys(race, actions))[-1]
+        buildOrder = BuildOrder(race)
+        if not buildOrder.simulateOrderedActionList(actions):
+            return False
+        self._addPickledOpening(key, race, len(actions), pickle.dumps(buildOrder))
+        return True
+
+    def _addPickledOpening(self, key, race, numActions, pickledBuildOrder):
+        self.mOpenings[key] = (race, numActions, pickledBuildOrder)
+        self.mMaxNumActionsByRace[race] = max(self.mMaxNumActionsByRace.get(race, 0), numActions)
+
+    #Get a build order that has simulated the longest opening the actions start with
+    #@param actions - Actions that haven't been simulated yet
+    #@return (the build order, the number of the actions it has simulated), or (None, 0) if the actions don't start with any opening
+    def getBuildOrderForActions(self, race, actions):
+        maxNumActions = self.mMaxNumActionsByRace.get(race)
+        if maxNumActions == None:
+            return None, 0
+        opening = None
+        for key in iterPrefixKeys(race, actions, maxNumActions):
+            opening = self.mOpenings.get(key, opening)
+        if opening == None:
+            return None, 0
+        race, numActions, pickledBuildOrder = opening
+        #Unpickling makes a new copy of the state every time, so the book's own is never changed
+        return pickle.loads(pickledBuildOrder), numActions
+
+    #Save the book, replacing the file atomically so a process starting up never loads half of one
+    def save(self, filePath):
+        content = pickle.dumps({ 'engineVersion' : self.mEngineVersion,
+                                 'openings' : [(key, race.name, numActions, pickledBuildOrder) for key, (race, numActions, pickledBuildOrder) in self.mOpenings.items()] })
+        fileDir = os.path.dirname(os.path.abspath(filePath))
+        os.makedirs(fileDir, exist_ok = True)
+        fd, tempPath = tempfile.mkstemp(dir = fileDir, prefix = ".tmp.")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            os.replace(tempPath, filePath)
+        except BaseException:
+            os.remove(tempPath)
+            raise
+
+    #Load a saved book
+    #@return The book, or an empty book if there is no file or it was made with a different engine version (since the states in it
+    #could be different now)
+    @staticmethod
+    def load(filePath):
+        book = OpeningBook()
+        try:
+            with open(filePath, "rb") as file:
+                content = pickle.loads(file.read())
+        except FileNotFoundError:
+            return book
+        if content['engineVersion'] != SIMULATION_ENGINE_VERSION:
+            print("Not using opening book", filePath, "since it was made with engine version", content['engineVersion'], "and this is version",
+                  SIMULATION_ENGINE_VERSION + ". Rebuild it with py -m SimEngine.OpeningBook")
+            return book
+        for key, raceName, numActions, pickledBuildOrder in content['openings']:
+            book._addPickledOpening(key, Race[raceName], numActions, pickledBuildOrder)
+        return book
+
+#Make a book of the openings that at least minBuilds of the build orders start with
+#Each build order only adds the longest of those openings it starts with, so the book doesn't also have every shorter prefix of an opening
+#@param buildOrderDicts - Build order dicts (race and ordered action list), already converted from JSON. Ones that can't be read are skipped
+#@return (the book, the number of build orders that couldn't be read)
+def buildOpeningBook(buildOrderDicts, minBuilds = DEFAULT_MIN_BUILDS_PER_OPENING, maxNumActions = DEFAULT_MAX_OPENING_ACTIONS):
+    #(race, first actions, key of each prefix of them) of each build order
+    builds = []
+    numBuildsByKey = {}
+    numUnreadable = 0
+    for buildOrderDict in buildOrderDicts:
+        try:
+            race = Race[buildOrderDict['race']]
+            actions = [Action.getActionFromDict(actionDict) for actionDict in buildOrderDict['orderedActionList'][:maxNumActions]]
+            keys = list(iterPrefixKeys(race, actions))
+        except Exception:
+            #Saved builds aren't validated, so some of them may not be build orders at all
+            numUnreadable += 1
+            continue
+        builds.append((race, actions, keys))
+        for key in keys:
+            numBuildsByKey[key] = numBuildsByKey.get(key, 0) + 1
+
+    book = OpeningBook()
+    triedKeys = set()
+    for race, actions, keys in builds:
+        numOpeningActions = next((i + 1 for i in reversed(range(len(keys))) if numBuildsByKey[keys[i]] >= minBuilds), 0)
+        if numOpeningActions == 0 or keys[numOpeningActions - 1] in triedKeys:
+            continue
+        triedKeys.add(keys[numOpeningActions - 1])
+        #The actions were only used for their keys, so they haven't been simulated yet
+        book.addOpening(race, actions[:numOpeningActions])
+    return book, numUnreadable
+
+#Yields (name, team build orders list) for every build in a saved build store
+def _iterSavedBuilds(savedBuildStore):
+    for savedBuildInfo in savedBuildStore.listBuilds():
+        build = savedBuildStore.getBuild(savedBuildInfo.mName)
+        if build == None:
+            continue
+        try:
+            yield savedBuildInfo.mName, getTeamBuildOrders(json.loads(build[0]))
+        except ValueError:
+            continue
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Make an opening book from the openings that build files or saved builds share")
+    parser.add_argument("inputs", nargs = "*", help = "Build files (.json), JSONL files (.jsonl) with a build on each line, directories of either, or - for JSONL on stdin")
+    parser.add_argument("--savedBuildStoreDir", help = "Also use every build saved in the REST API's saved build store in this directory")
+    parser.add_argument("--savedBuildStoreType", default = "sqlite", help = "Type of the saved build store (sqlite or flatfile)")
+    parser.add_argument("--output", required = True, help = "File to save the book to. Replaces any book already there")
+    parser.add_argument("--minBuilds", type = int, default = DEFAULT_MIN_BUILDS_PER_OPENING, help = "Number of build orders that must start with an opening to add it")
+    parser.add_argument("--maxActions", type = int, default = DEFAULT_MAX_OPENING_ACTIONS, help = "Max number of actions in an opening")
+    args = parser.parse_args()
+
+    builds = iterBuilds(args.inputs)
+    if args.savedBuildStoreDir:
+        #Only imported when reading saved builds, since the engine doesn't otherwise depend on the REST API
+        from RestAPI.SavedBuildStore import createSavedBuildStore
+        builds = itertools.chain(builds, _iterSavedBuilds(createSavedBuildStore(args.savedBuildStoreType, os.path.expanduser(args.savedBuildStoreDir))))
+
+    buildOrderDicts = [buildOrderDict for name, teamBuildOrdersList in builds for buildOrderDict in teamBuildOrdersList]
+    #Openings that fail partway print why, which doesn't matter here since they just aren't added
+    with contextlib.redirect_stdout(io.StringIO()):
+        book, numUnreadable = buildOpeningBook(buildOrderDicts, args.minBuilds, args.maxActions)
+    book.save(args.output)
+    print("Saved", book.getNumOpenings(), "openings from", len(buildOrderDicts), "build orders to", args.output +
+          (" (" + str(numUnreadable) + " build orders couldn't be read)" if numUnreadable else ""), file = sys.stderr)
@@ -0,0 +1,170 @@
+from SimEngine.BuildOrder import BuildOrder, MapStartingPosition
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
+from SimEngine.Action import Action
+from SimEngine.WorkerPool import createProcessPoolExecutor
+
+import io
+import sys
+import json
+import argparse
+import itertools
+import contextlib
+
+#Simulates one build over a grid of map parameters, to see how it holds up across maps and starting positions
+#Every parameter can change what happens from simtime 0, so grid points can't share a simulated prefix. Instead, grid points that
+#would simulate exactly the same thing (like different walk times for races that don't walk to the mine) are only simulated once
+
+#Parameters that can be swept, and their values on the ideal map
+#travelTimeScale multiplies the travel time of every action in the build, for maps where everything is further away
+#The map's gold and lumber trip times can't be swept, since the simulation doesn't use them yet
+SWEEP_PARAMETER_DEFAULTS = {
+    'timeToWalkToMineSec' : 2,
+    'travelTimeScale' : 1
+}
+
+#Gold and lumber trip times of the map every grid point is simulated on
+IDEAL_MAP_LUMBER_TRIP_TRAVEL_TIME_SEC = 15
+IDEAL_MAP_GOLD_TRIP_TRAVEL_TIME_SEC = 5
+
+#Only Human and Orc workers walk between the town hall and the mine
+RACES_THAT_WALK_TO_MINE = [Race.HUMAN, Race.ORC]
+
+#Get the parameters that actually change the simulation, so grid points with the same ones can share a simulation
+def _getEffectiveParameters(race, parameters):
+    timeToWalkToMineSec = parameters['timeToWalkToMineSec'] if race in RACES_THAT_WALK_TO_MINE else SWEEP_PARAMETER_DEFAULTS['timeToWalkToMineSec']
+    return (timeToWalkToMineSec, parameters['travelTimeScale'])
+
+#Get the build's action dicts with every travel time scaled. Travel times are in whole simtime, so they're rounded
+def _scaleTravelTimes(orderedActionList, travelTimeScale):
+    if travelTimeScale == 1:
+        return orderedActionList
+    return [dict(actionDict, travelTime = round(actionDict['travelTime'] * travelTimeScale)) if actionDict.get('travelTime') != None else actionDict
+            for actionDict in orderedActionList]
+
+#Simulate the build at one grid point. Module-level, so it can run in a worker process
+#@return { "simulationSucceeded", "endTime", "completionTimes" : { <key action name> : <end time of the last action with that name, or None> } }
+def _simulateGridPoint(race, orderedActionList, keyActionNames, parameters):
+    mapStartingPosition = MapStartingPosition("Sweep", IDEAL_MAP_LUMBER_TRIP_TRAVEL_TIME_SEC, IDEAL_MAP_GOLD_TRIP_TRAVEL_TIME_SEC, parameters['timeToWalkToMineSec'])
+    buildOrder = BuildOrder(race, mapStartingPosition)
+    actions = [Action.getActionFromDict(actionDict) for actionDict in _scaleTravelTimes(orderedActionList, parameters['travelTimeScale'])]
+    #Some grid points are expected to fail, and the table says which, so don't print why
+    with contextlib.redirect_stdout(io.StringIO()):
+        succeeded = buildOrder.simulateOrderedActionList(actions)
+
+    completionTimes = {name : None for name in keyActionNames}
+    for action in buildOrder.mOrderedActionList:
+        if action.mName in completionTimes and action.mStartTime != None and action.mDuration != None:
+            completionTimes[action.mName] = max(completionTimes[action.mName] or 0, action.getEndTime())
+    return {
+        'simulationSucceeded' : succeeded,
+        'endTime' : buildOrder.getEndTime(),
+        'completionTimes' : completionTimes
+    }
+
+#Get the names of the structures in a build, in the order they're first built. These are the default key actions of a sweep
+def getStructureNames(orderedActionList):
+    names = []
+    for actionDict in orderedActionList:
+        if actionDict['actionType'] == 'BuildStructureAction' and actionDict.get('name') not in names:
+            names.append(actionDict['name'])
+    return names
+
+#Simulate a build at every point of a grid of map parameters
+#@param race - Race of the build order
+#@param orderedActionList - The build's action dicts, in order
+#@param parameterValues - Dict of parameter name (from SWEEP_PARAMETER_DEFAULTS) to the list of values to try. Parameters left out
+#use their default
+#@param keyActionNames - Names of the actions to get completion times for. Defaults to the build's structures
+#@param executor - If passed in, a concurrent.futures.Executor to simulate the grid points in. Must be a ProcessPoolExecutor
+#for the simulations to actually run in parallel, since they don't release the GIL
+#@return { "parameterNames", "keyActionNames", "numSimulations", "rows" : [{ "parameters" : { <name> : <value> }, "simulationSucceeded", "endTime", "completionTimes" }, ...] }
+#Rows are in grid order, with the last parameter changing fastest
+#Will raise a ValueError for a parameter that can't be swept
+def sweepParameters(race, orderedActionList, parameterValues, keyActionNames = None, executor = None):
+    for name in parameterValues:
+        if name not in SWEEP_PARAMETER_DEFAULTS:
+            raise ValueError("Can't sweep unknown parameter: " + str(name))
+    if keyActionNames == None:
+        keyActionNames = getStructureNames(orderedActionList)
+
+    parameterNames = list(SWEEP_PARAMETER_DEFAULTS.keys())
+    valueLists = [parameterValues.get(name, [SWEEP_PARAMETER_DEFAULTS[name]]) for name in parameterNames]
+    gridPoints = [dict(zip(parameterNames, values)) for values in itertools.product(*valueLists)]
+
+    #The first grid point with each set of effective parameters is the one simulated
+    simulatedParametersByKey = {}
+    for parameters in gridPoints:
+        simulatedParametersByKey.setdefault(_getEffectiveParameters(race, parameters), parameters)
+
+    if executor != None and len(simulatedParametersByKey) > 1:
+        futures = {key : executor.submit(_simulateGridPoint, race, orderedActionList, keyActionNames, parameters) for key, parameters in simulatedParametersByKey.items()}
+        resultsByKey = {key : future.result() for key, future in futures.items()}
+    else:
+        resultsByKey = {key : _simulateGridPoint(race, orderedActionList, keyActionNames, parameters) for key, parameters in simulatedParametersByKey.items()}
+
+    rows = []
+    for parameters in gridPoints:
+        result = resultsByKey[_getEffectiveParameters(race, parameters)]
+        rows.append(dict(result, parameters = parameters, completionTimes = dict(result['completionTimes'])))
+
+    return {
+        'parameterNames' : parameterNames,
+        'keyActionNames' : keyActionNames,
+        'numSimulations' : len(resultsByKey),
+        'rows' : rows
+    }
+
+#Format a sweep's results as a table, with a line for each grid point. Times are in seconds
+#Only the parameters that were given more than one value get a column
+def formatTable(sweepResults):
+    rows = sweepResults['rows']
+    parameterNames = [name for name in sweepResults['parameterNames'] if len(set(row['parameters'][name] for row in rows)) > 1]
+
+    def formatTime(simTime):
+        if simTime == None:
+            return "-"
+        return "{:.1f}".format(simTime / SECONDS_TO_SIMTIME)
+
+    header = parameterNames + ["ok", "end"] + sweepResults['keyActionNames']
+    lines = [header]
+    for row in rows:
+        lines.append([str(row['parameters'][name]) for name in parameterNames] + ["yes" if row['simulationSucceeded'] else "NO", formatTime(row['endTime'])] +
+                     [formatTime(row['completionTimes'][name]) for name in sweepResults['keyActionNames']])
+
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in lines)
+
+#Parse a comma-separated list of numbers from the command line
+def _parseValueList(valuesStr):
+    return [float(value) if '.' in value else int(value) for value in valuesStr.split(',')]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Simulate a build over a grid of map parameters, and print the completion times of its key actions at each point")
+    parser.add_argument("buildFile", help = "JSON file with a build order ({ \"race\", \"orderedActionList\" }), or a list whose first entry is one")
+    for name, default in SWEEP_PARAMETER_DEFAULTS.items():
+        parser.add_argument("--" + name, type = _parseValueList, help = "Comma-separated values to try (default " + str(default) + ")")
+    parser.add_argument("--keyActions", help = "Comma-separated names of the actions to show completion times for (default the build's structures)")
+    parser.add_argument("--workers", type = int, default = 1, help = "Number of worker processes to simulate in")
+    parser.add_argument("--json", action = "store_true", help = "Print the results as JSON instead of a table")
+    args = parser.parse_args()
+
+    with open(args.buildFile, 'r') as file:
+        buildOrderDict = json.loads(file.read())
+    if isinstance(buildOrderDict, list):
+        buildOrderDict = buildOrderDict[0]
+
+    parameterValues = {name : getattr(args, name) for name in SWEEP_PARAMETER_DEFAULTS if getattr(args, name) != None}
+    keyActionNames = args.keyActions.split(',') if args.keyActions else None
+    race = Race[buildOrderDict['race']]
+
+    if args.workers > 1:
+        with createProcessPoolExecutor(args.workers) as executor:
+            sweepResults = sweepParameters(race, buildOrderDict['orderedActionList'], parameterValues, keyActionNames, executor)
+    else:
+        sweepResults = sweepParameters(race, buildOrderDict['orderedActionList'], parameterValues, keyActionNames)
+
+    if args.json:
+        print(json.dumps(sweepResults))
+    else:
+        print(formatTable(sweepResults))
+        print(str(len(sweepResults['rows'])) + " grid points, " + str(sweepResults['numSimulations']) + " simulations", file = sys.stderr)
@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+
+#Profiles a call and gets the result as collapsed stacks: one line for each distinct stack, like "main (main.py:10);simulate (BuildOrder.py:120) 42",
+#with its frames from outermost to innermost and a weight. This is the input format of flamegraph.pl, speedscope and most other flame graph tools
+#Two profilers:
+#sample - Samples the calling thread's stack every millisecond. Weights are numbers of samples. Low overhead, and the stacks are the real ones
+#cprofile - Uses cProfile, which times every call. Weights are microseconds. cProfile only records which function called which, so the
+#time of a function called from several places is split between those stacks in proportion to the time spent in each caller
+
+PROFILER_TYPES = ["sample", "cprofile"]
+
+#Extension of collapsed stack files written by writeCollapsedStacks
+COLLAPSED_STACKS_FILE_EXTENSION = ".collapsed"
+
+#Stacks deeper than this are cut off when getting cProfile's stacks, in case of very long chains of calls
+MAX_CPROFILE_STACK_DEPTH = 200
+
+def _getFrameLabel(funcName, fileName, lineNumber):
+    return funcName + " (" + os.path.basename(fileName) + ":" + str(lineNumber) + ")"
+
+#Format a dict of stacks (tuples of frame labels) to weights as collapsed stacks text, heaviest first
+def formatCollapsedStacks(weightsByStack):
+    lines = [";".join(stack) + " " + str(weight) for stack, weight in sorted(weightsByStack.items(), key = lambda item: (-item[1], item[0])) if weight > 0]
+    return "\n".join(lines) + "\n" if lines else ""
+
+class SamplingProfiler:
+    #@param intervalSec - Time between samples
+    def __init__(self, intervalSec = 0.001):
+        self.mIntervalSec = intervalSec
+        self.mWeightsByStack = {}
+        self.mThreadID = None
+        #Number of outer frames to leave out of the samples: the ones of whatever called start()
+        self.mNumOuterFrames = 0
+        self.mSamplingThread = None
+        self.mStopEvent = threading.Event()
+        self.mOriginalSwitchIntervalSec = None
+
+    #Start sampling the thread that calls this. Only the frames under the function that called this are included in the samples
+    def start(self):
+        self.mThreadID = threading.get_ident()
+        self.mNumOuterFrames = 0
+        frame = sys._getframe(1)
+        while frame != None:
+            self.mNumOuterFrames += 1
+            frame = frame.f_back
+
+        #The sampling thread only gets to run when Python switches threads, so switch at least as often as we sample
+        self.mOriginalSwitchIntervalSec = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.mOriginalSwitchIntervalSec, self.mIntervalSec))
+        self.mStopEvent.clear()
+        self.mSamplingThread = threading.Thread(target = self._sample, daemon = True)
+        self.mSamplingThread.start()
+
+    def stop(self):
+        self.mStopEvent.set()
+        self.mSamplingThread.join()
+        sys.setswitchinterval(self.mOriginalSwitchIntervalSec)
+
+    def _sample(self):
+        while not self.mStopEvent.wait(self.mIntervalSec):
+            frame = sys._current_frames().get(self.mThreadID)
+            codes = []
+            while frame != None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes = codes[::-1][self.mNumOuterFrames:]
+            #Leave out samples of the profiler itself, like when it's stopping
+            if codes and codes[0].co_filename != __file__:
+                stack = tuple(_getFrameLabel(code.co_name, code.co_filename, code.co_firstlineno) for code in codes)
+                self.mWeightsByStack[stack] = self.mWeightsByStack.get(stack, 0) + 1
+
+    def getCollapsedStacks(self):
+        return formatCollapsedStacks(self.mWeightsByStack)
+
+#Get collapsed stacks from a cProfile.Profile that has been run, with weights in microseconds
+def getCProfileCollapsedStacks(profile):
+    #Imported here, since pstats is slow to import and only needed for cProfile
+    import pstats
+    stats = pstats.Stats(profile).stats
+    #Function -> [(callee, total time of the callee's calls from this function)]
+    calleesByFunc = {func : [] for func in stats}
+    for func, (primitiveCalls, numCalls, selfTime, totalTime, callers) in stats.items():
+        for caller, callerStats in callers.items():
+            if caller in calleesByFunc:
+                calleesByFunc[caller].append((func, callerStats[3]))
+
+    weightsByStack = {}
+    #@param fraction - Fraction of the function's time that was spent under this stack
+    def addStacks(func, stack, fraction):
+        stack = stack + (_getFrameLabel(func[2], func[0], func[1]),)
+        selfTime, totalTime = stats[func][2], stats[func][3]
+        weight = round(selfTime * fraction * 1000000)
+        if weight > 0:
+            weightsByStack[stack] = weightsByStack.get(stack, 0) + weight
+        if len(stack) >= MAX_CPROFILE_STACK_DEPTH:
+            return
+        for callee, calleeTimeFromFunc in calleesByFunc[func]:
+            calleeTotalTime = stats[callee][3]
+            #Recursive calls are already counted in the callee's total time
+            if calleeTotalTime > 0 and _getFrameLabel(callee[2], callee[0], callee[1]) not in stack:
+                addStacks(callee, stack, fraction * calleeTimeFromFunc / calleeTotalTime)
+
+    #Start from the functions that weren't called by any other profiled function, other than cProfile turning itself off
+    for func, funcStats in stats.items():
+        if not any(caller in stats for caller in funcStats[4]) and "_lsprof.Profiler" not in func[2]:
+            addStacks(func, (), 1)
+    return formatCollapsedStacks(weightsByStack)
+
+#Call a function under a profiler
+#@param profilerType - One of PROFILER_TYPES
+#@return (what the function returned, the collapsed stacks of the call)
+#Will raise a ValueError for an unknown profiler type
+def profileCall(func, profilerType = "sample"):
+    if profilerType == "sample":
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            result = func()
+        finally:
+            profiler.stop()
+        return result, profiler.getCollapsedStacks()
+    elif profilerType == "cprofile":
+        import cProfile
+        profile = cProfile.Profile()
+        result = profile.runcall(func)
+        return result, getCProfileCollapsedStacks(profile)
+    raise ValueError("Unknown profiler type: " + str(profilerType))
+
+#Write collapsed stacks to <profilesDir>/<name>.collapsed, creating the directory if needed
+#@return The path of the file
+def writeCollapsedStacks(profilesDir, name, collapsedStacks):
+    os.makedirs(profilesDir, exist_ok = True)
+    filePath = os.path.join(profilesDir, name + COLLAPSED_STACKS_FILE_EXTENSION)
+    with open(filePath, 'w') as file:
+        file.write(collapsedStacks)
+    return filePath
@@ -9,13 +9,18 @@ class ResourceSourceTimeline(Timeline):
         #Needs a reference to the current resources so it can add to them
         self.mCurrentResources = currentResources
 
+    def cloneForBuildOrder(self, eventHandler, currentResources):
+        timeline = super().cloneForBuildOrder(eventHandler, currentResources)
+        timeline.mCurrentResources = currentResources
+        return timeline
+
 class CopseOfTreesTimeline(ResourceSourceTimeline):
     def __init__(self, timelineType, timelineID, eventHandler, currentResources):
         super().__init__(timelineType, timelineID, eventHandler, currentResources)
 
 
 class GoldMineTimeline(ResourceSourceTimeline):
-    def __init__(self, timelineType, timelineID, eventHandler, race, currentResources):
+    def __init__(self, timelineType, timelineID, eventHandler, race, currentResources, timeToWalkToMineSec = 2):
         super().__init__(timelineType, timelineID, eventHandler, currentResources)
         #Only used for Elf and Undead, since their workers stay in the mine
         self.mNumWorkersInMine = 0
@@ -23,9 +28,8 @@ class GoldMineTimeline(ResourceSourceTimeline):
 
         self.mRace = race
 
-        #TODO: This should later depend on the map
-        #Amount of time it takes a peon or peasant to walk to the mine from the town hall one-way, in simtime
-        self.mTimeToWalkToMine = 2 * SECONDS_TO_SIMTIME
+        #Amount of time it takes a peon or peasant to walk to the mine from the town hall one-way, in simtime. Depends on the map
+        self.mTimeToWalkToMine = round(timeToWalkToMineSec * SECONDS_TO_SIMTIME)
 
     #Sim time only needed for Undead and Elf, to bring their next +10 gold proportionally forward
     #Return -1 if Action failed to add, 0 if succeeded without delays, and >0 if the action was added, but for a later time
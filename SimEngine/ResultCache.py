@@ -0,0 +1,137 @@
+from SimEngine.SimulationConstants import SIMULATION_ENGINE_VERSION
+
+import os
+import json
+import time
+import gzip
+import pathlib
+import sqlite3
+import hashlib
+import threading
+
+#Disk-backed cache of simulated timelines, so results survive restarts and deploys and are shared by every process using the same file
+#(the REST service's processes and the batch simulator's workers). Kept in SQLite, in WAL mode so readers don't wait on writers
+#Entries are keyed by the engine version and a hash of the request, and hold the compact timelines JSON, gzipped. Once the entries add up
+#to more than the max size, the least recently used ones are evicted. Entries of older engine versions are never used again, so they're
+#evicted along with the rest
+
+#Default max total size of the cached timelines
+DEFAULT_MAX_SIZE_BYTES = 256 * 1024 * 1024
+#Evicting stops once the entries are down to this fraction of the max size, so every put after the cache fills up doesn't have to evict
+EVICT_TO_FRACTION_OF_MAX_SIZE = 0.9
+#An entry's last used time is only updated by a hit if it's older than this, so most hits don't have to write to the database
+LAST_USED_TIME_RESOLUTION_SEC = 60
+
+#gzip defaults to 9, which is much slower for barely smaller timelines
+GZIP_COMPRESS_LEVEL = 6
+
+#Get the key of a request: a hash of its build orders and anything else the timelines depend on, as canonical JSON. So the same build orders
+#with their keys in a different order are the same request
+#@param teamBuildOrdersList - List of build order dicts (race and ordered action list), already converted from JSON
+#@param options - Dict of whatever else changes the timelines (like a timeline filter). Leave it empty for the full timelines, so every
+#caller asking for those shares the same entries
+def getResultKey(teamBuildOrdersList, options = None):
+    canonicalJSON = json.dumps([teamBuildOrdersList, options or {}], sort_keys = True, separators = (",", ":"))
+    return hashlib.sha256(canonicalJSON.encode("utf-8")).hexdigest()
+
+def compressTimelines(timelinesJSON):
+    #A fixed mtime keeps the gzipped bytes the same every time
+    return gzip.compress(timelinesJSON.encode("utf-8"), GZIP_COMPRESS_LEVEL, mtime = 0)
+
+def decompressTimelines(compressedTimelines):
+    return gzip.decompress(compressedTimelines).decode("utf-8")
+
+class ResultCache:
+    #@param maxSizeBytes - Max total size of the compressed timelines. Processes sharing a file should use the same max size
+    def __init__(self, databasePath, maxSizeBytes = DEFAULT_MAX_SIZE_BYTES, engineVersion = SIMULATION_ENGINE_VERSION):
+        self.mDatabasePath = databasePath
+        self.mMaxSizeBytes = maxSizeBytes
+        self.mEngineVersion = engineVersion
+        #sqlite3 connections can't be shared between threads (or processes), so each thread gets its own
+        self.mThreadLocal = threading.local()
+
+        pathlib.Path(databasePath).parent.mkdir(parents=True, exist_ok=True)
+        connection = self._getConnection()
+        #WAL lets readers keep going while another process is writing
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS results (engineVersion TEXT NOT NULL, requestKey TEXT NOT NULL, timelines BLOB NOT NULL, "
+                               "size INTEGER NOT NULL, lastUsedTime REAL NOT NULL, PRIMARY KEY (engineVersion, requestKey))")
+            connection.execute("CREATE INDEX IF NOT EXISTS resultsByLastUsedTime ON results (lastUsedTime)")
+            #Total size of the entries, kept up to date with every put and eviction so checking it doesn't have to add them all up
+            connection.execute("CREATE TABLE IF NOT EXISTS cacheSize (totalSize INTEGER NOT NULL)")
+            if connection.execute("SELECT COUNT(*) FROM cacheSize").fetchone()[0] == 0:
+                connection.execute("INSERT INTO cacheSize (totalSize) SELECT COALESCE(SUM(size), 0) FROM results")
+
+    def _getConnection(self):
+        connection = getattr(self.mThreadLocal, 'connection', None)
+        #A forked process gets a copy of the thread's connection, which it can't use
+        if connection == None or self.mThreadLocal.pid != os.getpid():
+            connection = sqlite3.connect(self.mDatabasePath, timeout = 30)
+            self.mThreadLocal.connection = connection
+            self.mThreadLocal.pid = os.getpid()
+        return connection
+
+    #Get the compressed timelines cached for a request
+    #@return The compressed timelines, or None if they aren't cached (or the cache couldn't be read)
+    def get(self, requestKey):
+        try:
+            connection = self._getConnection()
+            row = connection.execute("SELECT timelines, lastUsedTime FROM results WHERE engineVersion = ? AND requestKey = ?",
+                                     (self.mEngineVersion, requestKey)).fetchone()
+            if row == None:
+                return None
+            now = time.time()
+            if now - row[1] > LAST_USED_TIME_RESOLUTION_SEC:
+                with connection:
+                    connection.execute("UPDATE results SET lastUsedTime = ? WHERE engineVersion = ? AND requestKey = ?", (now, self.mEngineVersion, requestKey))
+            return row[0]
+        except sqlite3.Error as e:
+            #The cache is only an optimization, so a problem with it just means simulating again
+            print("Could not read result cache", self.mDatabasePath, "-", e)
+            return None
+
+    #Cache the compressed timelines of a request, evicting the least recently used entries if the cache is over its max size
+    #@return True if they were cached. Timelines bigger than the whole cache aren't
+    def put(self, requestKey, compressedTimelines):
+        size = len(compressedTimelines)
+        if size > self.mMaxSizeBytes:
+            return False
+        try:
+            connection = self._getConnection()
+            with connection:
+                #Hold the write lock from the start, so the total size can't change between reading and updating it
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute("SELECT size FROM results WHERE engineVersion = ? AND requestKey = ?", (self.mEngineVersion, requestKey)).fetchone()
+                sizeChange = size - (row[0] if row else 0)
+                connection.execute("INSERT OR REPLACE INTO results (engineVersion, requestKey, timelines, size, lastUsedTime) VALUES (?, ?, ?, ?, ?)",
+                                   (self.mEngineVersion, requestKey, compressedTimelines, size, time.time()))
+                connection.execute("UPDATE cacheSize SET totalSize = totalSize + ?", (sizeChange,))
+                self._evict(connection)
+            return True
+        except sqlite3.Error as e:
+            print("Could not write result cache", self.mDatabasePath, "-", e)
+            return False
+
+    #Evict the least recently used entries until they're down to EVICT_TO_FRACTION_OF_MAX_SIZE of the max size, if they're over it
+    #Must be called in a write transaction
+    def _evict(self, connection):
+        totalSize = connection.execute("SELECT totalSize FROM cacheSize").fetchone()[0]
+        if totalSize <= self.mMaxSizeBytes:
+            return
+        targetSize = self.mMaxSizeBytes * EVICT_TO_FRACTION_OF_MAX_SIZE
+        evictedKeys = []
+        for engineVersion, requestKey, size in connection.execute("SELECT engineVersion, requestKey, size FROM results ORDER BY lastUsedTime"):
+            if totalSize <= targetSize:
+                break
+            evictedKeys.append((engineVersion, requestKey))
+            totalSize -= size
+        connection.executemany("DELETE FROM results WHERE engineVersion = ? AND requestKey = ?", evictedKeys)
+        connection.execute("UPDATE cacheSize SET totalSize = ?", (totalSize,))
+
+    def getNumEntries(self):
+        return self._getConnection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    #Total size of the compressed timelines, in bytes
+    def getTotalSize(self):
+        return self._getConnection().execute("SELECT totalSize FROM cacheSize").fetchone()[0]
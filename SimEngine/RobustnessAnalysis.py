@@ -0,0 +1,245 @@
+from SimEngine.BuildOrder import BuildOrder, MapStartingPosition
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
+from SimEngine.ParameterSweep import RACES_THAT_WALK_TO_MINE, SWEEP_PARAMETER_DEFAULTS, IDEAL_MAP_LUMBER_TRIP_TRAVEL_TIME_SEC, IDEAL_MAP_GOLD_TRIP_TRAVEL_TIME_SEC
+from SimEngine.Action import Action
+from SimEngine.WorkerPool import createProcessPoolExecutor
+
+import io
+import sys
+import json
+import time
+import pickle
+import random
+import argparse
+import contextlib
+import numpy as np
+
+#Runs a build many times with random changes to its timings, like a real game where nothing happens exactly when planned,
+#and reports how spread out each action's start time and the resources floating when it starts end up being
+#The random changes are all made up front from the seed, so the results only depend on the seed (not on how the runs are split
+#between processes)
+#Runs that come out the same up to some action share the simulation up to it. The runs are kept in a tree by their actions, and
+#each branch starts from an unpickled copy of where its parent left off. With the default changes runs split up within the first
+#few actions, so this mostly pays off when only the later part of a build is changed (see firstPerturbedActionIndex)
+
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+
+#Only actions that send a worker somewhere have a reaction delay
+ACTION_TYPES_WITH_REACTION_DELAY = ['WorkerMovementAction', 'BuildStructureAction']
+
+#Get the action dicts of one run, with its travel times and reaction delays changed
+#@param rng - random.Random to draw the changes from
+#@param travelTimeJitter - Each travel time is scaled by a random amount up to this fraction either way
+#@param maxReactionDelaySec - A random delay of up to this long is added to every action that sends a worker somewhere
+#@param firstPerturbedActionIndex - Actions before this one are left as they are
+def _perturbActionDicts(rng, orderedActionList, travelTimeJitter, maxReactionDelaySec, firstPerturbedActionIndex):
+    perturbedActionDicts = list(orderedActionList[:firstPerturbedActionIndex])
+    for actionDict in orderedActionList[firstPerturbedActionIndex:]:
+        travelTime = actionDict.get('travelTime')
+        if travelTime != None:
+            travelTime = travelTime * rng.uniform(1 - travelTimeJitter, 1 + travelTimeJitter)
+        if actionDict['actionType'] in ACTION_TYPES_WITH_REACTION_DELAY:
+            travelTime = (travelTime or 0) + rng.uniform(0, maxReactionDelaySec) * SECONDS_TO_SIMTIME
+        if travelTime == None:
+            perturbedActionDicts.append(actionDict)
+        else:
+            #Travel times are in whole simtime
+            perturbedActionDicts.append(dict(actionDict, travelTime = max(0, round(travelTime))))
+    return perturbedActionDicts
+
+#Make every run's changes, in order, from the seed
+#@param mineWalkJitterSec - The time to walk between the town hall and the mine is changed by a random amount up to this much either way
+#This changes the whole build, so it should be 0 when only looking at the build after some action
+#@return List of (time to walk to the mine in seconds, perturbed action dicts), one for each run
+def getPerturbedRuns(race, orderedActionList, numRuns, seed, travelTimeJitter = 0.2, maxReactionDelaySec = 1, mineWalkJitterSec = 0.5, firstPerturbedActionIndex = 0):
+    rng = random.Random(seed)
+    runs = []
+    for i in range(numRuns):
+        timeToWalkToMineSec = SWEEP_PARAMETER_DEFAULTS['timeToWalkToMineSec']
+        #Races that don't walk to the mine all share the same walk time, so more of their runs can share simulation
+        if race in RACES_THAT_WALK_TO_MINE:
+            timeToWalkToMineSec += rng.uniform(-mineWalkJitterSec, mineWalkJitterSec)
+            timeToWalkToMineSec = max(0, round(timeToWalkToMineSec * SECONDS_TO_SIMTIME)) / SECONDS_TO_SIMTIME
+        runs.append( (timeToWalkToMineSec, _perturbActionDicts(rng, orderedActionList, travelTimeJitter, maxReactionDelaySec, firstPerturbedActionIndex)) )
+    return runs
+
+#Key to tell whether two runs do the same thing for an action
+def _getActionKey(actionDict):
+    return json.dumps(actionDict, sort_keys = True)
+
+#Simulate the next action of a run, and add its start time and the resources floating after it to the run's records
+#@return True if successful, False otherwise
+def _simulateRunAction(buildOrder, actionDict, records):
+    if not buildOrder.simulateAction(Action.getActionFromDict(actionDict)):
+        return False
+    resources = buildOrder.getCurrentResources()
+    records.append( (buildOrder.mOrderedActionList[-1].getStartTime(), resources.getCurrentGold(), resources.getCurrentLumber()) )
+    return True
+
+#Simulate a group of runs that are the same for their first numActionsSimulated actions, starting from a build order that has
+#simulated those actions. Actions the runs still have in common are simulated once, and then the group is split up by its next action
+#@param runs - List of (run index, perturbed action dicts)
+#@param records - The records of the actions simulated so far, shared by every run in the group
+#@param results - Dict of run index to (simulation succeeded, records, end time) to add the group's results to
+#@return Number of actions simulated
+def _simulateRunGroup(buildOrder, numActionsSimulated, runs, records, results):
+    numSimulatedActions = 0
+    numActions = len(runs[0][1])
+    while numActionsSimulated < numActions:
+        groups = {}
+        for run in runs:
+            groups.setdefault(_getActionKey(run[1][numActionsSimulated]), []).append(run)
+        if len(groups) > 1:
+            break
+        numSimulatedActions += 1
+        if not _simulateRunAction(buildOrder, runs[0][1][numActionsSimulated], records):
+            #Simulating from scratch would stop at the failed action, so all the runs stop here
+            for runIndex, actionDicts in runs:
+                results[runIndex] = (False, records, buildOrder.getEndTime())
+            return numSimulatedActions
+        numActionsSimulated += 1
+    else:
+        for runIndex, actionDicts in runs:
+            results[runIndex] = (True, records, buildOrder.getEndTime())
+        return numSimulatedActions
+
+    #Only pickle once, and unpickle a copy for each branch. The build order itself isn't needed anymore, and keeping it around
+    #while the branches are simulated just gives the garbage collector more to go through
+    pickledBuildOrder = pickle.dumps(buildOrder)
+    buildOrder = None
+    for groupRuns in groups.values():
+        numSimulatedActions += _simulateRunGroup(pickle.loads(pickledBuildOrder), numActionsSimulated, groupRuns, list(records), results)
+    return numSimulatedActions
+
+#Simulate a chunk of runs. Module-level, so it can run in a worker process
+#@param runs - List of (run index, time to walk to the mine in seconds, perturbed action dicts)
+#@return (dict of run index to (simulation succeeded, records, end time), number of actions simulated)
+def _simulateRuns(race, runs):
+    runsByWalkTime = {}
+    for runIndex, timeToWalkToMineSec, actionDicts in runs:
+        runsByWalkTime.setdefault(timeToWalkToMineSec, []).append( (runIndex, actionDicts) )
+
+    results = {}
+    numSimulatedActions = 0
+    #Failed runs are expected, and the report says how many, so don't print why
+    with contextlib.redirect_stdout(io.StringIO()):
+        for timeToWalkToMineSec, walkTimeRuns in runsByWalkTime.items():
+            mapStartingPosition = MapStartingPosition("Robustness_Analysis", IDEAL_MAP_LUMBER_TRIP_TRAVEL_TIME_SEC, IDEAL_MAP_GOLD_TRIP_TRAVEL_TIME_SEC,
+                                                      timeToWalkToMineSec)
+            numSimulatedActions += _simulateRunGroup(BuildOrder(race, mapStartingPosition), 0, walkTimeRuns, [], results)
+    return results, numSimulatedActions
+
+#Get the percentiles of some values as a dict, or None if there aren't any values
+def _getPercentiles(values, percentiles):
+    if len(values) == 0:
+        return None
+    return {str(percentile) : float(value) for percentile, value in zip(percentiles, np.percentile(values, percentiles))}
+
+#Run a build many times with random changes to its timings
+#@param race - Race of the build order
+#@param orderedActionList - The build's action dicts, in order
+#@param numRuns - Number of runs
+#@param seed - Seed for the random changes. The same seed always gives the same results
+#@param executor - If passed in, a concurrent.futures.Executor to simulate the runs in. Must be a ProcessPoolExecutor
+#for the simulations to actually run in parallel, since they don't release the GIL
+#@param numChunks - Number of chunks to split the runs into for the executor. Defaults to the number of worker processes
+#For the rest of the parameters, see getPerturbedRuns
+#@return { "numRuns", "seed", "numSucceeded", "endTime" : <percentiles of the successful runs>, "actions" : [{ "actionIndex", "name",
+#"numRuns" : <runs that got to the action>, "startTime", "gold", "lumber" }, ...], "numSimulatedActions", "elapsedSec" }
+#Percentiles are dicts of percentile (as a string) to value, and are None if no runs got that far. Times are in simtime
+def analyzeRobustness(race, orderedActionList, numRuns, seed, travelTimeJitter = 0.2, maxReactionDelaySec = 1, mineWalkJitterSec = 0.5,
+                      firstPerturbedActionIndex = 0, percentiles = DEFAULT_PERCENTILES, executor = None, numChunks = None):
+    startTime = time.perf_counter()
+    perturbedRuns = getPerturbedRuns(race, orderedActionList, numRuns, seed, travelTimeJitter, maxReactionDelaySec, mineWalkJitterSec, firstPerturbedActionIndex)
+    #Sorted, so runs that share the most are in the same chunk
+    runs = sorted([(runIndex, timeToWalkToMineSec, actionDicts) for runIndex, (timeToWalkToMineSec, actionDicts) in enumerate(perturbedRuns)],
+                  key = lambda run: (run[1], [_getActionKey(actionDict) for actionDict in run[2]]))
+
+    if executor != None and numRuns > 1:
+        if numChunks == None:
+            numChunks = getattr(executor, '_max_workers', 1)
+        chunkSize = -(-numRuns // numChunks)
+        futures = [executor.submit(_simulateRuns, race, runs[i:i + chunkSize]) for i in range(0, numRuns, chunkSize)]
+        chunkResults = [future.result() for future in futures]
+    else:
+        chunkResults = [_simulateRuns(race, runs)]
+
+    results = {}
+    numSimulatedActions = 0
+    for chunkResult, chunkNumSimulatedActions in chunkResults:
+        results.update(chunkResult)
+        numSimulatedActions += chunkNumSimulatedActions
+
+    actionSummaries = []
+    for actionIndex, actionDict in enumerate(orderedActionList):
+        actionRecords = [results[runIndex][1][actionIndex] for runIndex in range(numRuns) if len(results[runIndex][1]) > actionIndex]
+        actionSummaries.append({
+            'actionIndex' : actionIndex,
+            'name' : actionDict.get('name'),
+            'numRuns' : len(actionRecords),
+            'startTime' : _getPercentiles([record[0] for record in actionRecords], percentiles),
+            'gold' : _getPercentiles([record[1] for record in actionRecords], percentiles),
+            'lumber' : _getPercentiles([record[2] for record in actionRecords], percentiles)
+        })
+
+    succeededResults = [results[runIndex] for runIndex in range(numRuns) if results[runIndex][0]]
+    return {
+        'numRuns' : numRuns,
+        'seed' : seed,
+        'numSucceeded' : len(succeededResults),
+        'endTime' : _getPercentiles([endTime for succeeded, records, endTime in succeededResults], percentiles),
+        'actions' : actionSummaries,
+        'numSimulatedActions' : numSimulatedActions,
+        'elapsedSec' : time.perf_counter() - startTime
+    }
+
+#Format an analysis as a table, with a line for each action. Times are in seconds
+def formatTable(analysis):
+    percentileNames = list(next((summary['startTime'] for summary in analysis['actions'] if summary['startTime'] != None), {}).keys())
+
+    def formatPercentiles(percentileValues, scale):
+        if percentileValues == None:
+            return ["-"] * len(percentileNames)
+        return ["{:.1f}".format(percentileValues[name] / scale) for name in percentileNames]
+
+    header = ["#", "action", "runs"] + ["start p" + name for name in percentileNames] + ["gold p" + name for name in percentileNames] + ["lumber p" + name for name in percentileNames]
+    lines = [header]
+    for summary in analysis['actions']:
+        lines.append([str(summary['actionIndex']), summary['name'] or "-", str(summary['numRuns'])] + formatPercentiles(summary['startTime'], SECONDS_TO_SIMTIME) +
+                     formatPercentiles(summary['gold'], 1) + formatPercentiles(summary['lumber'], 1))
+
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run a build many times with random changes to its timings, and print how spread out each action's start time and floating resources are")
+    parser.add_argument("buildFile", help = "JSON file with a build order ({ \"race\", \"orderedActionList\" }), or a list whose first entry is one")
+    parser.add_argument("--runs", type = int, default = 1000, help = "Number of runs")
+    parser.add_argument("--seed", type = int, default = 0, help = "Seed for the random changes")
+    parser.add_argument("--travelTimeJitter", type = float, default = 0.2, help = "Fraction each travel time can change by either way")
+    parser.add_argument("--maxReactionDelaySec", type = float, default = 1, help = "Longest delay added to actions that send a worker somewhere")
+    parser.add_argument("--mineWalkJitterSec", type = float, default = 0.5, help = "Seconds the walk to the mine can change by either way (Human and Orc)")
+    parser.add_argument("--firstPerturbedActionIndex", type = int, default = 0, help = "Only change the timings of this action and the ones after it")
+    parser.add_argument("--workers", type = int, default = 1, help = "Number of worker processes to simulate in")
+    parser.add_argument("--json", action = "store_true", help = "Print the results as JSON instead of a table")
+    args = parser.parse_args()
+
+    with open(args.buildFile, 'r') as file:
+        buildOrderDict = json.loads(file.read())
+    if isinstance(buildOrderDict, list):
+        buildOrderDict = buildOrderDict[0]
+
+    analysisArgs = (Race[buildOrderDict['race']], buildOrderDict['orderedActionList'], args.runs, args.seed, args.travelTimeJitter, args.maxReactionDelaySec, args.mineWalkJitterSec,
+                    args.firstPerturbedActionIndex)
+    if args.workers > 1:
+        with createProcessPoolExecutor(args.workers) as executor:
+            analysis = analyzeRobustness(*analysisArgs, executor = executor)
+    else:
+        analysis = analyzeRobustness(*analysisArgs)
+
+    if args.json:
+        print(json.dumps(analysis))
+    else:
+        print(formatTable(analysis))
+        print(str(analysis['numSucceeded']) + "/" + str(analysis['numRuns']) + " runs succeeded, " + str(analysis['numSimulatedActions']) + " actions simulated in " +
+              "{:.2f}".format(analysis['elapsedSec']) + "s", file = sys.stderr)
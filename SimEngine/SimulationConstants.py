@@ -1,5 +1,9 @@
 from enum import Enum, auto
 
+#Bump this whenever a change to the SimEngine could change simulation results for the same input
+#Anything cached from simulation output (ETags, stored results, etc.) is keyed on this, so old results won't be served
+SIMULATION_ENGINE_VERSION = "2"
+
 SECONDS_TO_SIMTIME = 10 #simtime is in deciseconds
 SIMTIME_TO_SECONDS = 1/SECONDS_TO_SIMTIME #simtime is in deciseconds
 
@@ -1,7 +1,37 @@
 from SimEngine.BuildOrder import BuildOrder
+from SimEngine.JSONEncoding import encodeJSON
 
 import json
 
+#Number of characters to collect before yielding a chunk of streamed JSON
+#Keeps the number of chunks down, since most pieces (a single action) are tiny
+STREAMED_JSON_CHUNK_SIZE = 64 * 1024
+
+#Join small pieces of a string into chunks of at least chunkSize characters (except for the last one)
+def _joinIntoChunks(pieces, chunkSize):
+    buffer = []
+    bufferSize = 0
+    for piece in pieces:
+        buffer.append(piece)
+        bufferSize += len(piece)
+        if bufferSize >= chunkSize:
+            yield "".join(buffer)
+            buffer = []
+            bufferSize = 0
+    if buffer:
+        yield "".join(buffer)
+
+#Yields the compact JSON of a list of timelines, one action at a time
+def _iterTimelinesJSONPieces(timelines, timelineFilter):
+    yield "["
+    for i, timeline in enumerate(BuildOrder.getTimelinesForSerialization(timelines, timelineFilter)):
+        yield ("," if i > 0 else "") + '{"timelineType":' + encodeJSON(timeline.getTimelineType(), False) + \
+              ',"timelineID":' + encodeJSON(timeline.getTimelineID(), False) + ',"actions":['
+        for j, actionDict in enumerate(timeline.iterActionDictsForSerialization(timelineFilter)):
+            yield ("," if j > 0 else "") + encodeJSON(actionDict, False)
+        yield "]}"
+    yield "]"
+
 class SimulationEngine:
     def __init__(self):
         self.mTeamBuildOrders = []
@@ -13,12 +43,16 @@ class SimulationEngine:
             self.mTeamBuildOrders.append(BuildOrder(race))
 
     #Takes JSON of ordered action list for team build orders and simulate from scratch
-    def loadStateFromActionListsJSON(self, stateJSON):
-        teamBuildOrdersList = json.loads(stateJSON)
+    #@param collectStats - If True, count what the engine does while simulating each build order (see getStats)
+    #@param openingBook - If passed in, build orders that start with one of its openings are simulated from there (see OpeningBook.py)
+    def loadStateFromActionListsJSON(self, stateJSON, collectStats = False, openingBook = None):
+        return self.loadStateFromActionLists(json.loads(stateJSON), collectStats, openingBook)
 
+    #Same as loadStateFromActionListsJSON, but takes the ordered action lists already converted from JSON
+    def loadStateFromActionLists(self, teamBuildOrdersList, collectStats = False, openingBook = None):
         self.mTeamBuildOrders = []
         for buildOrderDict in teamBuildOrdersList:
-           self.mTeamBuildOrders.append(BuildOrder.simulateBuildOrderFromDict(buildOrderDict))
+           self.mTeamBuildOrders.append(BuildOrder.simulateBuildOrderFromDict(buildOrderDict, collectStats = collectStats, openingBook = openingBook))
 
         if (len(self.mTeamBuildOrders)) == 0:
             return False
@@ -26,20 +60,56 @@ class SimulationEngine:
             return True
 
     #Returns the JSON of the current build order states as timelines
-    def getJSONStateAsTimelines(self):
+    #@param pretty - Indent the JSON. Compact JSON is about half the size and much faster to encode
+    #@param timelineFilter - If passed in, only include the timelines and actions that it includes
+    def getJSONStateAsTimelines(self, pretty = True, timelineFilter = None):
         list = [] 
         for buildOrder in self.mTeamBuildOrders:
-            list.append(buildOrder.getSimTimeAndTimelinesAsDictForSerialization())
+            list.append(buildOrder.getSimTimeAndTimelinesAsDictForSerialization(timelineFilter))
+
+        return encodeJSON(list, pretty)
 
-        return json.dumps(list, indent = 2)
+    #Returns the JSON of only the timelines that changed from the versions the client already has, for each build order
+    #@param knownTimelineVersions - List with a dict for each build order, of timeline ID to the version tag the client has for that timeline
+    #The IDs can be strings, since that's what they'll be if they came from JSON
+    def getJSONStateAsTimelineDeltas(self, knownTimelineVersions, pretty = False):
+        list = []
+        for i, buildOrder in enumerate(self.mTeamBuildOrders):
+            knownVersions = knownTimelineVersions[i] if i < len(knownTimelineVersions) else {}
+            knownVersions = {int(timelineID): versionTag for timelineID, versionTag in knownVersions.items()}
+            list.append(buildOrder.getSimTimeAndTimelineDeltasAsDictForSerialization(knownVersions))
+
+        return encodeJSON(list, pretty)
+
+    #Yields the same JSON as getJSONStateAsTimelines(pretty = False), in chunks of about chunkSize characters
+    #Only one action is converted to a dict at a time, so memory use stays flat however long the build is
+    def iterJSONStateAsTimelines(self, chunkSize = STREAMED_JSON_CHUNK_SIZE, timelineFilter = None):
+        return _joinIntoChunks(self._iterJSONStateAsTimelinesPieces(timelineFilter), chunkSize)
+
+    def _iterJSONStateAsTimelinesPieces(self, timelineFilter):
+        yield "["
+        for i, buildOrder in enumerate(self.mTeamBuildOrders):
+            yield ("," if i > 0 else "") + '{"currentSimTime":' + encodeJSON(buildOrder.getCurrentSimTime(), False) + ',"activeTimelines":'
+            yield from _iterTimelinesJSONPieces(buildOrder.getActiveTimelines(), timelineFilter)
+            yield ',"inactiveTimelines":'
+            if timelineFilter and timelineFilter.mActiveOnly:
+                yield "[]"
+            else:
+                yield from _iterTimelinesJSONPieces(buildOrder.getInactiveTimelines(), timelineFilter)
+            yield ',"currentResources":' + encodeJSON(buildOrder.getCurrentResources().getAsDictForSerialization(), False) + "}"
+        yield "]"
 
     #Returns the JSON of the current build order states as action lists
-    def getJSONStateAsActionLists(self):
+    def getJSONStateAsActionLists(self, pretty = True):
         list = [] 
         for buildOrder in self.mTeamBuildOrders:
             list.append(buildOrder.getRaceAndActionListAsDictForSerialization())
 
-        return json.dumps(list, indent = 2)
+        return encodeJSON(list, pretty)
+
+    #@return List with the stats dict of each build order (None for any that weren't collecting stats)
+    def getStatsAsDictsForSerialization(self):
+        return [buildOrder.getStats().getAsDictForSerialization() if buildOrder.getStats() != None else None for buildOrder in self.mTeamBuildOrders]
 
     def getTeamBuildOrders(self):
         return self.mTeamBuildOrders
\ No newline at end of file
@@ -0,0 +1,43 @@
+#Counts what the engine does while simulating a build order, to tell where the time of a slow simulation went
+#Only collected if the BuildOrder is asked to (see BuildOrder.__init__), since it adds a little work to every tick and event
+class SimulationStats:
+    def __init__(self):
+        self.mEventsExecuted = 0
+        self.mEventsReversed = 0
+        #Number of times an event was delayed, and the number of new events that were registered for those delays
+        #(the rest of the event's group is delayed along with it)
+        self.mEventsDelayed = 0
+        self.mDelaySpawnedEvents = 0
+        #Number of new events registered by events and event groups recurring
+        self.mEventsRecurred = 0
+        #Simtimes that events were executed (or reversed) for, and how many of the executed ones had nothing to execute
+        self.mTicksAdvanced = 0
+        self.mEmptyTicks = 0
+        self.mTicksReversed = 0
+        #Time spent simulating backward (inside of simulating actions)
+        self.mSimulateBackwardSec = 0
+        #Trigger type name -> number of actions simulated with that trigger, and the total time spent simulating them
+        self.mActionsByTriggerType = {}
+        self.mSimulateActionSecByTriggerType = {}
+
+    def addTick(self, isEmpty):
+        self.mTicksAdvanced += 1
+        if isEmpty:
+            self.mEmptyTicks += 1
+
+    def addAction(self, triggerType, simulateSec):
+        self.mActionsByTriggerType[triggerType.name] = self.mActionsByTriggerType.get(triggerType.name, 0) + 1
+        self.mSimulateActionSecByTriggerType[triggerType.name] = self.mSimulateActionSecByTriggerType.get(triggerType.name, 0) + simulateSec
+
+    #Add another build order's stats to these ones, like for the total of a team's build orders
+    def merge(self, otherStats):
+        for name, value in otherStats.__dict__.items():
+            if isinstance(value, dict):
+                for key, amount in value.items():
+                    getattr(self, name)[key] = getattr(self, name).get(key, 0) + amount
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    #Get as dict for JSON encoding. Keys are the member names without the m
+    def getAsDictForSerialization(self):
+        return {name[1].lower() + name[2:] : dict(value) if isinstance(value, dict) else value for name, value in self.__dict__.items()}
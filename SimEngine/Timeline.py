@@ -3,6 +3,44 @@ from SimEngine.Worker import WorkerTask, isUnitWorker, Worker
 from SimEngine.Event import Event
 from SimEngine.EventGroup import EventGroup
 
+from functools import partial
+
+#Event functions are partials of these rather than closures, so that copies of the events act on copies of the timelines (see Event.py)
+def _addNewTimeline(inactiveTimelines, timelineName, timelineID, eventHandler, currSimTime):
+    if isUnitWorker(timelineName):
+        inactiveTimelines.append(WorkerTimeline.getNewWorkerTimeline(timelineName, timelineID, eventHandler))
+    else:
+        inactiveTimelines.append(Timeline(timelineName, timelineID, eventHandler))
+
+def _removeTimeline(inactiveTimelines, timelineID, currSimTime):
+    for i in range(len(inactiveTimelines)):
+        if inactiveTimelines[i].getTimelineID() == timelineID:
+            inactiveTimelines.pop(i)
+            return
+
+def _addResourceToWorker(workerTimeline, isResourceGold, amtToAdd, currSimTime):
+    workerTimeline.addResource(isResourceGold, amtToAdd)
+
+def _removeResourcesFromWorker(workerTimeline, isResourceGold, amtToRemove, currSimTime):
+    workerTimeline.removeResource(isResourceGold, amtToRemove)
+
+def _returnResourcesFromWorker(workerTimeline, isResourceGold, amtToReturn, currentResources, currSimTime):
+    workerTimeline.returnResources(currentResources, amtToReturn, isResourceGold)
+
+def _unreturnResourcesFromWorker(workerTimeline, isResourceGold, amtToReturn, currentResources, currSimTime):
+    #Add the resource back to the worker from our resource totals
+    workerTimeline.addResource(isResourceGold, amtToReturn)
+    if isResourceGold:
+        currentResources.deductGold(amtToReturn)
+    else:
+        currentResources.deductLumber(amtToReturn)
+
+def _changeWorkerTask(workerTimeline, simTime, newTask, resourceSourceTimeline, currSimTime):
+    workerTimeline.changeTask(simTime, newTask, resourceSourceTimeline)
+
+def _revertWorkerTask(workerTimeline, simTime, originalTask, currSimTime):
+    workerTimeline.changeTask(simTime, originalTask, workerTimeline.mCurrentResourceSourceTimeline)
+
 # Represents a single timeline on the planner. For example, the production queue of a barracks, or blacksmith, etc.
 class Timeline:
     def __init__(self, timelineType, timelineID, eventHandler):
@@ -10,29 +48,32 @@ class Timeline:
         self.mTimelineType = timelineType
         self.mTimelineID = timelineID
         self.mEventHandler = eventHandler
+        #Incremented whenever actions are added or removed
+        self.mVersion = 0
+        #Cached result of getVersionTag, and the version it was computed for
+        self.mVersionTag = None
+        self.mVersionTagVersion = None
 
     #Convenience method for getting an event that adds a new timeline and can be reversed
     @staticmethod
     def getNewTimelineEvent(inactiveTimelines, simTime, timelineName, timelineID, eventName, eventID, eventHandler):
-        def removeTimeline(id):
-            for i in range(len(inactiveTimelines)):
-                if inactiveTimelines[i].getTimelineID() == id:
-                    inactiveTimelines.pop(i)
-                    return
-
-        getNewTimelineFunc = lambda: Timeline(timelineName, timelineID, eventHandler)
-        if isUnitWorker(timelineName):
-            getNewTimelineFunc = lambda: WorkerTimeline.getNewWorkerTimeline(timelineName, timelineID, eventHandler)
-                    
-        def eventFunc(currSimTime):
-            inactiveTimelines.append(getNewTimelineFunc())
-        def reverseFunc(currSimTime):
-            removeTimeline(timelineID)
+        eventFunc = partial(_addNewTimeline, inactiveTimelines, timelineName, timelineID, eventHandler)
+        reverseFunc = partial(_removeTimeline, inactiveTimelines, timelineID)
         event = Event(eventFunction = eventFunc, reverseFunction = reverseFunc, eventTime=simTime, recurPeriodSimtime=0, 
                       eventID=eventID, eventName=eventName)
 
         return event
 
+    #Get a copy of this timeline with no actions, for a new build order with its own event handler and resources
+    #Only meant for timelines that haven't had anything simulated on them, like the templates build orders start from (see BuildOrder.py)
+    def cloneForBuildOrder(self, eventHandler, currentResources):
+        timeline = object.__new__(self.__class__)
+        state = self.__dict__.copy()
+        state['mActions'] = []
+        state['mEventHandler'] = eventHandler
+        timeline.__dict__ = state
+        return timeline
+
     def getTimelineType(self):
         return self.mTimelineType
 
@@ -47,6 +88,7 @@ class Timeline:
     def removeAction(self, actionID):
         for i in range(len(self.mActions)):
             if self.mActions[i].mActionID == actionID:
+                self.mVersion += 1
                 return self.mActions.pop(i)
 
     #Returns the latest action on the Timeline
@@ -113,6 +155,7 @@ class Timeline:
             #Remove all Actions after this new one, since we will have to recalculate all of those anyway
             #and we want to ensure the list still has no overlapping
             self.mActions = self.mActions[:i + 1]
+            self.mVersion += 1
             if currentResources:
                 newAction.payForAction(currentResources)
             self.mIsActive = True
@@ -139,20 +182,36 @@ class Timeline:
             if i == len(self.mActions) or actionStartTime < self.mActions[i].mStartTime:
                 return i
 
-    def getAsDictForSerialization(self):
+    #@param timelineFilter - If passed in, only actions within its simtime window are included
+    def getAsDictForSerialization(self, timelineFilter = None):
         dict = {
             'timelineType' : self.mTimelineType,
             'timelineID' : self.mTimelineID,
-            'actions' : []
+            'actions' : list(self.iterActionDictsForSerialization(timelineFilter))
         }
 
-        for action in self.mActions:
-            actionDict = action.getAsDictForSerialization()
+        return dict
+
+    #Get a tag that identifies the serialized content of this timeline. Two timelines with the same tag serialize the same
+    #Unlike mVersion, this can be compared between separate simulations, so clients can tell whether a timeline changed since they last got it
+    def getVersionTag(self):
+        if self.mVersionTagVersion != self.mVersion:
+            #Only needed when serializing, so they aren't imported along with the engine
+            import hashlib
+            from SimEngine.JSONEncoding import encodeJSON
+            content = encodeJSON([self.mTimelineType, list(self.iterActionDictsForSerialization())], False)
+            self.mVersionTag = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+            self.mVersionTagVersion = self.mVersion
+        return self.mVersionTag
+
+    #Yields the dict of each action that should be serialized, one at a time
+    def iterActionDictsForSerialization(self, timelineFilter = None):
+        first, last = timelineFilter.getActionIndexRange(self.mActions) if timelineFilter else (0, len(self.mActions))
+        for i in range(first, last):
+            actionDict = self.mActions[i].getAsDictForSerialization()
             #Actions that don't concern the user will return None here and won't be serialized
             if actionDict != None:
-                dict['actions'].append(actionDict)
-
-        return dict
+                yield actionDict
 
     def printTimeline(self):
         print(self.mTimelineType, "Timeline (ID:", str(self.mTimelineID), "):", self.mActions)
@@ -207,10 +266,8 @@ class WorkerTimeline(Timeline):
     #Convenience method for getting an event that adds a resource to a Worker and can be reversed
     @staticmethod
     def getAddResourceToWorkerEvent(workerTimeline, isResourceGold, amtToAdd, simTime, eventName, eventID):
-        def eventFunc(currSimTime):
-            workerTimeline.addResource(isResourceGold, amtToAdd)
-        def reverseFunc(currSimTime):
-            workerTimeline.removeResources(isResourceGold, amtToAdd)
+        eventFunc = partial(_addResourceToWorker, workerTimeline, isResourceGold, amtToAdd)
+        reverseFunc = partial(_removeResourcesFromWorker, workerTimeline, isResourceGold, amtToAdd)
         event = Event(eventFunction = eventFunc, reverseFunction = reverseFunc, eventTime=simTime, recurPeriodSimtime=0, 
                       eventID=eventID, eventName=eventName)
 
@@ -220,15 +277,8 @@ class WorkerTimeline(Timeline):
     #Convenience method for getting an event that returns the resources from a Worker to the overall resources and can be reversed
     @staticmethod
     def getReturnResourcesFromWorkerEvent(workerTimeline, isResourceGold, amtToReturn, currentResources, simTime, eventName, eventID):
-        def eventFunc(currSimTime):
-            workerTimeline.returnResources(currentResources, amtToReturn, isResourceGold)
-        def reverseFunc(currSimTime):
-            #Add the resource back to the worker from our resource totals
-            workerTimeline.addResource(isResourceGold, amtToReturn)
-            if isResourceGold:
-                currentResources.deductGold(amtToReturn)
-            else:
-                currentResources.deductLumber(amtToReturn)
+        eventFunc = partial(_returnResourcesFromWorker, workerTimeline, isResourceGold, amtToReturn, currentResources)
+        reverseFunc = partial(_unreturnResourcesFromWorker, workerTimeline, isResourceGold, amtToReturn, currentResources)
         event = Event(eventFunction = eventFunc, reverseFunction = reverseFunc, eventTime=simTime, recurPeriodSimtime=0, 
                       eventID=eventID, eventName=eventName)
 
@@ -296,11 +346,8 @@ class WorkerTimeline(Timeline):
     #Convenience method for getting an event that changes a worker's task and can be reversed
     #If task is being changed to gold or lumber, need to pass in that resource source timeline as well
     def getChangeTaskEvent(self, newTask, simTime, eventName, eventID, resourceSourceTimeline = None):
-        originalTask = self.mCurrentTask
-        def eventFunc(currSimTime):
-            self.changeTask(simTime, newTask, resourceSourceTimeline)
-        def reverseFunc(currSimTime):
-            self.changeTask(simTime, originalTask, self.mCurrentResourceSourceTimeline)
+        eventFunc = partial(_changeWorkerTask, self, simTime, newTask, resourceSourceTimeline)
+        reverseFunc = partial(_revertWorkerTask, self, simTime, self.mCurrentTask)
         event = Event(eventFunction = eventFunc, reverseFunction = reverseFunc, eventTime=simTime, recurPeriodSimtime = 0, 
                       eventName = eventName, eventID = eventID)
         return event
@@ -0,0 +1,42 @@
+import bisect
+
+#Restricts which timelines and actions are serialized, so that only what the client is going to show gets encoded and sent
+#Anything left as None isn't filtered on
+class TimelineFilter:
+    #@param startTime, endTime - Only include actions that overlap the simtime window [startTime, endTime)
+    #@param timelineTypes - Only include timelines of these types
+    #@param timelineIDs - Only include timelines with these IDs
+    #@param activeOnly - Don't include inactive timelines
+    def __init__(self, startTime = None, endTime = None, timelineTypes = None, timelineIDs = None, activeOnly = False):
+        self.mStartTime = startTime
+        self.mEndTime = endTime
+        self.mTimelineTypes = set(timelineTypes) if timelineTypes != None else None
+        self.mTimelineIDs = set(timelineIDs) if timelineIDs != None else None
+        self.mActiveOnly = activeOnly
+
+    def includesTimeline(self, timeline):
+        if self.mTimelineTypes != None and timeline.getTimelineType() not in self.mTimelineTypes:
+            return False
+        if self.mTimelineIDs != None and timeline.getTimelineID() not in self.mTimelineIDs:
+            return False
+        return True
+
+    #Get the index range [first, last) of the actions that overlap the simtime window
+    #Actions must be in time-order and not overlapping, as they are on a Timeline, so this is a binary search
+    def getActionIndexRange(self, actions):
+        first = 0
+        last = len(actions)
+        if self.mEndTime != None:
+            last = bisect.bisect_left(actions, self.mEndTime, key = lambda action: action.mStartTime)
+        if self.mStartTime != None:
+            first = bisect.bisect_left(actions, self.mStartTime, 0, last, key = lambda action: action.mStartTime)
+            #Only the action right before the window can still be going on when the window starts
+            if first > 0 and self._endsAfter(actions[first - 1], self.mStartTime):
+                first -= 1
+        return first, last
+
+    def _endsAfter(self, action, simTime):
+        #Actions without a duration (like a worker moving to gold) last until the next action on the timeline
+        if action.mDuration == None:
+            return True
+        return action.getEndTime() > simTime
@@ -0,0 +1,94 @@
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.Action import Action
+
+import pickle
+
+#Compares variants of a build that are the same up to some action, and differ after it
+#The shared actions are only simulated once. Each variant is then simulated from a copy of that state, in worker processes if given an executor
+
+#Simulate actions on a build order, keeping the time and resources after each action at one of the summary action indexes
+#@param resourcesAtActions - List to add the summaries to
+#@return True if all the actions were simulated successfully, False otherwise
+def _simulateActions(buildOrder, actionDicts, summaryActionIndexes, resourcesAtActions):
+    for actionDict in actionDicts:
+        if not buildOrder.simulateAction(Action.getActionFromDict(actionDict)):
+            print("Failed to simulate action in action order list. Stopping")
+            return False
+
+        actionIndex = len(buildOrder.mOrderedActionList) - 1
+        if actionIndex in summaryActionIndexes:
+            resourcesAtActions.append({
+                'actionIndex' : actionIndex,
+                'simTime' : buildOrder.getCurrentSimTime(),
+                'resources' : buildOrder.getCurrentResources().getAsDictForSerialization()
+            })
+    return True
+
+#Simulate a variant's actions on a copy of the shared build order (which is changed), and get its results for serialization
+def _simulateVariant(buildOrder, prefixSucceeded, prefixResourcesAtActions, variantActionDicts, summaryActionIndexes):
+    resourcesAtActions = list(prefixResourcesAtActions)
+    #Simulating from scratch would stop at the failed action, so the variant isn't simulated either
+    succeeded = prefixSucceeded and _simulateActions(buildOrder, variantActionDicts, summaryActionIndexes, resourcesAtActions)
+    return {
+        'simulationSucceeded' : succeeded,
+        'endTime' : buildOrder.getEndTime(),
+        'resourcesAtActions' : resourcesAtActions,
+        'timelines' : buildOrder.getSimTimeAndTimelinesAsDictForSerialization()
+    }
+
+#Same as _simulateVariant, but for a pickled build order, so it can be sent to a worker process
+#The build order is only pickled once for all the variants, and unpickling it makes the copy
+def _simulatePickledVariant(pickledBuildOrder, prefixSucceeded, prefixResourcesAtActions, variantActionDicts, summaryActionIndexes):
+    return _simulateVariant(pickle.loads(pickledBuildOrder), prefixSucceeded, prefixResourcesAtActions, variantActionDicts, summaryActionIndexes)
+
+#Get how a variant's summary differs from the first variant's (variant minus first)
+#Only includes the summary action indexes that both variants reached
+def _getDiffFromFirstVariant(firstVariantResult, variantResult):
+    firstResourcesAtActions = {resourcesAtAction['actionIndex'] : resourcesAtAction for resourcesAtAction in firstVariantResult['resourcesAtActions']}
+    resourcesAtActionsDiff = []
+    for resourcesAtAction in variantResult['resourcesAtActions']:
+        firstResourcesAtAction = firstResourcesAtActions.get(resourcesAtAction['actionIndex'])
+        if firstResourcesAtAction == None:
+            continue
+        resourcesAtActionsDiff.append({
+            'actionIndex' : resourcesAtAction['actionIndex'],
+            'simTime' : resourcesAtAction['simTime'] - firstResourcesAtAction['simTime'],
+            'resources' : {resource : amount - firstResourcesAtAction['resources'][resource] for resource, amount in resourcesAtAction['resources'].items()}
+        })
+
+    return {
+        'endTime' : variantResult['endTime'] - firstVariantResult['endTime'],
+        'resourcesAtActions' : resourcesAtActionsDiff
+    }
+
+#Simulate each variant of a build, and get the results for serialization
+#@param race - Race of the build order
+#@param prefixActionDicts - The action dicts that all the variants share, in order
+#@param variantActionDictLists - For each variant, the action dicts that come after the shared ones
+#@param summaryActionIndexes - Indexes (in the whole build, including the shared actions) of the actions to summarize the time
+#and resources after, for comparing the variants
+#@param executor - If passed in, a concurrent.futures.Executor to simulate the variants in parallel. Must be a ProcessPoolExecutor
+#for the simulations to actually run in parallel, since they don't release the GIL
+#@return { "numSharedActions", "variants" : [{ "simulationSucceeded", "endTime", "resourcesAtActions", "timelines", "diffFromFirstVariant" }, ...] }
+def compareVariants(race, prefixActionDicts, variantActionDictLists, summaryActionIndexes = [], executor = None):
+    summaryActionIndexes = set(summaryActionIndexes)
+    buildOrder = BuildOrder(race)
+    prefixResourcesAtActions = []
+    prefixSucceeded = _simulateActions(buildOrder, prefixActionDicts, summaryActionIndexes, prefixResourcesAtActions)
+
+    if executor != None and len(variantActionDictLists) > 1:
+        pickledBuildOrder = pickle.dumps(buildOrder)
+        futures = [executor.submit(_simulatePickledVariant, pickledBuildOrder, prefixSucceeded, prefixResourcesAtActions, variantActionDicts, summaryActionIndexes)
+                   for variantActionDicts in variantActionDictLists]
+        variantResults = [future.result() for future in futures]
+    else:
+        variantResults = [_simulateVariant(buildOrder.deepCopy(), prefixSucceeded, prefixResourcesAtActions, variantActionDicts, summaryActionIndexes)
+                          for variantActionDicts in variantActionDictLists]
+
+    for variantResult in variantResults:
+        variantResult['diffFromFirstVariant'] = _getDiffFromFirstVariant(variantResults[0], variantResult)
+
+    return {
+        'numSharedActions' : len(prefixActionDicts),
+        'variants' : variantResults
+    }
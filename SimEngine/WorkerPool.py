@@ -0,0 +1,22 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+#Worker processes for simulating builds in parallel
+#Where it's supported (not on Windows), workers are forked from a server process that has only imported the engine, rather than from the
+#process that made the pool. So starting a worker doesn't have to import the engine again, and workers don't get a copy of everything else
+#the parent has loaded (like Flask and its threads in the REST service)
+
+#Modules the workers are forked with already imported. The batch simulator and the engine's own CLIs only need these
+ENGINE_PRELOAD_MODULES = ["SimEngine.BuildOrder", "SimEngine.SimulationEngine"]
+
+#Create a process pool for simulating builds
+#Worker functions have to be module-level. With the server, the module of the main script is imported in each worker (like on Windows), so it
+#has to be safe to import and shouldn't import much more than the engine
+#@param preloadModules - Modules to import in the server before any workers are forked. Only the first pool made in a process decides
+#them, since every pool in a process shares the same server
+def createProcessPoolExecutor(maxWorkers, preloadModules = ENGINE_PRELOAD_MODULES):
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers = maxWorkers)
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(preloadModules)
+    return ProcessPoolExecutor(max_workers = maxWorkers, mp_context = context)
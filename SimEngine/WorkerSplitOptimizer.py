@@ -0,0 +1,189 @@
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME, STARTING_GOLD, STARTING_LUMBER, TIMELINE_TYPE_GOLD_MINE
+from SimEngine.Worker import WorkerTask, isUnitWorker
+from SimEngine.Action import Action
+
+import time
+import numpy as np
+
+#Chooses whether each worker sent out to gather goes to gold or lumber, so that a build can afford everything as soon as possible
+#Every split is scored with a projection of the income curves, which is cheap enough to do for thousands of them at once
+#Only the best few are confirmed with a full simulation, since the projection assumes the workers move when they did in the original build
+
+#Enumerating every split is 2^n, so only this many workers can be chosen for at once
+MAX_ASSIGNABLE_MOVEMENTS = 16
+
+#Human and Orc workers have no gold cycle time of their own. A trip is 1 second in the mine plus the walk to the town hall and back
+#(see WorkerTimeline._getGoldMiningEventsOrcHu and GoldMineTimeline.mTimeToWalkToMine)
+ORC_HUMAN_GOLD_TRIP_SEC = 5
+ORC_HUMAN_GOLD_PER_TRIP = 10
+
+class WorkerSplitOptimizer:
+    #@param race - Race of the build order
+    #@param orderedActionList - The build's action dicts, in order. It must simulate successfully as it is
+    #@param numCandidatesToConfirm - Number of the best projected splits to confirm with a full simulation
+    def __init__(self, race, orderedActionList, numCandidatesToConfirm = 5):
+        self.mRace = race
+        self.mOrderedActionList = orderedActionList
+        self.mNumCandidatesToConfirm = numCandidatesToConfirm
+
+        #Per worker income rates and the max number of workers that can gather gold at once, in resources per simtime
+        buildOrder = BuildOrder(race)
+        workerTimeline = next(timeline for timeline in buildOrder.getInactiveTimelines() if isUnitWorker(timeline.getTimelineType()))
+        if workerTimeline.mGoldCycleTimeSec != None:
+            self.mGoldRate = workerTimeline.mGoldGainPerCycle / (workerTimeline.mGoldCycleTimeSec * SECONDS_TO_SIMTIME)
+        else:
+            self.mGoldRate = ORC_HUMAN_GOLD_PER_TRIP / (ORC_HUMAN_GOLD_TRIP_SEC * SECONDS_TO_SIMTIME)
+        #Workers without a lumber cycle time can't be simulated on lumber yet
+        self.mCanGatherLumber = workerTimeline.mLumberCycleTimeSec != None
+        self.mLumberRate = workerTimeline.mLumberGainPerCycle / (workerTimeline.mLumberCycleTimeSec * SECONDS_TO_SIMTIME) if self.mCanGatherLumber else 0
+        self.mMaxGoldWorkers = buildOrder._findMatchingTimeline(TIMELINE_TYPE_GOLD_MINE).mMaxWorkersInMine
+
+        #Total resources the build needs beyond what it starts with
+        self.mGoldNeeded = sum(actionDict.get('goldCost') or 0 for actionDict in orderedActionList) - STARTING_GOLD
+        self.mLumberNeeded = sum(actionDict.get('lumberCost') or 0 for actionDict in orderedActionList) - STARTING_LUMBER
+
+        self.mNumSchedulesScored = 0
+        self.mScoringSec = 0
+
+    #Get the indexes of the worker movements whose task can be chosen: workers being sent to gold or lumber from anything else
+    #Workers moving from one resource to the other are left as they are
+    def getAssignableMovementIndexes(self):
+        if not self.mCanGatherLumber:
+            return []
+        indexes = []
+        for i, actionDict in enumerate(self.mOrderedActionList):
+            if actionDict['actionType'] != 'WorkerMovementAction':
+                continue
+            if actionDict['desiredWorkerTask'] in [WorkerTask.GOLD.name, WorkerTask.LUMBER.name] and \
+               actionDict['currentWorkerTask'] not in [WorkerTask.GOLD.name, WorkerTask.LUMBER.name]:
+                indexes.append(i)
+        return indexes
+
+    #Get every split, as an array with a row for each split and a column for each assignable movement. 1 is gold, 0 is lumber
+    def enumerateSchedules(self, numAssignableMovements):
+        if numAssignableMovements > MAX_ASSIGNABLE_MOVEMENTS:
+            raise ValueError("Can only choose the split for up to " + str(MAX_ASSIGNABLE_MOVEMENTS) + " workers, but the build has " + str(numAssignableMovements))
+        #Row i is the binary digits of i
+        return (np.arange(2 ** numAssignableMovements)[:, None] >> np.arange(numAssignableMovements)[None, :]) & 1
+
+    #Get the simtime the worker movements in the simulated build order arrive at their resource, and the change they make to
+    #the number of gold and lumber workers, for the ones that aren't assignable
+    def _getMovementTimes(self, buildOrder, assignableIndexes):
+        arrivalTimes = []
+        fixedChanges = []
+        for i, action in enumerate(buildOrder.mOrderedActionList):
+            if action.__class__.__name__ != 'WorkerMovementAction':
+                continue
+            arrivalTime = action.mStartTime + (action.mTravelTime or 0)
+            if i in assignableIndexes:
+                arrivalTimes.append(arrivalTime)
+                continue
+            goldChange = (action.mDesiredWorkerTask == WorkerTask.GOLD) - (action.mCurrentWorkerTask == WorkerTask.GOLD)
+            lumberChange = (action.mDesiredWorkerTask == WorkerTask.LUMBER) - (action.mCurrentWorkerTask == WorkerTask.LUMBER)
+            fixedChanges.append( (arrivalTime, goldChange, lumberChange) )
+        return arrivalTimes, fixedChanges
+
+    #Project when each split has gathered enough to afford the whole build, all at once
+    #Worker counts only change when a worker arrives, so income is a constant rate between those times, and the time the total
+    #crosses what's needed can be solved for in each of those segments directly
+    #@param schedules - Array from enumerateSchedules
+    #@param arrivalTimes - Arrival simtime for each assignable movement
+    #@param fixedChanges - List of (simtime, gold worker change, lumber worker change) for the movements that aren't assignable
+    #@return Array of the projected simtime for each split (inf if it never gets there, or puts too many workers in the mine)
+    def scoreSchedules(self, schedules, arrivalTimes, fixedChanges):
+        startTime = time.perf_counter()
+        segmentStarts = np.array(sorted(set([0] + list(arrivalTimes) + [changeTime for changeTime, goldChange, lumberChange in fixedChanges])), dtype = float)
+
+        #Whether each worker has arrived by the start of each segment
+        arrived = (np.array(arrivalTimes, dtype = float)[:, None] <= segmentStarts[None, :]).astype(float)
+        numArrived = arrived.sum(axis = 0)
+        fixedGoldWorkers = np.zeros(len(segmentStarts))
+        fixedLumberWorkers = np.zeros(len(segmentStarts))
+        for changeTime, goldChange, lumberChange in fixedChanges:
+            fixedGoldWorkers += goldChange * (changeTime <= segmentStarts)
+            fixedLumberWorkers += lumberChange * (changeTime <= segmentStarts)
+
+        goldWorkers = schedules @ arrived + fixedGoldWorkers
+        lumberWorkers = numArrived - schedules @ arrived + fixedLumberWorkers
+        goldRates = np.minimum(goldWorkers, self.mMaxGoldWorkers) * self.mGoldRate
+        lumberRates = lumberWorkers * self.mLumberRate
+
+        goldTimes = self._getTimesToReach(segmentStarts, goldRates, self.mGoldNeeded)
+        lumberTimes = self._getTimesToReach(segmentStarts, lumberRates, self.mLumberNeeded)
+        scores = np.maximum(goldTimes, lumberTimes)
+        #Night Elf and Undead workers can't go in a full mine at all
+        if self.mRace == Race.NIGHT_ELF or self.mRace == Race.UNDEAD:
+            scores[(goldWorkers > self.mMaxGoldWorkers).any(axis = 1)] = np.inf
+
+        self.mNumSchedulesScored += len(schedules)
+        self.mScoringSec += time.perf_counter() - startTime
+        return scores
+
+    #Get the simtime a resource total reaches the amount needed, for each row of rates
+    #@param segmentStarts - Start simtime of each segment. The last one goes on forever
+    #@param rates - Array with a row for each split, of the income rate during each segment
+    @staticmethod
+    def _getTimesToReach(segmentStarts, rates, amountNeeded):
+        if amountNeeded <= 0:
+            return np.zeros(len(rates))
+        segmentLengths = np.append(np.diff(segmentStarts), np.inf)
+        #0 * inf is nan, for no income in the last segment
+        with np.errstate(invalid = 'ignore'):
+            gatheredInSegment = np.nan_to_num(rates * segmentLengths, nan = 0, posinf = np.inf)
+        gatheredBySegmentEnd = np.cumsum(gatheredInSegment, axis = 1)
+        gatheredBySegmentStart = np.concatenate([np.zeros((len(rates), 1)), gatheredBySegmentEnd[:, :-1]], axis = 1)
+        #Only the first segment that ends with enough gathered has the crossing in it
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            crossingTimes = segmentStarts + (amountNeeded - gatheredBySegmentStart) / rates
+        crossingTimes = np.where((gatheredBySegmentEnd >= amountNeeded) & (gatheredBySegmentStart < amountNeeded) & (rates > 0), crossingTimes, np.inf)
+        return crossingTimes.min(axis = 1)
+
+    #Get the build's action dicts with a split applied
+    def applySchedule(self, schedule, assignableIndexes):
+        orderedActionList = list(self.mOrderedActionList)
+        for isGold, actionIndex in zip(schedule, assignableIndexes):
+            orderedActionList[actionIndex] = dict(orderedActionList[actionIndex], desiredWorkerTask = WorkerTask.GOLD.name if isGold else WorkerTask.LUMBER.name)
+        return orderedActionList
+
+    #Score every split, and confirm the best few with a full simulation
+    #@return { "orderedActionList" : <the build with the best confirmed split>, "endTime", "numSchedulesScored", "scoringSec",
+    #"confirmedSchedules" : [{ "schedule" : [<"GOLD" or "LUMBER" for each assignable movement>], "projectedTime", "endTime", "simulationSucceeded" }, ...] }
+    #Will raise a ValueError if the build doesn't simulate as it is, or has too many assignable movements
+    def optimize(self):
+        buildOrder = BuildOrder(self.mRace)
+        if not buildOrder.simulateOrderedActionList([Action.getActionFromDict(actionDict) for actionDict in self.mOrderedActionList]):
+            raise ValueError("The build must simulate successfully before its worker split can be optimized")
+
+        assignableIndexes = self.getAssignableMovementIndexes()
+        schedules = self.enumerateSchedules(len(assignableIndexes))
+        arrivalTimes, fixedChanges = self._getMovementTimes(buildOrder, assignableIndexes)
+        scores = self.scoreSchedules(schedules, arrivalTimes, fixedChanges)
+
+        confirmedSchedules = []
+        bestOrderedActionList = None
+        bestEndTime = None
+        for scheduleIndex in np.argsort(scores, kind = 'stable')[:self.mNumCandidatesToConfirm]:
+            if not np.isfinite(scores[scheduleIndex]):
+                break
+            orderedActionList = self.applySchedule(schedules[scheduleIndex], assignableIndexes)
+            confirmBuildOrder = BuildOrder(self.mRace)
+            succeeded = confirmBuildOrder.simulateOrderedActionList([Action.getActionFromDict(actionDict) for actionDict in orderedActionList])
+            endTime = confirmBuildOrder.getEndTime()
+            confirmedSchedules.append({
+                'schedule' : [WorkerTask.GOLD.name if isGold else WorkerTask.LUMBER.name for isGold in schedules[scheduleIndex]],
+                'projectedTime' : float(scores[scheduleIndex]),
+                'endTime' : endTime,
+                'simulationSucceeded' : succeeded
+            })
+            if succeeded and (bestEndTime == None or endTime < bestEndTime):
+                bestOrderedActionList = orderedActionList
+                bestEndTime = endTime
+
+        return {
+            'orderedActionList' : bestOrderedActionList,
+            'endTime' : bestEndTime,
+            'numSchedulesScored' : self.mNumSchedulesScored,
+            'scoringSec' : self.mScoringSec,
+            'confirmedSchedules' : confirmedSchedules
+        }
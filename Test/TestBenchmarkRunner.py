@@ -0,0 +1,37 @@
+import unittest
+
+from bench.BenchmarkRunner import runWorkload, findRegressions
+from bench.Workloads import getWorkload, WORKLOADS
+
+class TestBenchmarkRunner(unittest.TestCase):
+    def testRunWorkload(self):
+        results = runWorkload(getWorkload("hunt_build"), numRepeats = 1)
+        self.assertGreater(results['wallTimeSec'], 0)
+        self.assertLessEqual(results['wallTimeSecMin'], results['wallTimeSec'])
+        self.assertGreater(results['peakMemoryBytes'], 0)
+        #The simulation is deterministic, so the same events are executed every time
+        self.assertEqual(results['eventsExecuted'], getWorkload("hunt_build").run())
+
+    def testWorkloadsRun(self):
+        for workload in WORKLOADS:
+            eventsExecuted = workload.run()
+            if not workload.mName.startswith(("rest_", "startup_")):
+                self.assertGreater(eventsExecuted, 0, workload.mName)
+
+    def testFindRegressions(self):
+        baseline = { 'hunt_build' : { 'wallTimeSec' : 1.0, 'eventsExecuted' : 100, 'peakMemoryBytes' : 1000 },
+                     'rest_timelines' : { 'wallTimeSec' : 1.0, 'eventsExecuted' : None, 'peakMemoryBytes' : 1000 } }
+        current = { 'hunt_build' : { 'wallTimeSec' : 1.2, 'eventsExecuted' : 150, 'peakMemoryBytes' : 500 },
+                    'rest_timelines' : { 'wallTimeSec' : 2.0, 'eventsExecuted' : None, 'peakMemoryBytes' : 1000 },
+                    'new_workload' : { 'wallTimeSec' : 5.0, 'eventsExecuted' : 1, 'peakMemoryBytes' : 1 } }
+
+        regressions = findRegressions(baseline, current, threshold = 0.25)
+        self.assertEqual([(regression['workload'], regression['metric']) for regression in regressions],
+                         [('hunt_build', 'eventsExecuted'), ('rest_timelines', 'wallTimeSec')])
+        self.assertAlmostEqual(regressions[0]['change'], 0.5)
+
+        self.assertEqual(len(findRegressions(baseline, current, threshold = 0.1)), 3)
+        self.assertEqual(findRegressions(baseline, baseline), [])
+
+if __name__ == '__main__':
+    unittest.main()
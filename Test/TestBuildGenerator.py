@@ -0,0 +1,71 @@
+import unittest
+
+import io
+import json
+import jsonschema
+import contextlib
+import referencing
+
+from bench.BuildGenerator import generateBuildOrder, generateTeamBuildOrders, RACE_BUILD_SPECS
+from bench.RESTLoadTester import getRequestBodies, getTestClientSender, runLoadTest
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
+
+class TestBuildGenerator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open('SimEngine/Schema/OrderedActionListSchema.json', 'r') as file:
+            actionListJsonSchema = json.load(file)
+
+        with open('SimEngine/Schema/ActionObjectSchema.json', 'r') as file:
+            actionObjSchema = referencing.Resource.from_contents(json.load(file))
+
+        registry = referencing.Registry().with_resources([("urn:ActionObject", actionObjSchema)])
+        cls.actionListValidator = jsonschema.Draft7Validator(actionListJsonSchema, registry = registry)
+
+    def testSameSeedSameBuild(self):
+        self.assertEqual(generateBuildOrder(Race.NIGHT_ELF, 3), generateBuildOrder(Race.NIGHT_ELF, 3))
+        self.assertNotEqual(generateBuildOrder(Race.NIGHT_ELF, 3), generateBuildOrder(Race.NIGHT_ELF, 4))
+
+    def testBuildsFollowSchema(self):
+        buildOrderDicts = generateTeamBuildOrders(list(RACE_BUILD_SPECS.keys()), 0, numActions = 100)
+        self.actionListValidator.validate(buildOrderDicts)
+        #Should still be valid once it's been through JSON
+        self.actionListValidator.validate(json.loads(json.dumps(buildOrderDicts)))
+
+    #Undead can't be simulated yet, since the engine doesn't give them starting units
+    def testBuildsSimulate(self):
+        for race in [Race.NIGHT_ELF, Race.ORC, Race.HUMAN]:
+            buildOrderDict = generateBuildOrder(race, 1, numActions = 60, numWorkers = 15, numProductionBuildings = 2)
+            with contextlib.redirect_stdout(io.StringIO()):
+                buildOrder = BuildOrder.simulateBuildOrderFromDict(buildOrderDict)
+            self.assertEqual(len(buildOrder.mOrderedActionList), 60, race.name)
+
+    def testSizeKnobs(self):
+        buildOrderDict = generateBuildOrder(Race.NIGHT_ELF, 0, numActions = 150, numWorkers = 25, numProductionBuildings = 3)
+        actionDicts = buildOrderDict['orderedActionList']
+        self.assertEqual(len(actionDicts), 150)
+        self.assertEqual([actionDict['actionID'] for actionDict in actionDicts], list(range(150)))
+        self.assertEqual(sum(1 for actionDict in actionDicts if actionDict['actionType'] == 'BuildUnitAction' and actionDict['name'] == "Wisp"), 20)
+        self.assertEqual(sum(1 for actionDict in actionDicts if actionDict['actionType'] == 'BuildStructureAction' and actionDict['name'] == "Ancient of War"), 3)
+
+    def testDurationKnob(self):
+        buildOrderDict = generateBuildOrder(Race.NIGHT_ELF, 0, numActions = 40, durationSec = 1200)
+        self.assertGreater(len(buildOrderDict['orderedActionList']), 40)
+        with contextlib.redirect_stdout(io.StringIO()):
+            buildOrder = BuildOrder.simulateBuildOrderFromDict(buildOrderDict)
+        self.assertEqual(len(buildOrder.mOrderedActionList), len(buildOrderDict['orderedActionList']))
+        #The duration is only estimated from the gold spent, so just check it's in the right area
+        self.assertGreater(buildOrder.getEndTime(), 1200 * SECONDS_TO_SIMTIME * 0.75)
+        self.assertLess(buildOrder.getEndTime(), 1200 * SECONDS_TO_SIMTIME * 1.25)
+
+    def testRESTLoadTest(self):
+        requestBodies = getRequestBodies([Race.NIGHT_ELF, Race.HUMAN], 0, 2, numActions = 30, numWorkers = 10, numProductionBuildings = 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = runLoadTest(getTestClientSender(), requestBodies, numRequests = 4, numThreads = 2)
+        self.assertEqual(results['numRequests'], 4)
+        self.assertEqual(results['numFailed'], 0)
+        self.assertLessEqual(results['latencyMs']['50'], results['latencyMs']['max'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,16 @@
 import unittest
+import json
+import pickle
 
-from copy import copy
+from copy import copy, deepcopy
 
-from SimEngine.BuildOrder import BuildOrder
+from SimEngine.BuildOrder import BuildOrder, MapStartingPosition, getStartingTimelineTemplates
 from SimEngine.ResourceBank import ResourceBank
 from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
 from SimEngine.Worker import Worker, WorkerTask
 from SimEngine.Trigger import Trigger, TriggerType
 from SimEngine.Timeline import Timeline 
-from SimEngine.Action import BuildUnitAction, BuildStructureAction, WorkerMovementAction, ShopAction
+from SimEngine.Action import BuildUnitAction, BuildStructureAction, WorkerMovementAction, ShopAction, Action
 from Test.UniqueIDHandler import UniqueIDHandler
 
 class TestBuildOrder(unittest.TestCase):
@@ -337,6 +339,75 @@ class TestBuildOrder(unittest.TestCase):
         self.assertEqual(False, buildOrder.simulateAction(BuildStructureAction(int(8 * SECONDS_TO_SIMTIME), Trigger(TriggerType.PERCENT_OF_ONGOING_ACTION, -100, actionIDWispBuild), WorkerTask.IDLE, "Altar of Elders", 
                                               180, 50, 0, 60 * SECONDS_TO_SIMTIME, Worker.Wisp.name, actionIDAltarBuild, False)))
 
-
-
-
+    #Build orders start from clones of shared templates, which simulating a build order shouldn't change
+    def testStartingTimelineTemplates(self):
+        templates = getStartingTimelineTemplates(Race.NIGHT_ELF, BuildOrder(Race.NIGHT_ELF).mMapStartingPosition)
+        templateStates = [dict(template.__dict__) for template in templates]
+
+        buildOrder = BuildOrder.simulateBuildOrderFromDict(self._getHuntBuildOrderDict())
+        otherBuildOrder = BuildOrder(Race.NIGHT_ELF)
+        self.assertEqual([dict(template.__dict__) for template in templates], templateStates)
+        self.assertEqual([timeline.getTimelineID() for timeline in otherBuildOrder.mInactiveTimelines], list(range(len(templates))))
+        self.assertEqual([timeline.getTimelineType() for timeline in otherBuildOrder.mInactiveTimelines],
+                         ["Gold Mine", "Copse of Trees", "Tavern", "Goblin Merchant"] + [Worker.Wisp.name] * 5 + ["Tree of Life"])
+        self.assertEqual(otherBuildOrder.getNextTimelineID(), len(templates))
+        for timeline in otherBuildOrder.mInactiveTimelines:
+            self.assertEqual(timeline.getNumActions(), 0)
+            self.assertIs(timeline.mEventHandler, otherBuildOrder.mEventHandler)
+        self.assertIs(otherBuildOrder.mInactiveTimelines[0].mCurrentResources, otherBuildOrder.getCurrentResources())
+        self.assertGreater(len(buildOrder.getEventHandler().mEventsExecutedInOrder), 0)
+
+        #Templates depend on the map's time to walk to the mine
+        farMineTemplates = getStartingTimelineTemplates(Race.ORC, MapStartingPosition("Far Mine", 15, 5, timeToWalkToMineSec = 4))
+        self.assertIsNot(farMineTemplates, getStartingTimelineTemplates(Race.ORC, MapStartingPosition("Near Mine", 15, 5, timeToWalkToMineSec = 2)))
+        self.assertIs(farMineTemplates, getStartingTimelineTemplates(Race.ORC, MapStartingPosition("Other Far Mine", 20, 6, timeToWalkToMineSec = 4)))
+        self.assertEqual(BuildOrder(Race.ORC, MapStartingPosition("Far Mine", 15, 5, timeToWalkToMineSec = 4)).mInactiveTimelines[0].mTimeToWalkToMine,
+                         4 * SECONDS_TO_SIMTIME)
+
+    #A copy should carry on exactly as the build order it was copied from would have, without changing that build order
+    def testDeepCopy(self):
+        buildOrderDict = self._getHuntBuildOrderDict()
+        getActions = lambda: [Action.getActionFromDict(actionDict) for actionDict in buildOrderDict['orderedActionList']]
+        numActions = len(buildOrderDict['orderedActionList'])
+
+        fullBuildOrder = BuildOrder(Race[buildOrderDict['race']])
+        fullBuildOrder.simulateOrderedActionList(getActions())
+
+        buildOrder = BuildOrder(Race[buildOrderDict['race']])
+        buildOrder.simulateOrderedActionList(getActions()[:numActions // 2])
+        prefixTimelines = buildOrder.getSimTimeAndTimelinesAsDictForSerialization()
+
+        copiedBuildOrder = buildOrder.deepCopy()
+        self.assertTrue(copiedBuildOrder.simulateOrderedActionList(getActions()[numActions // 2:]))
+        self.assertEqual(copiedBuildOrder.getSimTimeAndTimelinesAsDictForSerialization(), fullBuildOrder.getSimTimeAndTimelinesAsDictForSerialization())
+        self.assertEqual(buildOrder.getSimTimeAndTimelinesAsDictForSerialization(), prefixTimelines)
+
+    #Long simulations have long chains of recurring events, which shouldn't make copying or pickling go past the recursion limit
+    def testCopyAndPickleLongSimulation(self):
+        buildOrder = BuildOrder.simulateBuildOrderFromDict(self._getHuntBuildOrderDict())
+        buildOrder.simulate(60 * 60 * SECONDS_TO_SIMTIME)
+
+        copiedBuildOrders = [buildOrder.deepCopy(), deepcopy(buildOrder), pickle.loads(pickle.dumps(buildOrder))]
+        for copiedBuildOrder in copiedBuildOrders:
+            self.assertEqual(copiedBuildOrder.getEventHandler().getNumberOfEvents(), buildOrder.getEventHandler().getNumberOfEvents())
+            copiedBuildOrder.simulate(70 * 60 * SECONDS_TO_SIMTIME)
+        buildOrder.simulate(70 * 60 * SECONDS_TO_SIMTIME)
+        for copiedBuildOrder in copiedBuildOrders:
+            self.assertEqual(copiedBuildOrder.getCurrentResources().getAsDictForSerialization(), buildOrder.getCurrentResources().getAsDictForSerialization())
+
+    #An event pickled on its own should keep the links in its chain of recurring events
+    def testPickleRecurringEvent(self):
+        buildOrder = BuildOrder.simulateBuildOrderFromDict(self._getHuntBuildOrderDict())
+        buildOrder.simulate(60 * 60 * SECONDS_TO_SIMTIME)
+        eventsAndGroups = [eventAndGroup for eventsForTime in buildOrder.getEventHandler().mEvents.values() for eventAndGroup in eventsForTime]
+        event = next(event for event, eventGroup in eventsAndGroups if event.mPrevRecurredEvent != None and event.mNextRecurredEvent != None)
+
+        unpickledEvent = pickle.loads(pickle.dumps(event))
+        self.assertIs(unpickledEvent.mPrevRecurredEvent.mNextRecurredEvent, unpickledEvent)
+        self.assertIs(unpickledEvent.mNextRecurredEvent.mPrevRecurredEvent, unpickledEvent)
+        self.assertEqual(unpickledEvent.getMostRecentRecurrence().getEventID(), event.getMostRecentRecurrence().getEventID())
+        self.assertEqual(unpickledEvent.mPrevRecurredEvent.getEventID(), event.mPrevRecurredEvent.getEventID())
+
+    def _getHuntBuildOrderDict(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            return json.loads(file.read())[0]
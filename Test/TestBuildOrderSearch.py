@@ -0,0 +1,65 @@
+import unittest
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from SimEngine.BuildOrderSearch import BuildOrderSearch, BuildOrderGoal, _getEndTimesByName
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationConstants import Race
+
+class TestBuildOrderSearch(unittest.TestCase):
+    def setUp(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionDicts = json.loads(file.read())[0]['orderedActionList']
+        #The opening worker movements
+        self.startingActionDicts = actionDicts[:4]
+        wispDict = actionDicts[4]
+        altarDict = actionDicts[5]
+        moonWellDict = dict(actionDicts[6], trigger = { 'triggerType' : 'ASAP' }, currentWorkerTask = 'IDLE')
+        self.actionPool = [{ 'action' : moonWellDict }, { 'action' : wispDict, 'count' : 2 }, { 'action' : altarDict }]
+        self.goal = BuildOrderGoal({ 'Altar of Elders' : 1, 'Moon Well' : 1 })
+
+    def _simulate(self, orderedActionList):
+        return BuildOrder.simulateBuildOrderFromDict({ 'race' : Race.NIGHT_ELF.name, 'orderedActionList' : orderedActionList })
+
+    #The best build order found should actually finish the goal when it says, and be no worse than adding the pool in order
+    def _checkSearch(self, executor):
+        result = BuildOrderSearch(Race.NIGHT_ELF, self.startingActionDicts, self.actionPool, self.goal, beamWidth = 4, executor = executor).search()
+        self.assertNotEqual(result['orderedActionList'], None)
+        self.assertEqual(self.goal.getCompletionTime(_getEndTimesByName(self._simulate(result['orderedActionList']))), result['completionTime'])
+
+        poolInOrder = [poolEntry['action'] for poolEntry in self.actionPool for i in range(poolEntry.get('count', 1))]
+        self.assertLessEqual(result['completionTime'], self.goal.getCompletionTime(_getEndTimesByName(self._simulate(self.startingActionDicts + poolInOrder))))
+
+        self.assertGreater(result['numEvaluations'], 0)
+        self.assertGreater(result['evaluationsPerSecond'], 0)
+        return result
+
+    def testSearch(self):
+        self._checkSearch(None)
+
+    def testSearchInWorkerProcesses(self):
+        with ProcessPoolExecutor(max_workers = 2) as executor:
+            self.assertEqual(self._checkSearch(executor)['orderedActionList'], self._checkSearch(None)['orderedActionList'])
+
+    #Trigger alternatives are tried for the actions that have them
+    def testSearchTriesTriggers(self):
+        numEvaluations = self._checkSearch(None)['numEvaluations']
+        self.actionPool[2]['triggers'] = [self.actionPool[2]['action']['trigger'], { 'triggerType' : 'GOLD_AMOUNT', 'value' : 400 }]
+        result = self._checkSearch(None)
+        self.assertGreater(result['numEvaluations'], numEvaluations)
+        altarDicts = [actionDict for actionDict in result['orderedActionList'] if actionDict.get('name') == 'Altar of Elders']
+        self.assertIn(altarDicts[0]['trigger'], self.actionPool[2]['triggers'])
+
+    #Nothing is found if the goal can't be finished by the deadline
+    def testSearchWithImpossibleDeadline(self):
+        self.goal.mDeadlineSimTime = 100
+        result = BuildOrderSearch(Race.NIGHT_ELF, self.startingActionDicts, self.actionPool, self.goal).search()
+        self.assertEqual(result['orderedActionList'], None)
+        self.assertGreater(result['numPruned'], 0)
+
+    def testGoalLowerBound(self):
+        endTimesByName = { 'Altar of Elders' : [700] }
+        self.assertEqual(self.goal.getCompletionTime(endTimesByName), None)
+        self.assertEqual(self.goal.getCompletionTimeLowerBound(endTimesByName, 300, { 'Moon Well' : 520 }), 820)
+        endTimesByName['Moon Well'] = [600, 900]
+        self.assertEqual(self.goal.getCompletionTime(endTimesByName), 700)
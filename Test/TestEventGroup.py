@@ -1,5 +1,7 @@
 import unittest
 
+from copy import deepcopy
+
 from SimEngine.EventHandler import EventHandler
 from SimEngine.Event import Event
 from SimEngine.EventGroup import EventGroup
@@ -375,4 +377,31 @@ class TestEventGroup(unittest.TestCase):
         eventHandler.executeEvents(35)
         self.assertEqual(self.testInt, 5)
         eventHandler.executeEvents(40)
-        self.assertEqual(self.testInt, 6)
\ No newline at end of file
+        self.assertEqual(self.testInt, 6)
+
+    #Copying an event group on its own should keep the links in its chain of recurring event groups, and in its events' chains
+    def testCopyRecurredEventGroup(self):
+        eventHandler = EventHandler()
+
+        event1 = Event(eventFunction = lambda currSimTime: None, reverseFunction = None, eventTime = 10, recurPeriodSimtime = 0, eventID = eventHandler.getNewEventID())
+        event2 = Event(eventFunction = lambda currSimTime: None, reverseFunction = None, eventTime = 15, recurPeriodSimtime = 0, eventID = eventHandler.getNewEventID())
+        eventGroup = EventGroup( orderedEventList = [ event1, event2 ], recurrenceGapSimTime = 10)
+        eventHandler.registerEvent(event=event1, eventGroup=eventGroup)
+        eventHandler.registerEvent(event=event2, eventGroup=eventGroup)
+        #Recurs at 10 and 15, then 25 and 30, then 40 and 45
+        eventHandler.executeEventsInRange(0, 30)
+
+        recurredEventGroup = eventGroup.mNextRecurredEventGroup
+        copiedEventGroup = deepcopy(recurredEventGroup)
+        self.assertIsNot(copiedEventGroup, recurredEventGroup)
+        self.assertIs(copiedEventGroup.mPrevRecurredEventGroup.mNextRecurredEventGroup, copiedEventGroup)
+        self.assertIs(copiedEventGroup.mNextRecurredEventGroup.mPrevRecurredEventGroup, copiedEventGroup)
+        self.assertEqual(copiedEventGroup.mNextRecurredEventGroup.mOrderedEventList[0].getEventTime(), 40)
+        copiedEvent = copiedEventGroup.mOrderedEventList[0]
+        self.assertIs(copiedEvent.mPrevRecurredEvent, copiedEventGroup.mPrevRecurredEventGroup.mOrderedEventList[0])
+        self.assertIs(copiedEvent.mNextRecurredEvent, copiedEventGroup.mNextRecurredEventGroup.mOrderedEventList[0])
+
+        #Reversing the recurrence unlinks the groups
+        eventHandler.reverseEvents(30)
+        self.assertEqual(recurredEventGroup.mNextRecurredEventGroup, None)
+        self.assertEqual(len(recurredEventGroup.mRecurrenceLinks), 2)
\ No newline at end of file
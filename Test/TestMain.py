@@ -0,0 +1,105 @@
+import unittest
+import io
+import os
+import json
+import tempfile
+import contextlib
+
+from main import iterBuilds, runBatch
+from SimEngine.SimulationEngine import SimulationEngine
+from SimEngine.ResultCache import ResultCache
+
+HUNT_BUILD_FILE = 'Test/TestInput/HuntBuildSimulationInput.json'
+
+#Run the batch simulator and get what it wrote to stdout
+def _runBatchToStdout(*args, **kwargs):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+        numBuilds, numErrors = runBatch(*args, **kwargs)
+    return numBuilds, numErrors, stdout.getvalue()
+
+class TestMain(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(HUNT_BUILD_FILE, 'r') as file:
+            cls.huntBuildOrdersList = json.loads(file.read())
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+
+    def _writeFile(self, fileName, content):
+        filePath = os.path.join(self.tempDir.name, fileName)
+        with open(filePath, 'w') as file:
+            file.write(content)
+        return filePath
+
+    def testIterBuilds(self):
+        self._writeFile("solo.json", json.dumps(self.huntBuildOrdersList[0]))
+        self._writeFile("stream.jsonl", json.dumps(self.huntBuildOrdersList) + "\n\n" + json.dumps(self.huntBuildOrdersList * 2) + "\n")
+        self._writeFile("notes.txt", "Not a build")
+
+        builds = list(iterBuilds([HUNT_BUILD_FILE, self.tempDir.name]))
+        self.assertEqual([name for name, teamBuildOrdersList in builds], ["HuntBuildSimulationInput", "solo", "stream:1", "stream:3"])
+        self.assertEqual([len(teamBuildOrdersList) for name, teamBuildOrdersList in builds], [1, 1, 1, 2])
+        self.assertEqual(builds[1][1], self.huntBuildOrdersList)
+
+    def testSummary(self):
+        invalidFile = self._writeFile("invalid.json", json.dumps([{ 'race' : "NIGHT_ELF", 'orderedActionList' : [{ 'actionType' : "BuildUnitAction" }] }]))
+        numBuilds, numErrors, stdout = _runBatchToStdout([HUNT_BUILD_FILE, invalidFile], untilSec = 300)
+        self.assertEqual((numBuilds, numErrors), (2, 1))
+
+        lines = stdout.splitlines()
+        self.assertEqual(len(lines), 1)
+        summary = json.loads(lines[0])
+        self.assertEqual(summary['name'], "HuntBuildSimulationInput")
+        buildOrderSummary = summary['buildOrders'][0]
+        self.assertEqual(buildOrderSummary['numActions'], len(self.huntBuildOrdersList[0]['orderedActionList']))
+        self.assertTrue(buildOrderSummary['simulationSucceeded'])
+        self.assertEqual(buildOrderSummary['currentSimTime'], 3000)
+        self.assertLess(buildOrderSummary['endTime'], 3000)
+
+    #Timelines should be the same as the REST API's, and in the same order as the inputs when simulated in worker processes
+    def testTimelines(self):
+        simEngine = SimulationEngine()
+        simEngine.loadStateFromActionLists(self.huntBuildOrdersList)
+        expectedTimelines = json.loads(simEngine.getJSONStateAsTimelines(pretty = False))
+
+        jsonlFile = self._writeFile("builds.jsonl", "\n".join(json.dumps(self.huntBuildOrdersList) for i in range(5)))
+        numBuilds, numErrors, stdout = _runBatchToStdout([jsonlFile], jobs = 2, outputFormat = "timelines")
+        self.assertEqual((numBuilds, numErrors), (5, 0))
+        lines = [json.loads(line) for line in stdout.splitlines()]
+        self.assertEqual([line['name'] for line in lines], ["builds:" + str(i) for i in range(1, 6)])
+        for line in lines:
+            self.assertEqual(line['timelines'], expectedTimelines)
+
+        outputDir = os.path.join(self.tempDir.name, "Timelines")
+        runBatch([HUNT_BUILD_FILE], outputFormat = "timelines", compact = True, outputDir = outputDir)
+        with open(os.path.join(outputDir, "HuntBuildSimulationInput.timelines.json"), 'r') as file:
+            timelinesJSON = file.read()
+        self.assertNotIn("\n", timelinesJSON)
+        self.assertEqual(json.loads(timelinesJSON), expectedTimelines)
+
+    #Timelines from the result cache should be the same as simulated ones, and builds simulated further are their own entries
+    def testTimelinesWithResultCache(self):
+        resultCacheFile = os.path.join(self.tempDir.name, "ResultCache.db")
+        jsonlFile = self._writeFile("builds.jsonl", "\n".join(json.dumps(self.huntBuildOrdersList) for i in range(3)))
+        expectedOutputs = [_runBatchToStdout([jsonlFile], outputFormat = "timelines", untilSec = untilSec)[2] for untilSec in [None, 400]]
+
+        for i in range(2):
+            for expectedOutput, untilSec in zip(expectedOutputs, [None, 400]):
+                numBuilds, numErrors, stdout = _runBatchToStdout([jsonlFile], jobs = 2, outputFormat = "timelines", untilSec = untilSec, resultCacheFile = resultCacheFile)
+                self.assertEqual((numBuilds, numErrors), (3, 0))
+                self.assertEqual(stdout, expectedOutput)
+        self.assertEqual(ResultCache(resultCacheFile).getNumEntries(), 2)
+
+        #Pretty timeline files are re-encoded from the compact ones in the cache
+        outputDir = os.path.join(self.tempDir.name, "Timelines")
+        runBatch([HUNT_BUILD_FILE], outputFormat = "timelines", outputDir = outputDir, resultCacheFile = resultCacheFile)
+        with open(os.path.join(outputDir, "HuntBuildSimulationInput.timelines.json"), 'r') as file:
+            timelinesJSON = file.read()
+        with open('Test/TestInput/HuntBuildSimulationOutputTruth.json', 'r') as file:
+            self.assertEqual(timelinesJSON, file.read())
+
+if __name__ == '__main__':
+    unittest.main()
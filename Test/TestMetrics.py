@@ -0,0 +1,109 @@
+import unittest
+import os
+import time
+import tempfile
+from unittest import mock
+
+import RestAPI.Metrics
+from RestAPI.Metrics import MetricsRegistry, getExponentialBuckets, METRICS_FILE_EXTENSION, MERGED_METRICS_FILE_NAME
+
+def _makeRegistry(multiprocessDir = None):
+    registry = MetricsRegistry(multiprocessDir)
+    registry.describeCounter("test_requests_total", "Requests")
+    registry.describeHistogram("test_latency_seconds", "Latency", [0.1, 1])
+    return registry
+
+class TestMetrics(unittest.TestCase):
+    def testExponentialBuckets(self):
+        self.assertEqual(getExponentialBuckets(1, 64), [1, 4, 16, 64])
+        self.assertEqual(getExponentialBuckets(1, 65), [1, 4, 16, 64, 256])
+
+    def testPrometheusText(self):
+        registry = _makeRegistry()
+        registry.incrementCounter("test_requests_total", { 'route' : "/a", 'status' : 200 })
+        registry.incrementCounter("test_requests_total", { 'route' : "/a", 'status' : 200 }, 2)
+        registry.incrementCounter("test_requests_total", { 'route' : 'say "hi"', 'status' : 404 })
+        for value in [0.05, 0.1, 0.5, 3]:
+            registry.observe("test_latency_seconds", value)
+
+        text = registry.getAsPrometheusText([("test_builds", "Builds", [({}, 7), ({ 'race' : "HUMAN" }, 2.5)])])
+        lines = text.splitlines()
+        self.assertIn("# TYPE test_requests_total counter", lines)
+        self.assertIn('test_requests_total{route="/a",status="200"} 3', lines)
+        self.assertIn('test_requests_total{route="say \\"hi\\"",status="404"} 1', lines)
+
+        self.assertIn("# TYPE test_latency_seconds histogram", lines)
+        #Buckets are cumulative, and a value on a bucket's upper bound is in that bucket
+        self.assertIn('test_latency_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('test_latency_seconds_bucket{le="1"} 3', lines)
+        self.assertIn('test_latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("test_latency_seconds_count 4", lines)
+        self.assertIn("test_latency_seconds_sum 3.65", lines)
+
+        self.assertIn("# TYPE test_builds gauge", lines)
+        self.assertIn("test_builds 7", lines)
+        self.assertIn('test_builds{race="HUMAN"} 2.5', lines)
+        self.assertTrue(text.endswith("\n"))
+
+    #Registries of separate processes sharing a directory should add up each other's metrics
+    def testMultiprocessAggregation(self):
+        with tempfile.TemporaryDirectory() as multiprocessDir:
+            registry = _makeRegistry(multiprocessDir)
+            otherProcessRegistry = _makeRegistry(multiprocessDir)
+            registry.incrementCounter("test_requests_total", { 'route' : "/a" })
+            registry.observe("test_latency_seconds", 0.5)
+            otherProcessRegistry.incrementCounter("test_requests_total", { 'route' : "/a" }, 2)
+            otherProcessRegistry.incrementCounter("test_requests_total", { 'route' : "/b" })
+            otherProcessRegistry.observe("test_latency_seconds", 2)
+
+            #Nothing from the other process until it flushes
+            lines = registry.getAsPrometheusText().splitlines()
+            self.assertIn('test_requests_total{route="/a"} 1', lines)
+            self.assertNotIn('test_requests_total{route="/b"} 1', lines)
+
+            otherProcessRegistry.flush()
+            lines = registry.getAsPrometheusText().splitlines()
+            self.assertIn('test_requests_total{route="/a"} 3', lines)
+            self.assertIn('test_requests_total{route="/b"} 1', lines)
+            self.assertIn('test_latency_seconds_bucket{le="1"} 1', lines)
+            self.assertIn("test_latency_seconds_count 2", lines)
+            self.assertIn("test_latency_seconds_sum 2.5", lines)
+
+            #Only the processes' metrics files are left in the directory
+            self.assertEqual(len([fileName for fileName in os.listdir(multiprocessDir) if fileName.endswith(METRICS_FILE_EXTENSION)]), 2)
+
+    #Metrics of processes that have exited should still be counted, from a merged file that replaces their own files
+    def testMergeExitedProcesses(self):
+        with tempfile.TemporaryDirectory() as multiprocessDir:
+            registry = _makeRegistry(multiprocessDir)
+            registry.incrementCounter("test_requests_total", { 'route' : "/a" })
+            for i in range(2):
+                exitedRegistry = _makeRegistry(multiprocessDir)
+                exitedRegistry.incrementCounter("test_requests_total", { 'route' : "/a" }, 2)
+                exitedRegistry.observe("test_latency_seconds", 0.5)
+                exitedRegistry.flush()
+                #Like the process exiting
+                exitedRegistry.mProcessLockFile.close()
+
+            for i in range(2):
+                lines = registry.getAsPrometheusText().splitlines()
+                self.assertIn('test_requests_total{route="/a"} 5', lines)
+                self.assertIn("test_latency_seconds_count 2", lines)
+                self.assertEqual(sorted(fileName for fileName in os.listdir(multiprocessDir) if fileName.endswith(METRICS_FILE_EXTENSION)),
+                                 sorted([MERGED_METRICS_FILE_NAME, os.path.basename(registry.mFilePath)]))
+            #Their lock files are removed too
+            self.assertEqual(len([fileName for fileName in os.listdir(multiprocessDir) if fileName.endswith(".metrics.lock")]), 1)
+
+    #Metrics are written to the directory on a timer, not as they're recorded
+    def testFlushPeriodically(self):
+        with tempfile.TemporaryDirectory() as multiprocessDir, mock.patch.object(RestAPI.Metrics, "FLUSH_INTERVAL_SEC", 0.01):
+            registry = _makeRegistry(multiprocessDir)
+            registry.incrementCounter("test_requests_total", { 'route' : "/a" })
+            for i in range(200):
+                if os.path.exists(registry.mFilePath):
+                    break
+                time.sleep(0.01)
+            self.assertTrue(os.path.exists(registry.mFilePath))
+
+if __name__ == '__main__':
+    unittest.main()
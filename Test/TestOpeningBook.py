@@ -0,0 +1,101 @@
+import unittest
+
+import io
+import os
+import json
+import tempfile
+import contextlib
+from unittest import mock
+
+import SimEngine.OpeningBook
+from SimEngine.OpeningBook import OpeningBook, buildOpeningBook, _iterSavedBuilds
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationEngine import SimulationEngine
+from RestAPI.SavedBuildStore import createSavedBuildStore, SAVED_BUILD_STORE_SQLITE
+
+class TestOpeningBook(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            cls.huntBuildOrderDict = json.loads(file.read())[0]
+        #Two builds that share the hunt build's first 20 actions, and then do something different
+        cls.variantBuildOrderDicts = [dict(cls.huntBuildOrderDict, orderedActionList = cls.huntBuildOrderDict['orderedActionList'][:numActions])
+                                      for numActions in [20, 25]]
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+
+    def _buildBook(self, buildOrderDicts, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return buildOpeningBook(buildOrderDicts, **kwargs)
+
+    def _getTimelines(self, buildOrderDict, openingBook = None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            buildOrder = BuildOrder.simulateBuildOrderFromDict(buildOrderDict, openingBook = openingBook)
+        return buildOrder, buildOrder.getSimTimeAndTimelinesAsDictForSerialization()
+
+    def testBuildOpeningBook(self):
+        book, numUnreadable = self._buildBook(self.variantBuildOrderDicts + [self.huntBuildOrderDict, { 'race' : "NOT_A_RACE" }])
+        self.assertEqual(numUnreadable, 1)
+        #The longest openings that at least two builds start with
+        self.assertEqual(sorted(numActions for race, numActions, pickledBuildOrder in book.mOpenings.values()), [20, 25])
+
+        book, numUnreadable = self._buildBook([self.huntBuildOrderDict] * 2, maxNumActions = 10)
+        self.assertEqual([numActions for race, numActions, pickledBuildOrder in book.mOpenings.values()], [10])
+
+        book, numUnreadable = self._buildBook(self.variantBuildOrderDicts, minBuilds = 3)
+        self.assertEqual(book.getNumOpenings(), 0)
+
+    #Simulating from the book should give the same result as from scratch, every time
+    def testSimulateFromBook(self):
+        book, numUnreadable = self._buildBook(self.variantBuildOrderDicts + [self.huntBuildOrderDict])
+        expectedBuildOrder, expectedTimelines = self._getTimelines(self.huntBuildOrderDict)
+        for i in range(2):
+            buildOrder, timelines = self._getTimelines(self.huntBuildOrderDict, book)
+            self.assertEqual(buildOrder.mNumActionsFromOpeningBook, 25)
+            self.assertEqual(timelines, expectedTimelines)
+            self.assertEqual(buildOrder.getEndTime(), expectedBuildOrder.getEndTime())
+
+        #A build that starts like the openings, but not exactly, uses the longest opening it does start with
+        changedBuildOrderDict = json.loads(json.dumps(self.huntBuildOrderDict))
+        changedBuildOrderDict['orderedActionList'][22]['actionID'] = 1000
+        buildOrder, timelines = self._getTimelines(changedBuildOrderDict, book)
+        self.assertEqual(buildOrder.mNumActionsFromOpeningBook, 20)
+        self.assertEqual(timelines, self._getTimelines(changedBuildOrderDict)[1])
+
+        #The same actions with fields the engine ignores still match
+        paddedBuildOrderDict = json.loads(json.dumps(self.huntBuildOrderDict))
+        for actionDict in paddedBuildOrderDict['orderedActionList']:
+            actionDict['comment'] = "Ignored"
+        self.assertEqual(self._getTimelines(paddedBuildOrderDict, book)[0].mNumActionsFromOpeningBook, 25)
+
+        simEngine = SimulationEngine()
+        with contextlib.redirect_stdout(io.StringIO()):
+            simEngine.loadStateFromActionLists([self.huntBuildOrderDict] * 2, openingBook = book)
+        self.assertEqual([buildOrder.mNumActionsFromOpeningBook for buildOrder in simEngine.getTeamBuildOrders()], [25, 25])
+
+    def testSaveAndLoad(self):
+        book, numUnreadable = self._buildBook(self.variantBuildOrderDicts * 2)
+        bookFile = os.path.join(self.tempDir.name, "Books", "OpeningBook.pickle")
+        book.save(bookFile)
+        self.assertEqual(os.listdir(os.path.dirname(bookFile)), ["OpeningBook.pickle"])
+
+        loadedBook = OpeningBook.load(bookFile)
+        self.assertEqual(loadedBook.getNumOpenings(), 2)
+        self.assertEqual(self._getTimelines(self.huntBuildOrderDict, loadedBook)[0].mNumActionsFromOpeningBook, 25)
+
+        self.assertEqual(OpeningBook.load(os.path.join(self.tempDir.name, "Missing.pickle")).getNumOpenings(), 0)
+        #Books are only used with the engine version they were made with
+        with mock.patch.object(SimEngine.OpeningBook, "SIMULATION_ENGINE_VERSION", "Next"), contextlib.redirect_stdout(io.StringIO()) as stdout:
+            self.assertEqual(OpeningBook.load(bookFile).getNumOpenings(), 0)
+        self.assertIn("engine version", stdout.getvalue())
+
+    def testIterSavedBuilds(self):
+        savedBuildStore = createSavedBuildStore(SAVED_BUILD_STORE_SQLITE, self.tempDir.name)
+        savedBuildStore.createBuild("Hunt", json.dumps([self.huntBuildOrderDict]))
+        savedBuildStore.createBuild("Not JSON", "{")
+        self.assertEqual(list(_iterSavedBuilds(savedBuildStore)), [("Hunt", [self.huntBuildOrderDict])])
+
+if __name__ == '__main__':
+    unittest.main()
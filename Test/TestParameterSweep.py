@@ -0,0 +1,77 @@
+import unittest
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from SimEngine.ParameterSweep import sweepParameters, formatTable, getStructureNames
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationConstants import Race
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            buildOrderDict = json.loads(file.read())[0]
+        self.race = Race[buildOrderDict['race']]
+        self.actionDicts = buildOrderDict['orderedActionList']
+
+    def testDefaultGridPointMatchesSimulation(self):
+        sweepResults = sweepParameters(self.race, self.actionDicts, {})
+        self.assertEqual(len(sweepResults['rows']), 1)
+        self.assertEqual(sweepResults['keyActionNames'], ["Altar of Elders", "Moon Well", "Hunter's Hall", "Ancient of War"])
+
+        buildOrder = BuildOrder.simulateBuildOrderFromDict({ 'race' : self.race.name, 'orderedActionList' : self.actionDicts })
+        row = sweepResults['rows'][0]
+        self.assertTrue(row['simulationSucceeded'])
+        self.assertEqual(row['endTime'], buildOrder.getEndTime())
+        #The second Moon Well is the last one finished
+        moonWellEndTimes = [action.getEndTime() for action in buildOrder.mOrderedActionList if action.mName == "Moon Well"]
+        self.assertEqual(row['completionTimes']["Moon Well"], max(moonWellEndTimes))
+
+    def _checkSweep(self, executor):
+        parameterValues = { 'timeToWalkToMineSec' : [1, 2, 3], 'travelTimeScale' : [0.5, 1] }
+        sweepResults = sweepParameters(self.race, self.actionDicts, parameterValues, ["Altar of Elders"], executor)
+        rows = sweepResults['rows']
+        self.assertEqual([(row['parameters']['timeToWalkToMineSec'], row['parameters']['travelTimeScale']) for row in rows],
+                         [(1, 0.5), (1, 1), (2, 0.5), (2, 1), (3, 0.5), (3, 1)])
+        #Wisps don't walk to the mine, so only the travel time scale needs simulating
+        self.assertEqual(sweepResults['numSimulations'], 2)
+        for row in rows:
+            self.assertEqual(row['completionTimes'], rows[row['parameters']['travelTimeScale'] == 1]['completionTimes'])
+
+        #Less travel time can only make the altar finish sooner
+        self.assertLess(rows[0]['completionTimes']["Altar of Elders"], rows[1]['completionTimes']["Altar of Elders"])
+        return sweepResults
+
+    def testSweep(self):
+        self._checkSweep(None)
+
+    def testSweepInWorkerProcesses(self):
+        with ProcessPoolExecutor(max_workers = 2) as executor:
+            self.assertEqual(self._checkSweep(executor), self._checkSweep(None))
+
+    #Peons do walk to the mine, so every walk time is simulated
+    def testWalkTimeSimulatedForOrc(self):
+        orcActionDicts = [{ 'actionType' : 'WorkerMovementAction', 'trigger' : { 'triggerType' : 'ASAP' }, 'currentWorkerTask' : 'IDLE', 'desiredWorkerTask' : 'GOLD',
+                            'requiredTimelineType' : 'Peon', 'travelTime' : 0, 'workerTimelineID' : None, 'actionID' : i } for i in range(5)]
+        sweepResults = sweepParameters(Race.ORC, orcActionDicts, { 'timeToWalkToMineSec' : [1, 2] })
+        self.assertEqual(sweepResults['numSimulations'], 2)
+
+    def testUnknownParameter(self):
+        with self.assertRaises(ValueError):
+            sweepParameters(self.race, self.actionDicts, { 'notAParameter' : [1] })
+        #The simulation doesn't use the map's trip times, so sweeping them would only give the same result for every value
+        with self.assertRaises(ValueError):
+            sweepParameters(self.race, self.actionDicts, { 'goldTripTravelTimeSec' : [5, 50] })
+
+    def testFormatTable(self):
+        sweepResults = sweepParameters(self.race, self.actionDicts, { 'travelTimeScale' : [1, 2] }, ["Altar of Elders", "Hunter's Hall"])
+        lines = formatTable(sweepResults).split("\n")
+        self.assertEqual(len(lines), 3)
+        #Only swept parameters get a column
+        self.assertEqual(lines[0].split(), ["travelTimeScale", "ok", "end", "Altar", "of", "Elders", "Hunter's", "Hall"])
+        self.assertIn("yes", lines[1])
+
+    def testGetStructureNames(self):
+        self.assertEqual(getStructureNames(self.actionDicts[:7]), ["Altar of Elders", "Moon Well"])
+
+if __name__ == '__main__':
+    unittest.main()
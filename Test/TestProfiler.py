@@ -0,0 +1,66 @@
+import unittest
+import os
+import json
+import tempfile
+
+from SimEngine.Profiler import profileCall, formatCollapsedStacks, writeCollapsedStacks
+from SimEngine.BuildOrder import BuildOrder
+
+#Check that text is collapsed stacks: "frame;frame;frame weight" on each line
+def _parseCollapsedStacks(testCase, collapsedStacks):
+    weightsByStack = {}
+    for line in collapsedStacks.splitlines():
+        stack, weight = line.rsplit(" ", 1)
+        testCase.assertGreater(int(weight), 0)
+        testCase.assertNotIn(stack, weightsByStack)
+        weightsByStack[stack] = int(weight)
+    return weightsByStack
+
+def _spin(numIterations):
+    total = 0
+    for i in range(numIterations):
+        total += i * i
+    return total
+
+class TestProfiler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            cls.huntBuildOrderDict = json.loads(file.read())[0]
+
+    def testFormatCollapsedStacks(self):
+        self.assertEqual(formatCollapsedStacks({ ("a", "b") : 2, ("a",) : 5, ("c",) : 0 }), "a 5\na;b 2\n")
+        self.assertEqual(formatCollapsedStacks({}), "")
+
+    def testCProfile(self):
+        endTime, collapsedStacks = profileCall(lambda: BuildOrder.simulateBuildOrderFromDict(self.huntBuildOrderDict).getEndTime(), "cprofile")
+        #Profiling shouldn't change the result
+        self.assertEqual(endTime, BuildOrder.simulateBuildOrderFromDict(self.huntBuildOrderDict).getEndTime())
+        weightsByStack = _parseCollapsedStacks(self, collapsedStacks)
+        self.assertTrue(any("simulateBuildOrderFromDict (BuildOrder.py:" in stack for stack in weightsByStack))
+        #Every stack starts at the profiled function
+        self.assertTrue(all(stack.startswith("<lambda> (TestProfiler.py:") for stack in weightsByStack))
+
+    def testSampling(self):
+        total, collapsedStacks = profileCall(lambda: _spin(2000000), "sample")
+        self.assertEqual(total, _spin(2000000))
+        weightsByStack = _parseCollapsedStacks(self, collapsedStacks)
+        self.assertGreater(len(weightsByStack), 0)
+        #Only the frames under the profiled call are included
+        self.assertTrue(all(stack.startswith("<lambda> (TestProfiler.py:") for stack in weightsByStack))
+        self.assertTrue(any(stack.endswith(";_spin (TestProfiler.py:" + str(_spin.__code__.co_firstlineno) + ")") for stack in weightsByStack))
+
+    def testUnknownProfiler(self):
+        with self.assertRaises(ValueError):
+            profileCall(lambda: None, "perf")
+
+    def testWriteCollapsedStacks(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            profilesDir = os.path.join(tempDir, "Profiles")
+            filePath = writeCollapsedStacks(profilesDir, "abc", "a;b 1\n")
+            self.assertEqual(filePath, os.path.join(profilesDir, "abc.collapsed"))
+            with open(filePath, 'r') as file:
+                self.assertEqual(file.read(), "a;b 1\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,20 @@
 import unittest
-import os, glob
 import json
+import gzip
+import os
+import tempfile
+from unittest import mock
 
-from RestAPI.app import app, SAVED_BUILD_STORAGE_DIR
+import RestAPI.app
 
-#Prefix used for files that should be cleaned up after the current test
+from RestAPI.app import app, savedBuildStore, backgroundSimulationExecutor
+from SimEngine.SimulationConstants import SIMULATION_ENGINE_VERSION
+from SimEngine.OpeningBook import buildOpeningBook
+from SimEngine.ResultCache import ResultCache
+
+#Prefix used for builds that should be cleaned up after the current test
 UNIT_TEST_TMP_FILE_PREFIX = "unit_test_tmp_"
-#Prefix used for files that should be cleaned up only after the full suite is run
+#Prefix used for builds that should be cleaned up only after the full suite is run
 SUITE_TMP_FILE_PREFIX = "suite_" + UNIT_TEST_TMP_FILE_PREFIX
 
 #Filename of the valid save that will be present for the entire suite, for use with tests
@@ -19,8 +27,8 @@ class TestRESTEndpoints(unittest.TestCase):
         # Set up a valid saved file for use with tests
         with open('Test/TestInput/ValidOrderedActionList.json', 'r') as file:
             fileData = file.read()
-        with open(os.path.join(SAVED_BUILD_STORAGE_DIR, VALID_SAVE_NAME), 'w') as file:
-            file.write(fileData)
+        savedBuildStore.deleteBuild(VALID_SAVE_NAME)
+        savedBuildStore.createBuild(VALID_SAVE_NAME, fileData)
 
         cls.ctx = app.app_context()
         cls.ctx.push()
@@ -31,26 +39,31 @@ class TestRESTEndpoints(unittest.TestCase):
     def tearDownClass(cls):
         cls.ctx.pop()
 
-        #Delete any temp files created by the test suite
-        for filename in glob.glob(os.path.join(SAVED_BUILD_STORAGE_DIR, SUITE_TMP_FILE_PREFIX + "*")):
-            os.remove(filename)
+        #Delete any temp builds created by the test suite
+        for buildInfo in savedBuildStore.listBuilds(prefix = SUITE_TMP_FILE_PREFIX):
+            savedBuildStore.deleteBuild(buildInfo.mName)
 
     #TODO: We could probably refactor a lot of the unit tests in other files to use setUp and tearDown
     #Defines code to be run before each test
     def setUp(self):
-        pass
+        #Each test gets an empty result cache, so results cached by earlier tests (or runs) don't stop anything from being simulated
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        resultCachePatch = mock.patch.object(RestAPI.app, "resultCache", ResultCache(os.path.join(self.tempDir.name, "ResultCache.db")))
+        resultCachePatch.start()
+        self.addCleanup(resultCachePatch.stop)
 
     #Defines code to be run after each test
     def tearDown(self):
-        #Delete any temp files created by the unit test
-        for filename in glob.glob(os.path.join(SAVED_BUILD_STORAGE_DIR, UNIT_TEST_TMP_FILE_PREFIX + "*")):
-            os.remove(filename)
+        #Delete any temp builds created by the unit test
+        for buildInfo in savedBuildStore.listBuilds(prefix = UNIT_TEST_TMP_FILE_PREFIX):
+            savedBuildStore.deleteBuild(buildInfo.mName)
 
     #Get timelines simulated from an ordered action list
     def testGetSimulatedTimelines(self):
         with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
             actionListData = file.read()
-        response = self.client.get("/simulation-results/timelines", json=actionListData)
+        response = self.client.get("/simulation-results/timelines?pretty=true", json=actionListData)
         self.assertEqual(response.status_code, 200)
 
         #Timeline JSON data should match what we have on file
@@ -58,6 +71,249 @@ class TestRESTEndpoints(unittest.TestCase):
             timelineData = file.read()
         self.assertEqual(response.get_data(as_text=True), timelineData)
 
+    #Timelines are compact JSON by default, and gzipped if the client accepts it
+    def testGetSimulatedTimelinesCompactAndGzipped(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        with open('Test/TestInput/HuntBuildSimulationOutputTruth.json', 'r') as file:
+            timelineData = file.read()
+
+        response = self.client.get("/simulation-results/timelines", json=actionListData)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get("Content-Encoding"), None)
+        compactData = response.get_data(as_text=True)
+        self.assertLess(len(compactData), len(timelineData))
+        self.assertNotIn("\n", compactData)
+        self.assertEqual(json.loads(compactData), json.loads(timelineData))
+
+        response = self.client.get("/simulation-results/timelines", json=actionListData, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(response.headers.get("Vary"), "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.get_data()).decode("utf-8"), compactData)
+
+        #A gzipped response has a different ETag than the same timelines uncompressed
+        response = self.client.get("/simulation-results/timelines", json=actionListData, headers={"If-None-Match": response.headers.get("ETag")})
+        self.assertEqual(response.status_code, 200)
+
+    #Streamed timelines should be the same JSON as the compact timelines
+    def testGetStreamedSimulatedTimelines(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        compactData = self.client.get("/simulation-results/timelines", json=actionListData).get_data(as_text=True)
+
+        response = self.client.get("/simulation-results/timelines?stream=true", json=actionListData)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.get_data(as_text=True), compactData)
+
+        response = self.client.get("/simulation-results/timelines?stream=true", json=actionListData, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(response.get_data()).decode("utf-8"), compactData)
+
+        #Errors are still returned before anything is streamed
+        with open('Test/TestInput/InvalidOrderedActionList.json', 'r') as file:
+            invalidData = file.read()
+        response = self.client.get("/simulation-results/timelines?stream=true", json=invalidData)
+        self.assertEqual(response.status_code, 400)
+
+    #Stats are only added to the headers when they're asked for, and don't change the timelines
+    def testGetSimulatedTimelinesWithStats(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        response = self.client.get("/simulation-results/timelines", json=actionListData)
+        self.assertEqual(response.headers.get("X-Simulation-Stats"), None)
+        compactData = response.get_data(as_text=True)
+
+        for query in ["stats=true", "stats=true&stream=true"]:
+            response = self.client.get("/simulation-results/timelines?" + query, json=actionListData)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_data(as_text=True), compactData)
+            stats = json.loads(response.headers.get("X-Simulation-Stats"))
+            self.assertEqual(len(stats), 1)
+            self.assertGreater(stats[0]['eventsExecuted'], 0)
+            self.assertEqual(sum(stats[0]['actionsByTriggerType'].values()), len(json.loads(actionListData)[0]['orderedActionList']))
+
+    def testGetMetrics(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        response = self.client.get("/simulation-results/timelines", json=actionListData)
+        self.client.get("/simulation-results/timelines", json=actionListData, headers={"If-None-Match": response.headers.get("ETag")})
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers.get("Content-Type").startswith("text/plain"))
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertTrue(any(line.startswith('wc3_http_requests_total{method="GET",route="/simulation-results/timelines",status="200"} ') for line in lines))
+        self.assertTrue(any(line.startswith('wc3_http_requests_total{method="GET",route="/simulation-results/timelines",status="304"} ') for line in lines))
+        self.assertTrue(any(line.startswith('wc3_http_request_duration_seconds_count{method="GET",route="/simulation-results/timelines"} ') for line in lines))
+        self.assertTrue(any(line.startswith('wc3_http_payload_bytes_count{direction="request",route="/simulation-results/timelines"} ') for line in lines))
+        self.assertTrue(any(line.startswith("wc3_simulated_simtime_count ") for line in lines))
+        self.assertTrue(any(line.startswith("wc3_simulation_events_executed_count ") for line in lines))
+        self.assertTrue(any(line.startswith('wc3_cache_requests_total{cache="etag",result="hit"} ') for line in lines))
+        self.assertTrue(any(line.startswith('wc3_cache_hit_ratio{cache="etag"} ') for line in lines))
+        self.assertIn("wc3_saved_builds " + str(savedBuildStore.getNumBuilds()), lines)
+
+    #Builds that start with an opening in the opening book should be simulated from there, with the same timelines
+    def testGetTimelinesWithOpeningBook(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        expectedData = self.client.get("/simulation-results/timelines", json=actionListData).get_data(as_text=True)
+
+        openingBook, numUnreadable = buildOpeningBook(json.loads(actionListData) * 2, maxNumActions = 10)
+        #Without the result cache, so the second request is simulated again
+        with mock.patch.object(RestAPI.app, "openingBook", openingBook), mock.patch.object(RestAPI.app, "resultCache", None):
+            response = self.client.get("/simulation-results/timelines", json=actionListData)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_data(as_text=True), expectedData)
+
+            lines = self.client.get("/metrics").get_data(as_text=True).splitlines()
+            self.assertTrue(any(line.startswith('wc3_cache_requests_total{cache="opening_book",result="hit"} ') for line in lines))
+
+    #Timelines should be the same whether they were simulated or found in the result cache, in every encoding
+    def testGetTimelinesFromResultCache(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        with mock.patch.object(RestAPI.app, "resultCache", None):
+            expectedResponses = [self.client.get("/simulation-results/timelines" + query, json=actionListData, headers=headers).get_data()
+                                 for query in ["", "?pretty=true", "?activeOnly=true"] for headers in [{}, {"Accept-Encoding": "gzip"}]]
+
+        for i in range(2):
+            responses = [self.client.get("/simulation-results/timelines" + query, json=actionListData, headers=headers).get_data()
+                         for query in ["", "?pretty=true", "?activeOnly=true"] for headers in [{}, {"Accept-Encoding": "gzip"}]]
+            self.assertEqual(responses, expectedResponses)
+        #Pretty and compact timelines are the same entry, but filtered timelines are their own
+        self.assertEqual(RestAPI.app.resultCache.getNumEntries(), 2)
+
+        #The same build orders with their keys in a different order are the same request
+        reorderedActionListData = json.dumps([{ key : buildOrderDict[key] for key in reversed(list(buildOrderDict)) } for buildOrderDict in json.loads(actionListData)])
+        self.assertEqual(self.client.get("/simulation-results/timelines", json=reorderedActionListData).get_data(), expectedResponses[0])
+        self.assertEqual(RestAPI.app.resultCache.getNumEntries(), 2)
+
+        lines = self.client.get("/metrics").get_data(as_text=True).splitlines()
+        self.assertTrue(any(line.startswith('wc3_cache_requests_total{cache="result_cache",result="hit"} ') for line in lines))
+        self.assertIn("wc3_result_cache_bytes " + str(RestAPI.app.resultCache.getTotalSize()), lines)
+
+    def testGetProfiledSimulatedTimelines(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+
+        #Not allowed unless the server allows it
+        response = self.client.get("/simulation-results/timelines?profile=cprofile", json=actionListData)
+        self.assertEqual(response.status_code, 403)
+
+        with tempfile.TemporaryDirectory() as profilesDir, mock.patch.object(RestAPI.app, "ALLOW_PROFILING", True), \
+             mock.patch.object(RestAPI.app, "PROFILES_DIR", profilesDir):
+            response = self.client.get("/simulation-results/timelines?profile=cprofile", json=actionListData)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers.get("Content-Type").startswith("text/plain"))
+            lines = response.get_data(as_text=True).splitlines()
+            self.assertGreater(len(lines), 0)
+            self.assertTrue(any("simulateBuildOrderFromDict (BuildOrder.py:" in line for line in lines))
+
+            response = self.client.get("/simulation-results/timelines?profile=perf", json=actionListData)
+            self.assertEqual(response.status_code, 400)
+
+            #Written to a file, and the timelines returned as usual
+            compactData = self.client.get("/simulation-results/timelines", json=actionListData).get_data(as_text=True)
+            response = self.client.get("/simulation-results/timelines?profile=sample&profileOutput=file", json=actionListData)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_data(as_text=True), compactData)
+            profileFileName = response.headers.get("X-Profile-File")
+            self.assertTrue(profileFileName.endswith(".sample.collapsed"))
+            self.assertEqual(os.listdir(profilesDir), [profileFileName])
+
+    #Filtered timelines should only contain the requested timelines and the actions in the requested simtime window
+    def testGetFilteredSimulatedTimelines(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        fullTimelines = json.loads(self.client.get("/simulation-results/timelines", json=actionListData).get_data(as_text=True))
+
+        response = self.client.get("/simulation-results/timelines?activeOnly=true&timelineTypes=Wisp,Altar of Elders&startTime=1000&endTime=2000", json=actionListData)
+        self.assertEqual(response.status_code, 200)
+        filteredTimelines = json.loads(response.get_data(as_text=True))
+        self.assertEqual(len(filteredTimelines), len(fullTimelines))
+        for fullBuildOrder, filteredBuildOrder in zip(fullTimelines, filteredTimelines):
+            self.assertEqual(filteredBuildOrder['inactiveTimelines'], [])
+            self.assertEqual(filteredBuildOrder['currentResources'], fullBuildOrder['currentResources'])
+            expectedTimelines = [timeline for timeline in fullBuildOrder['activeTimelines'] if timeline['timelineType'] in ["Wisp", "Altar of Elders"]]
+            self.assertEqual([timeline['timelineID'] for timeline in filteredBuildOrder['activeTimelines']], [timeline['timelineID'] for timeline in expectedTimelines])
+            for timeline in filteredBuildOrder['activeTimelines']:
+                for action in timeline['actions']:
+                    self.assertLess(action['startTime'], 2000)
+
+        #Streaming should apply the same filter
+        response = self.client.get("/simulation-results/timelines?stream=true&timelineIDs=0,4&startTime=500", json=actionListData)
+        streamedData = response.get_data(as_text=True)
+        response = self.client.get("/simulation-results/timelines?timelineIDs=0,4&startTime=500", json=actionListData)
+        self.assertEqual(streamedData, response.get_data(as_text=True))
+        for buildOrder in json.loads(streamedData):
+            for timeline in buildOrder['activeTimelines'] + buildOrder['inactiveTimelines']:
+                self.assertIn(timeline['timelineID'], [0, 4])
+
+        response = self.client.get("/simulation-results/timelines?startTime=soon", json=actionListData)
+        self.assertEqual(response.status_code, 400)
+
+    #Timeline deltas should only include the timelines that changed from the versions the client has
+    def testGetSimulatedTimelineDeltas(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            fullActionLists = json.loads(file.read())
+        shortActionLists = json.loads(json.dumps(fullActionLists))
+        shortActionLists[0]['orderedActionList'] = shortActionLists[0]['orderedActionList'][:-1]
+
+        def getDeltas(orderedActionLists, knownTimelineVersions):
+            response = self.client.get("/simulation-results/timeline-deltas", json={ "orderedActionLists" : orderedActionLists, "knownTimelineVersions" : knownTimelineVersions })
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.get_data(as_text=True))
+
+        #With no known versions, every timeline is returned
+        shortDeltas = getDeltas(shortActionLists, [])
+        shortTimelines = json.loads(self.client.get("/simulation-results/timelines", json=json.dumps(shortActionLists)).get_data(as_text=True))
+        self.assertEqual(len(shortDeltas[0]['changedTimelines']), len(shortTimelines[0]['activeTimelines']) + len(shortTimelines[0]['inactiveTimelines']))
+        self.assertEqual(shortDeltas[0]['deletedTimelineIDs'], [])
+        knownVersions = [{ timeline['timelineID'] : timeline['version'] for timeline in shortDeltas[0]['changedTimelines'] }]
+
+        #Adding one action only changes a few timelines
+        fullDeltas = getDeltas(fullActionLists, knownVersions)
+        self.assertGreater(len(fullDeltas[0]['changedTimelines']), 0)
+        self.assertLess(len(fullDeltas[0]['changedTimelines']), len(shortDeltas[0]['changedTimelines']) / 2)
+        fullTimelines = json.loads(self.client.get("/simulation-results/timelines", json=json.dumps(fullActionLists)).get_data(as_text=True))
+        self.assertEqual(fullDeltas[0]['activeTimelineIDs'], [timeline['timelineID'] for timeline in fullTimelines[0]['activeTimelines']])
+        self.assertEqual(fullDeltas[0]['currentResources'], fullTimelines[0]['currentResources'])
+        for changedTimeline in fullDeltas[0]['changedTimelines']:
+            del changedTimeline['version']
+            self.assertIn(changedTimeline, fullTimelines[0]['activeTimelines'] + fullTimelines[0]['inactiveTimelines'])
+
+        #Nothing changed, so nothing is returned
+        self.assertEqual(getDeltas(shortActionLists, knownVersions)[0]['changedTimelines'], [])
+
+        #Timelines the client has that no longer exist are returned as deleted
+        knownVersions[0][1000] = "version"
+        self.assertEqual(getDeltas(shortActionLists, knownVersions)[0]['deletedTimelineIDs'], [1000])
+
+        response = self.client.get("/simulation-results/timeline-deltas", json={ "knownTimelineVersions" : [] })
+        self.assertEqual(response.status_code, 400)
+
+    #Each variant's timelines should be the same as simulating the shared actions and the variant's actions from scratch
+    def testGetVariantComparison(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionLists = json.loads(file.read())
+        actionDicts = actionLists[0]['orderedActionList']
+        variantsRequest = { "race" : actionLists[0]['race'], "orderedActionList" : actionDicts[:-2], "variants" : [actionDicts[-2:], actionDicts[-1:]],
+                            "summaryActionIndexes" : [len(actionDicts) - 1] }
+        response = self.client.get("/simulation-results/variants", json=json.dumps(variantsRequest))
+        self.assertEqual(response.status_code, 200)
+        variants = json.loads(response.get_data(as_text=True))['variants']
+
+        for variant, variantActionDicts in zip(variants, variantsRequest['variants']):
+            actionLists[0]['orderedActionList'] = actionDicts[:-2] + variantActionDicts
+            expectedTimelines = json.loads(self.client.get("/simulation-results/timelines", json=json.dumps(actionLists)).get_data(as_text=True))
+            self.assertEqual(variant['timelines'], expectedTimelines[0])
+        self.assertEqual(variants[1]['diffFromFirstVariant']['endTime'], variants[1]['endTime'] - variants[0]['endTime'])
+
+        variantsRequest['variants'] = []
+        response = self.client.get("/simulation-results/variants", json=json.dumps(variantsRequest))
+        self.assertEqual(response.status_code, 400)
+
     #Test that we get an error if trying to simulate from an invalid JSON
     def testSimulateErrorIfInvalidJSON(self):
         with open('Test/TestInput/InvalidOrderedActionList.json', 'r') as file:
@@ -67,6 +323,40 @@ class TestRESTEndpoints(unittest.TestCase):
         #It should also provide some sort of error text
         self.assertNotEqual(response.get_data(as_text=True), "")
 
+    #Live editing sessions should return the same timelines as simulating the edited build from scratch
+    def testSimulationSession(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionLists = json.loads(file.read())
+        lastActionDict = actionLists[0]['orderedActionList'].pop()
+
+        response = self.client.post("/sessions", json=json.dumps(actionLists))
+        self.assertEqual(response.status_code, 201)
+        sessionID = json.loads(response.get_data(as_text=True))['sessionID']
+        self.assertEqual(response.headers.get("Location"), "/sessions/" + sessionID)
+
+        response = self.client.patch("/sessions/" + sessionID + "/actions", json={ "op" : "append", "action" : lastActionDict })
+        self.assertEqual(response.status_code, 200)
+        actionLists[0]['orderedActionList'].append(lastActionDict)
+        expectedData = self.client.get("/simulation-results/timelines", json=json.dumps(actionLists)).get_data(as_text=True)
+        self.assertEqual(response.get_data(as_text=True), expectedData)
+
+        response = self.client.patch("/sessions/" + sessionID + "/actions", json={ "op" : "delete", "actionIndex" : 0 })
+        self.assertEqual(response.status_code, 200)
+        actionLists[0]['orderedActionList'].pop(0)
+        expectedData = self.client.get("/simulation-results/timelines?activeOnly=true", json=json.dumps(actionLists)).get_data(as_text=True)
+        response = self.client.get("/sessions/" + sessionID + "/timelines?activeOnly=true")
+        self.assertEqual(response.get_data(as_text=True), expectedData)
+
+        response = self.client.patch("/sessions/" + sessionID + "/actions", json={ "op" : "delete", "actionIndex" : 1000 })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.delete("/sessions/" + sessionID)
+        self.assertEqual(response.status_code, 204)
+        response = self.client.get("/sessions/" + sessionID + "/timelines")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.patch("/sessions/" + sessionID + "/actions", json={ "op" : "delete", "actionIndex" : 0 })
+        self.assertEqual(response.status_code, 404)
+
     #Get the name of all saved builds as a JSON
     def testGetSavedBuilds(self):
         response = self.client.get("/saved-builds")
@@ -87,8 +377,7 @@ class TestRESTEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.get_data(as_text=True), "")
 
-        with open(os.path.join(SAVED_BUILD_STORAGE_DIR, filename), 'r') as file:
-            newfiledata = file.read()
+        newfiledata, etag = savedBuildStore.getBuild(filename)
         self.assertEqual(origFileData, newfiledata)
 
     #Test that creating a saved build errors if it already exists
@@ -100,8 +389,7 @@ class TestRESTEndpoints(unittest.TestCase):
 
     #Test loading a saved build
     def testLoadSavedBuild(self):
-        with open(os.path.join(SAVED_BUILD_STORAGE_DIR, VALID_SAVE_NAME), 'r') as file:
-            fileData = file.read()
+        fileData, etag = savedBuildStore.getBuild(VALID_SAVE_NAME)
 
         response = self.client.get("/saved-builds/" + VALID_SAVE_NAME)
         self.assertEqual(response.status_code, 200)
@@ -115,15 +403,13 @@ class TestRESTEndpoints(unittest.TestCase):
 
     #Test updating an existing saved build
     def testUpdatingSavedBuild(self):
-        with open(os.path.join(SAVED_BUILD_STORAGE_DIR, VALID_SAVE_NAME), 'r') as file:
-            origFileData = file.read()
+        origFileData, etag = savedBuildStore.getBuild(VALID_SAVE_NAME)
 
         response = self.client.put("/saved-builds/" + VALID_SAVE_NAME, json="[]")
         self.assertEqual(response.status_code, 204)
         self.assertEqual(response.get_data(as_text=True), "")
 
-        with open(os.path.join(SAVED_BUILD_STORAGE_DIR, VALID_SAVE_NAME), 'r') as file:
-            newFileData = file.read()
+        newFileData, etag = savedBuildStore.getBuild(VALID_SAVE_NAME)
 
         self.assertEqual(newFileData, "[]")
 
@@ -132,8 +418,7 @@ class TestRESTEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 204)
         self.assertEqual(response.get_data(as_text=True), "")
 
-        with open(os.path.join(SAVED_BUILD_STORAGE_DIR, VALID_SAVE_NAME), 'r') as file:
-            newFileData2 = file.read()
+        newFileData2, etag = savedBuildStore.getBuild(VALID_SAVE_NAME)
 
         self.assertEqual(newFileData2, origFileData)
 
@@ -145,22 +430,149 @@ class TestRESTEndpoints(unittest.TestCase):
 
     #Test deleting a saved build
     def testDeletingSavedBuild(self):
-        #Create a file to then delete
+        #Create a build to then delete
         fileName = UNIT_TEST_TMP_FILE_PREFIX + "BuildToDelete.json"
-        filePath = os.path.join(SAVED_BUILD_STORAGE_DIR, fileName)
-        with open(filePath, 'w') as file:
-            file.write("[]")
+        savedBuildStore.createBuild(fileName, "[]")
 
-        self.assertTrue(os.path.exists(filePath))
+        self.assertNotEqual(savedBuildStore.getBuild(fileName), None)
 
         response = self.client.delete("/saved-builds/" + fileName)
         self.assertEqual(response.status_code, 204)
         self.assertEqual(response.get_data(as_text=True), "")
 
-        self.assertFalse(os.path.exists(filePath))
+        self.assertEqual(savedBuildStore.getBuild(fileName), None)
 
     #Test that we get an error if we attempt to delete a saved build that doesn't exist
     def testErrorDeletingNonExistentSavedBuild(self):
         response = self.client.delete("/saved-builds/" + SUITE_TMP_FILE_PREFIX + "nonexistent-build.json")
         self.assertEqual(response.status_code, 404)
-        self.assertEqual(response.get_data(as_text=True), "")
\ No newline at end of file
+        self.assertEqual(response.get_data(as_text=True), "")
+
+    #Simulating the same input again with the ETag we got back should return 304 without a body
+    def testSimulatedTimelinesConditionalGet(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        response = self.client.get("/simulation-results/timelines", json=actionListData)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get("ETag")
+        self.assertTrue(etag)
+        self.assertEqual(response.headers.get("Cache-Control"), "no-cache")
+
+        response = self.client.get("/simulation-results/timelines", json=actionListData, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(as_text=True), "")
+
+        #A different input should not match the ETag
+        response = self.client.get("/simulation-results/timelines", json="[]", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get("ETag"), etag)
+
+    #Saved builds return an ETag that changes when the build is updated
+    def testSavedBuildConditionalGet(self):
+        with open('Test/TestInput/ValidOrderedActionList.json', 'r') as file:
+            origFileData = file.read()
+        name = UNIT_TEST_TMP_FILE_PREFIX + "etag.json"
+        response = self.client.post("/saved-builds/" + name, json=origFileData)
+        self.assertEqual(response.status_code, 201)
+        createdETag = response.headers.get("ETag")
+
+        response = self.client.get("/saved-builds/" + name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get("ETag"), createdETag)
+
+        response = self.client.get("/saved-builds/" + name, headers={"If-None-Match": createdETag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(as_text=True), "")
+
+        response = self.client.put("/saved-builds/" + name, json="[]")
+        self.assertEqual(response.status_code, 204)
+        self.assertNotEqual(response.headers.get("ETag"), createdETag)
+
+        #Old ETag is now stale, so we should get the new build back
+        response = self.client.get("/saved-builds/" + name, headers={"If-None-Match": createdETag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(as_text=True), "[]")
+
+    #Updating with If-Match only succeeds if the build hasn't been changed by someone else
+    def testUpdatingSavedBuildIfMatch(self):
+        name = UNIT_TEST_TMP_FILE_PREFIX + "ifmatch.json"
+        response = self.client.post("/saved-builds/" + name, json="[]")
+        createdETag = response.headers.get("ETag")
+
+        response = self.client.put("/saved-builds/" + name, json="[ ]", headers={"If-Match": createdETag})
+        self.assertEqual(response.status_code, 204)
+        updatedETag = response.headers.get("ETag")
+
+        #Someone else already updated it from createdETag
+        response = self.client.put("/saved-builds/" + name, json="[  ]", headers={"If-Match": createdETag})
+        # Code 412, Precondition Failed
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.headers.get("ETag"), updatedETag)
+        self.assertEqual(savedBuildStore.getBuild(name)[0], "[ ]")
+
+        response = self.client.put("/saved-builds/" + name, json="[  ]", headers={"If-Match": "*"})
+        self.assertEqual(response.status_code, 204)
+
+    #Listing saved builds can be filtered by prefix and paginated, and can return the index entries
+    def testGetSavedBuildsPrefixAndPagination(self):
+        with open('Test/TestInput/ValidOrderedActionList.json', 'r') as file:
+            fileData = file.read()
+        for i in range(3):
+            savedBuildStore.createBuild(UNIT_TEST_TMP_FILE_PREFIX + "paged" + str(i), fileData)
+        savedBuildStore.createBuild(UNIT_TEST_TMP_FILE_PREFIX + "other", "[]")
+
+        response = self.client.get("/saved-builds?prefix=" + UNIT_TEST_TMP_FILE_PREFIX + "paged")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data(as_text=True)), [UNIT_TEST_TMP_FILE_PREFIX + "paged" + str(i) for i in range(3)])
+
+        response = self.client.get("/saved-builds?prefix=" + UNIT_TEST_TMP_FILE_PREFIX + "paged&offset=1&limit=1")
+        self.assertEqual(json.loads(response.get_data(as_text=True)), [UNIT_TEST_TMP_FILE_PREFIX + "paged1"])
+
+        response = self.client.get("/saved-builds?prefix=" + UNIT_TEST_TMP_FILE_PREFIX + "paged0&details=true")
+        buildInfos = json.loads(response.get_data(as_text=True))
+        self.assertEqual(len(buildInfos), 1)
+        self.assertEqual(buildInfos[0]['name'], UNIT_TEST_TMP_FILE_PREFIX + "paged0")
+        self.assertEqual(buildInfos[0]['race'], "NIGHT_ELF,NIGHT_ELF")
+        self.assertEqual(buildInfos[0]['size'], len(fileData.encode("utf-8")))
+        self.assertEqual(buildInfos[0]['numActions'], sum(len(buildOrder['orderedActionList']) for buildOrder in json.loads(fileData)))
+
+        response = self.client.get("/saved-builds?limit=notANumber")
+        self.assertEqual(response.status_code, 400)
+
+    #Saved builds are simulated in the background when saved, and the stored timelines are served directly
+    def testGetSavedBuildTimelines(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            actionListData = file.read()
+        with open('Test/TestInput/HuntBuildSimulationOutputTruth.json', 'r') as file:
+            timelineData = file.read()
+        name = UNIT_TEST_TMP_FILE_PREFIX + "timelines.json"
+        response = self.client.post("/saved-builds/" + name, json=actionListData)
+        buildETag = savedBuildStore.getETag(name)
+
+        #Background simulation uses a single worker, so this will wait until the build has been simulated
+        backgroundSimulationExecutor.submit(lambda: None).result()
+        self.assertNotEqual(savedBuildStore.getSimulatedTimelines(name, buildETag, SIMULATION_ENGINE_VERSION), None)
+        #Results from another engine version should never be served
+        self.assertEqual(savedBuildStore.getSimulatedTimelines(name, buildETag, SIMULATION_ENGINE_VERSION + "-old"), None)
+
+        response = self.client.get("/saved-builds/" + name + "/timelines?pretty=true")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(as_text=True), timelineData)
+
+        response = self.client.get("/saved-builds/" + name + "/timelines", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.get_data())), json.loads(timelineData))
+
+        response = self.client.get("/saved-builds/" + name + "/timelines", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers.get("ETag")})
+        self.assertEqual(response.status_code, 304)
+
+        #Updating the build invalidates the stored timelines
+        response = self.client.put("/saved-builds/" + name, json="[]")
+        self.assertEqual(savedBuildStore.getSimulatedTimelines(name, buildETag, SIMULATION_ENGINE_VERSION), None)
+        response = self.client.get("/saved-builds/" + name + "/timelines")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data(as_text=True)), [])
+
+    def testGetTimelinesOfNonExistentSavedBuild(self):
+        response = self.client.get("/saved-builds/" + SUITE_TMP_FILE_PREFIX + "nonexistent-build.json/timelines")
+        self.assertEqual(response.status_code, 404)
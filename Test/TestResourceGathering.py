@@ -1,6 +1,6 @@
 import unittest
 
-from SimEngine.BuildOrder import BuildOrder
+from SimEngine.BuildOrder import BuildOrder, MapStartingPosition
 from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME, STARTING_GOLD, STARTING_LUMBER
 from SimEngine.Worker import WorkerTask, Worker
 from SimEngine.Trigger import Trigger, TriggerType
@@ -402,6 +402,20 @@ class TestResourceGathering(unittest.TestCase):
 
         testGoldAmountPrecise(timeSec, expectedGoldAmount, buildOrder, self)
 
+    def testOrcGoldMiningLongerWalkToMine(self):
+        mapStartingPosition = MapStartingPosition(name = "Far_Mine", lumberTripTravelTimeSec = 15, goldTripTravelTimeSec = 5, timeToWalkToMineSec = 3)
+        buildOrder = BuildOrder(Race.ORC, mapStartingPosition)
+        workerTimelines = buildOrder.findAllMatchingTimelines(timelineType=Worker.Peon.name)
+
+        #Worker mines immediately (0 travel time)
+        buildOrder.simulateAction(WorkerMovementAction(0, Trigger(TriggerType.ASAP), WorkerTask.IDLE, WorkerTask.GOLD, Worker.Peon.name, 1, workerTimelines[0].getTimelineID()))
+
+        #1 second in the mine and 3 to walk back, then 7 seconds for each trip after that. Gain gold at 4, 11, 18 seconds, etc.
+        timeSec = 3602
+        expectedGoldAmount = STARTING_GOLD + (((timeSec + 3) / 7) * 10)
+
+        testGoldAmountPrecise(timeSec, expectedGoldAmount, buildOrder, self)
+
     def testOrcGoldMiningTwoWorkers(self):
         buildOrder = BuildOrder(Race.ORC)
         workerTimelines = buildOrder.findAllMatchingTimelines(timelineType=Worker.Peon.name)
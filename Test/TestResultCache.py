@@ -0,0 +1,66 @@
+import unittest
+
+import os
+import json
+import tempfile
+
+from SimEngine.ResultCache import ResultCache, getResultKey, compressTimelines, decompressTimelines
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempDir.cleanup)
+        self.databasePath = os.path.join(self.tempDir.name, "ResultCache.db")
+
+    #Keys only depend on the request's content, not on how its JSON is laid out
+    def testResultKey(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            huntBuildJSON = file.read()
+        teamBuildOrdersList = json.loads(huntBuildJSON)
+        reorderedTeamBuildOrdersList = [{ key : buildOrderDict[key] for key in reversed(list(buildOrderDict)) } for buildOrderDict in teamBuildOrdersList]
+
+        key = getResultKey(teamBuildOrdersList)
+        self.assertEqual(getResultKey(reorderedTeamBuildOrdersList), key)
+        self.assertEqual(getResultKey(teamBuildOrdersList, {}), key)
+        self.assertNotEqual(getResultKey(teamBuildOrdersList, { 'untilSimTime' : 3000 }), key)
+        self.assertNotEqual(getResultKey(teamBuildOrdersList * 2), key)
+
+    def testGetAndPut(self):
+        cache = ResultCache(self.databasePath)
+        compressedTimelines = compressTimelines('[{"currentSimTime":0}]')
+        self.assertEqual(cache.get("request"), None)
+        self.assertTrue(cache.put("request", compressedTimelines))
+        self.assertEqual(decompressTimelines(cache.get("request")), '[{"currentSimTime":0}]')
+
+        #Replacing an entry replaces its size too
+        self.assertTrue(cache.put("request", compressedTimelines))
+        self.assertEqual((cache.getNumEntries(), cache.getTotalSize()), (1, len(compressedTimelines)))
+
+        #Other caches on the same file (like other processes) share the entries, but only with the same engine version
+        self.assertEqual(ResultCache(self.databasePath).get("request"), compressedTimelines)
+        self.assertEqual(ResultCache(self.databasePath, engineVersion = "Next").get("request"), None)
+
+    #The least recently used entries are evicted once the cache is over its max size
+    def testEviction(self):
+        cache = ResultCache(self.databasePath, maxSizeBytes = 1000)
+        self.assertFalse(cache.put("tooBig", bytes(1001)))
+
+        for i in range(4):
+            self.assertTrue(cache.put("request" + str(i), bytes(300)))
+            #Make each entry last used before the next one, and long enough ago that a hit updates it
+            with cache._getConnection() as connection:
+                connection.execute("UPDATE results SET lastUsedTime = ? WHERE requestKey = ?", (i, "request" + str(i)))
+        #The fourth entry took the cache over its max size, so the oldest (the first) was evicted
+        self.assertEqual(cache.get("request0"), None)
+        self.assertEqual((cache.getNumEntries(), cache.getTotalSize()), (3, 900))
+
+        #Using an entry makes it the most recently used
+        self.assertNotEqual(cache.get("request1"), None)
+        self.assertTrue(cache.put("request4", bytes(300)))
+        self.assertEqual(cache.get("request2"), None)
+        for i in [1, 3, 4]:
+            self.assertNotEqual(cache.get("request" + str(i)), None)
+        self.assertEqual(cache.getTotalSize(), 900)
+
+if __name__ == '__main__':
+    unittest.main()
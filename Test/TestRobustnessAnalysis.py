@@ -0,0 +1,92 @@
+import unittest
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from SimEngine.RobustnessAnalysis import analyzeRobustness, getPerturbedRuns, formatTable
+from SimEngine.BuildOrder import BuildOrder, MapStartingPosition
+from SimEngine.SimulationConstants import Race
+from SimEngine.Action import Action
+
+class TestRobustnessAnalysis(unittest.TestCase):
+    def setUp(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            buildOrderDict = json.loads(file.read())[0]
+        self.race = Race[buildOrderDict['race']]
+        self.actionDicts = buildOrderDict['orderedActionList']
+
+    def _withoutElapsedSec(self, analysis):
+        return dict(analysis, elapsedSec = None)
+
+    def testSameSeedSameResults(self):
+        firstAnalysis = analyzeRobustness(self.race, self.actionDicts, 8, seed = 3)
+        self.assertEqual(self._withoutElapsedSec(firstAnalysis), self._withoutElapsedSec(analyzeRobustness(self.race, self.actionDicts, 8, seed = 3)))
+        self.assertNotEqual(firstAnalysis['actions'], analyzeRobustness(self.race, self.actionDicts, 8, seed = 4)['actions'])
+
+    #Without any random changes, every run is the build as planned, and they're all simulated together
+    def testNoChangesMatchesSimulation(self):
+        analysis = analyzeRobustness(self.race, self.actionDicts, 5, seed = 0, travelTimeJitter = 0, maxReactionDelaySec = 0, mineWalkJitterSec = 0)
+        self.assertEqual(analysis['numSucceeded'], 5)
+        self.assertEqual(analysis['numSimulatedActions'], len(self.actionDicts))
+
+        buildOrder = BuildOrder.simulateBuildOrderFromDict({ 'race' : self.race.name, 'orderedActionList' : self.actionDicts })
+        self.assertEqual(set(analysis['endTime'].values()), {buildOrder.getEndTime()})
+        for action, summary in zip(buildOrder.mOrderedActionList, analysis['actions']):
+            self.assertEqual(summary['numRuns'], 5)
+            self.assertEqual(set(summary['startTime'].values()), {action.getStartTime()})
+
+    #Sharing the simulation between runs should give the same results as simulating each run on its own
+    def _checkMatchesIndependentRuns(self, executor):
+        numRuns = 12
+        analysis = analyzeRobustness(self.race, self.actionDicts, numRuns, seed = 7, executor = executor)
+        endTimes = []
+        startTimesByAction = [[] for actionDict in self.actionDicts]
+        for timeToWalkToMineSec, actionDicts in getPerturbedRuns(self.race, self.actionDicts, numRuns, seed = 7):
+            buildOrder = BuildOrder(self.race, MapStartingPosition("Test", 15, 5, timeToWalkToMineSec))
+            if buildOrder.simulateOrderedActionList([Action.getActionFromDict(actionDict) for actionDict in actionDicts]):
+                endTimes.append(buildOrder.getEndTime())
+            for action, startTimes in zip(buildOrder.mOrderedActionList, startTimesByAction):
+                startTimes.append(action.getStartTime())
+
+        self.assertEqual(analysis['numSucceeded'], len(endTimes))
+        self.assertEqual(list(analysis['endTime'].values()), list(np.percentile(endTimes, [5, 25, 50, 75, 95])))
+        for summary, startTimes in zip(analysis['actions'], startTimesByAction):
+            self.assertEqual(summary['numRuns'], len(startTimes))
+            self.assertEqual(list(summary['startTime'].values()), list(np.percentile(startTimes, [5, 25, 50, 75, 95])))
+        return analysis
+
+    def testMatchesIndependentRuns(self):
+        self._checkMatchesIndependentRuns(None)
+
+    def testRunsInWorkerProcesses(self):
+        with ProcessPoolExecutor(max_workers = 2) as executor:
+            analysis = self._checkMatchesIndependentRuns(executor)
+        self.assertEqual(analysis['actions'], self._checkMatchesIndependentRuns(None)['actions'])
+
+    def testMineWalkTimeOnlyChangesForOrcAndHuman(self):
+        self.assertEqual(set(timeToWalkToMineSec for timeToWalkToMineSec, actionDicts in getPerturbedRuns(Race.NIGHT_ELF, self.actionDicts, 10, seed = 1)), {2})
+        orcWalkTimes = [timeToWalkToMineSec for timeToWalkToMineSec, actionDicts in getPerturbedRuns(Race.ORC, [], 10, seed = 1)]
+        self.assertGreater(len(set(orcWalkTimes)), 1)
+        for timeToWalkToMineSec in orcWalkTimes:
+            self.assertTrue(1.5 <= timeToWalkToMineSec <= 2.5)
+
+    #Every run shares the simulation up to the first changed action
+    def testFirstPerturbedActionIndex(self):
+        firstPerturbedActionIndex = 20
+        runs = getPerturbedRuns(self.race, self.actionDicts, 6, seed = 2, firstPerturbedActionIndex = firstPerturbedActionIndex)
+        for timeToWalkToMineSec, actionDicts in runs:
+            self.assertEqual(actionDicts[:firstPerturbedActionIndex], self.actionDicts[:firstPerturbedActionIndex])
+
+        analysis = analyzeRobustness(self.race, self.actionDicts, 6, seed = 2, firstPerturbedActionIndex = firstPerturbedActionIndex)
+        self.assertLessEqual(analysis['numSimulatedActions'], firstPerturbedActionIndex + 6 * (len(self.actionDicts) - firstPerturbedActionIndex))
+        for summary in analysis['actions'][:firstPerturbedActionIndex]:
+            self.assertEqual(len(set(summary['startTime'].values())), 1)
+
+    def testFormatTable(self):
+        analysis = analyzeRobustness(self.race, self.actionDicts, 4, seed = 0, percentiles = [50])
+        lines = formatTable(analysis).split("\n")
+        self.assertEqual(len(lines), len(self.actionDicts) + 1)
+        self.assertEqual(lines[0].split(), ["#", "action", "runs", "start", "p50", "gold", "p50", "lumber", "p50"])
+
+if __name__ == '__main__':
+    unittest.main()
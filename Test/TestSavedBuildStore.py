@@ -0,0 +1,199 @@
+import unittest
+import os
+import tempfile
+import threading
+
+from RestAPI.SavedBuildStore import createSavedBuildStore, computeETag, getBuildSummary, ETagMismatchError, TEMP_FILE_PREFIX, \
+                                    SAVED_BUILD_STORE_SQLITE, SAVED_BUILD_STORE_FLAT_FILE
+
+class TestSavedBuildStore(unittest.TestCase):
+    def setUp(self):
+        #Ignore cleanup errors, since the stores keep their SQLite connections open
+        self.tmpDir = tempfile.TemporaryDirectory(ignore_cleanup_errors = True)
+        with open('Test/TestInput/ValidOrderedActionList.json', 'r') as file:
+            self.buildData = file.read()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    #Run the same checks against every type of store
+    def _checkCreateGetUpdateDelete(self, store):
+        etag = store.createBuild("build", self.buildData)
+        self.assertEqual(etag, computeETag(self.buildData))
+        #Can't create it twice
+        self.assertEqual(store.createBuild("build", "[]"), None)
+
+        self.assertEqual(store.getBuild("build"), (self.buildData, etag))
+        self.assertEqual(store.getETag("build"), etag)
+
+        newETag = store.updateBuild("build", "[]")
+        self.assertNotEqual(newETag, etag)
+        self.assertEqual(store.getBuild("build"), ("[]", newETag))
+        self.assertEqual(store.updateBuild("nonexistent", "[]"), None)
+
+        #Only update if the build hasn't changed since we got the ETag
+        with self.assertRaises(ETagMismatchError):
+            store.updateBuild("build", "[1]", [etag])
+        self.assertEqual(store.getBuild("build"), ("[]", newETag))
+        self.assertEqual(store.updateBuild("build", "[1]", [etag, newETag]), computeETag("[1]"))
+
+        self.assertTrue(store.deleteBuild("build"))
+        self.assertFalse(store.deleteBuild("build"))
+        self.assertEqual(store.getBuild("build"), None)
+        self.assertEqual(store.getETag("build"), None)
+
+    def _checkListBuilds(self, store):
+        for name in ["b2", "a1", "b1", "b3", "c1"]:
+            store.createBuild(name, self.buildData)
+
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds()], ["a1", "b1", "b2", "b3", "c1"])
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds(prefix = "b")], ["b1", "b2", "b3"])
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds(prefix = "b", offset = 1, limit = 1)], ["b2"])
+        self.assertEqual(store.listBuilds(prefix = "d"), [])
+        self.assertEqual(store.getNumBuilds(), 5)
+        self.assertEqual(store.getTotalSize(), 5 * len(self.buildData.encode("utf-8")))
+
+        buildInfo = store.listBuilds(prefix = "a1")[0]
+        self.assertEqual((buildInfo.mRace, buildInfo.mNumActions), getBuildSummary(self.buildData))
+
+    #Many threads, each with their own store (like separate server processes would have), all writing the same builds
+    #Every write should succeed, and the build and its index entry should always agree
+    def _checkConcurrentWrites(self, storeType):
+        createSavedBuildStore(storeType, self.tmpDir.name).createBuild("shared", "[]")
+        errors = []
+
+        def writeBuilds(threadIndex):
+            try:
+                store = createSavedBuildStore(storeType, self.tmpDir.name)
+                store.createBuild("thread" + str(threadIndex), "[]")
+                for i in range(20):
+                    content = "[" + str(threadIndex) + ", " + str(i) + "]"
+                    self.assertEqual(store.updateBuild("shared", content), computeETag(content))
+                    #Only one writer can win when they all expect the same ETag
+                    etag = store.getETag("thread0")
+                    try:
+                        store.updateBuild("thread0", content, [etag])
+                    except ETagMismatchError:
+                        pass
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target = writeBuilds, args = (i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        store = createSavedBuildStore(storeType, self.tmpDir.name)
+        self.assertEqual(store.getNumBuilds(), 9)
+        for buildInfo in store.listBuilds():
+            content, etag = store.getBuild(buildInfo.mName)
+            self.assertEqual(etag, computeETag(content))
+
+    def testSQLiteStore(self):
+        self._checkCreateGetUpdateDelete(createSavedBuildStore(SAVED_BUILD_STORE_SQLITE, os.path.join(self.tmpDir.name, "crud")))
+        self._checkListBuilds(createSavedBuildStore(SAVED_BUILD_STORE_SQLITE, os.path.join(self.tmpDir.name, "list")))
+
+    def testFlatFileStore(self):
+        self._checkCreateGetUpdateDelete(createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, os.path.join(self.tmpDir.name, "crud")))
+        self._checkListBuilds(createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, os.path.join(self.tmpDir.name, "list")))
+
+    def testSQLiteStoreConcurrentWrites(self):
+        self._checkConcurrentWrites(SAVED_BUILD_STORE_SQLITE)
+
+    def testFlatFileStoreConcurrentWrites(self):
+        self._checkConcurrentWrites(SAVED_BUILD_STORE_FLAT_FILE)
+        #Every temp file should have been moved into place
+        self.assertEqual([name for name in os.listdir(os.path.join(self.tmpDir.name, "SavedBuilds")) if name.startswith(TEMP_FILE_PREFIX)], [])
+
+    #Builds already in the flat file directory should be indexed when the store starts up
+    def testFlatFileStoreIndexesExistingFiles(self):
+        storageDir = os.path.join(self.tmpDir.name, "SavedBuilds")
+        os.makedirs(storageDir)
+        with open(os.path.join(storageDir, "existing"), "w") as file:
+            file.write(self.buildData)
+
+        store = createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, self.tmpDir.name)
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds()], ["existing"])
+        self.assertEqual(store.getETag("existing"), computeETag(self.buildData))
+
+        #A file removed while the store wasn't running should be dropped from the index on the next startup
+        os.remove(os.path.join(storageDir, "existing"))
+        store = createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, self.tmpDir.name)
+        self.assertEqual(store.listBuilds(), [])
+
+        #A file added after startup is still found, and indexed once it is
+        with open(os.path.join(storageDir, "added"), "w") as file:
+            file.write("[]")
+        self.assertEqual(store.getBuild("added"), ("[]", computeETag("[]")))
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds()], ["added"])
+
+        #Temp files left behind by a crash mid-write aren't builds
+        with open(os.path.join(storageDir, TEMP_FILE_PREFIX + "added.abc"), "w") as file:
+            file.write("[")
+        store = createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, self.tmpDir.name)
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds()], ["added"])
+
+    #Builds saved by the flat file store should be imported the first time the SQLite store starts, and only then
+    def testSQLiteStoreImportsFlatFileBuilds(self):
+        flatFileStore = createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, self.tmpDir.name)
+        flatFileStore.createBuild("flat", self.buildData)
+        flatFileStore.createBuild("alsoFlat", "[]")
+
+        store = createSavedBuildStore(SAVED_BUILD_STORE_SQLITE, self.tmpDir.name)
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds()], ["alsoFlat", "flat"])
+        self.assertEqual(store.getBuild("flat"), (self.buildData, computeETag(self.buildData)))
+
+        #Deleted builds don't come back the next time it starts
+        self.assertTrue(store.deleteBuild("alsoFlat"))
+        store = createSavedBuildStore(SAVED_BUILD_STORE_SQLITE, self.tmpDir.name)
+        self.assertEqual([buildInfo.mName for buildInfo in store.listBuilds()], ["flat"])
+
+    #Deleting a build removes its lock file, and the lock still works for the name afterwards
+    def testFlatFileStoreRemovesLockFiles(self):
+        store = createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, self.tmpDir.name)
+        lockDir = os.path.join(self.tmpDir.name, "SavedBuildLocks")
+        store.createBuild("build", "[]")
+        self.assertEqual(os.listdir(lockDir), ["build.lock"])
+        self.assertTrue(store.deleteBuild("build"))
+        if os.name != "nt":
+            self.assertEqual(os.listdir(lockDir), [])
+        self.assertEqual(store.createBuild("build", "[]"), computeETag("[]"))
+
+    #Updating a file added to the directory after startup indexes it first, without waiting on the lock the update already holds
+    def testFlatFileStoreUpdateFileAddedAfterStartup(self):
+        store = createSavedBuildStore(SAVED_BUILD_STORE_FLAT_FILE, self.tmpDir.name)
+        with open(os.path.join(self.tmpDir.name, "SavedBuilds", "added"), "w") as file:
+            file.write("[]")
+
+        results = []
+        def update():
+            with self.assertRaises(ETagMismatchError):
+                store.updateBuild("added", self.buildData, expectedETags = {"staleETag"})
+            results.append(store.updateBuild("added", self.buildData, expectedETags = {computeETag("[]")}))
+        updateThread = threading.Thread(target = update, daemon = True)
+        updateThread.start()
+        updateThread.join(10)
+        self.assertFalse(updateThread.is_alive())
+        self.assertEqual(results, [computeETag(self.buildData)])
+        self.assertEqual(store.getBuild("added"), (self.buildData, computeETag(self.buildData)))
+
+    #Simulated timelines are only stored for the current version of a build, and are dropped when it changes
+    def testSimulatedTimelines(self):
+        store = createSavedBuildStore(SAVED_BUILD_STORE_SQLITE, self.tmpDir.name)
+        etag = store.createBuild("build", self.buildData)
+
+        self.assertFalse(store.setSimulatedTimelines("build", "staleETag", "1", b"timelines"))
+        self.assertFalse(store.setSimulatedTimelines("nonexistent", etag, "1", b"timelines"))
+        self.assertTrue(store.setSimulatedTimelines("build", etag, "1", b"timelines"))
+        self.assertEqual(store.getSimulatedTimelines("build", etag, "1"), b"timelines")
+        self.assertEqual(store.getSimulatedTimelines("build", etag, "2"), None)
+
+        newETag = store.updateBuild("build", "[]")
+        self.assertEqual(store.getSimulatedTimelines("build", etag, "1"), None)
+        self.assertEqual(store.getSimulatedTimelines("build", newETag, "1"), None)
+
+    def testBuildSummaryOfInvalidBuild(self):
+        self.assertEqual(getBuildSummary(""), ("", 0))
+        self.assertEqual(getBuildSummary("[]"), ("", 0))
@@ -1,6 +1,8 @@
 import unittest
 
 from SimEngine.SimulationEngine import SimulationEngine
+import SimEngine.JSONEncoding
+import json
 from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
 from SimEngine.Worker import WorkerTask, Worker
 from SimEngine.Trigger import Trigger, TriggerType
@@ -52,6 +54,51 @@ class TestSimulationEngine(unittest.TestCase):
 
         self.assertTrue(simEngine.getJSONStateAsTimelines())
 
+    #Compact JSON should hold exactly the same data as the pretty JSON, whether or not the faster encoder is installed
+    def testGetCompactJSONStateAsTimelines(self):
+        simEngine = SimulationEngine() 
+
+        simulateBasicElfBuildOrder(simEngine)
+
+        prettyJSON = simEngine.getJSONStateAsTimelines()
+        compactJSON = simEngine.getJSONStateAsTimelines(pretty = False)
+        self.assertNotIn("\n", compactJSON)
+        self.assertNotIn('": ', compactJSON)
+        self.assertEqual(json.loads(compactJSON), json.loads(prettyJSON))
+
+        orjson = SimEngine.JSONEncoding.orjson
+        SimEngine.JSONEncoding.orjson = None
+        try:
+            self.assertEqual(simEngine.getJSONStateAsTimelines(pretty = False), compactJSON)
+        finally:
+            SimEngine.JSONEncoding.orjson = orjson
+
+    #The json module and orjson should give exactly the same compact JSON, so ETags don't depend on which one is installed
+    def testCompactJSONIsTheSameWithEitherEncoder(self):
+        obj = [{ 'name' : "Ancient of War – Héros", 'timelineIDs' : { 1 : "Wisp", 2 : ["🌳", None, True, 1.5] } }]
+        orjsonOutput = SimEngine.JSONEncoding.encodeJSON(obj, False)
+
+        orjson = SimEngine.JSONEncoding.orjson
+        SimEngine.JSONEncoding.orjson = None
+        try:
+            jsonOutput = SimEngine.JSONEncoding.encodeJSON(obj, False)
+        finally:
+            SimEngine.JSONEncoding.orjson = orjson
+        self.assertEqual(jsonOutput, '[{"name":"Ancient of War – Héros","timelineIDs":{"1":"Wisp","2":["🌳",null,true,1.5]}}]')
+        self.assertEqual(orjsonOutput, jsonOutput)
+
+    #Streamed JSON should be exactly the compact JSON, however small the chunks are
+    def testIterJSONStateAsTimelines(self):
+        simEngine = SimulationEngine() 
+
+        simulateBasicElfBuildOrder(simEngine)
+
+        compactJSON = simEngine.getJSONStateAsTimelines(pretty = False)
+        self.assertEqual("".join(simEngine.iterJSONStateAsTimelines()), compactJSON)
+        chunks = list(simEngine.iterJSONStateAsTimelines(chunkSize = 100))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), compactJSON)
+
     def testLoadStateFromJSON(self):
         simEngine = SimulationEngine() 
 
@@ -68,3 +115,12 @@ class TestSimulationEngine(unittest.TestCase):
 
         self.assertEqual(originalJSONActionList, simEngine2.getJSONStateAsActionLists()) 
         self.assertEqual(originalJSONTimelines, simEngine2.getJSONStateAsTimelines()) 
+
+    def testLoadStateWithUnknownActionType(self):
+        simEngine = SimulationEngine()
+        simulateBasicElfBuildOrder(simEngine)
+        actionLists = json.loads(simEngine.getJSONStateAsActionLists())
+        actionLists[0]['orderedActionList'][0]['actionType'] = "LaunchNukeAction"
+
+        with self.assertRaises(KeyError):
+            SimulationEngine().loadStateFromActionLists(actionLists)
@@ -0,0 +1,97 @@
+import unittest
+import json
+import time
+
+from RestAPI.SimulationSession import SimulationSession, SimulationSessionManager, SESSION_CHECKPOINT_INTERVAL
+from SimEngine.SimulationEngine import SimulationEngine
+
+class TestSimulationSession(unittest.TestCase):
+    def setUp(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            self.teamBuildOrdersList = json.loads(file.read())
+
+    #A session's timelines should always match simulating its actions from scratch
+    def _checkMatchesFullSimulation(self, session):
+        teamBuildOrdersList = [{ 'race' : race.name, 'orderedActionList' : actionDicts } for race, actionDicts in zip(session.mRaces, session.mActionDictLists)]
+        simEngine = SimulationEngine()
+        simEngine.loadStateFromActionLists(teamBuildOrdersList)
+        self.assertEqual(session.getSimEngine().getJSONStateAsTimelines(), simEngine.getJSONStateAsTimelines())
+
+    def testAppendInsertDelete(self):
+        actionDicts = self.teamBuildOrdersList[0]['orderedActionList']
+        self.teamBuildOrdersList[0]['orderedActionList'] = actionDicts[:-2]
+        session = SimulationSession("session", self.teamBuildOrdersList)
+        self._checkMatchesFullSimulation(session)
+
+        session.applyEdit({ 'op' : 'append', 'action' : actionDicts[-1] })
+        self._checkMatchesFullSimulation(session)
+
+        session.applyEdit({ 'op' : 'insert', 'actionIndex' : len(actionDicts) - 2, 'action' : actionDicts[-2] })
+        self.assertEqual(session.mActionDictLists[0], actionDicts)
+        self._checkMatchesFullSimulation(session)
+
+        session.applyEdit({ 'op' : 'delete', 'actionIndex' : 5 })
+        self.assertEqual(session.getNumActions(), len(actionDicts) - 1)
+        self._checkMatchesFullSimulation(session)
+
+    #Edits re-simulate from the nearest checkpoint before them, and drop the checkpoints after them
+    def testEditsUseCheckpoints(self):
+        session = SimulationSession("session", self.teamBuildOrdersList)
+        actionDicts = self.teamBuildOrdersList[0]['orderedActionList']
+        getCheckpointSizes = lambda: [numActions for numActions, buildOrder in session.mCheckpoints[0]]
+        allCheckpointSizes = [SESSION_CHECKPOINT_INTERVAL * (i + 1) for i in range(len(actionDicts) // SESSION_CHECKPOINT_INTERVAL)]
+        self.assertEqual(getCheckpointSizes(), allCheckpointSizes)
+
+        #The checkpoints before the edit are kept as they were
+        editIndex = 2 * SESSION_CHECKPOINT_INTERVAL + 1
+        checkpointsBeforeEdit = session.mCheckpoints[0][:2]
+        session.applyEdit({ 'op' : 'delete', 'actionIndex' : editIndex })
+        self.assertEqual(session.mCheckpoints[0][:2], checkpointsBeforeEdit)
+        self._checkMatchesFullSimulation(session)
+
+        session.applyEdit({ 'op' : 'insert', 'actionIndex' : editIndex, 'action' : actionDicts[editIndex] })
+        self.assertEqual(session.mActionDictLists[0], actionDicts)
+        self.assertEqual(getCheckpointSizes(), allCheckpointSizes)
+        self._checkMatchesFullSimulation(session)
+
+    def testInvalidEdits(self):
+        session = SimulationSession("session", self.teamBuildOrdersList)
+        numActions = session.getNumActions()
+
+        with self.assertRaises(IndexError):
+            session.applyEdit({ 'op' : 'delete', 'actionIndex' : numActions })
+        with self.assertRaises(IndexError):
+            session.applyEdit({ 'op' : 'append', 'buildOrderIndex' : 1, 'action' : {} })
+        with self.assertRaises(ValueError):
+            session.applyEdit({ 'op' : 'move' })
+        with self.assertRaises(KeyError):
+            session.applyEdit({ 'op' : 'append', 'action' : {} })
+        #Nothing should have changed
+        self.assertEqual(session.getNumActions(), numActions)
+        self._checkMatchesFullSimulation(session)
+
+    #Least recently used sessions are dropped once there are too many sessions or actions
+    def testManagerDropsLeastRecentlyUsed(self):
+        numActions = len(self.teamBuildOrdersList[0]['orderedActionList'])
+        manager = SimulationSessionManager(maxSessions = 2, maxTotalActions = numActions * 10, idleTimeoutSec = 60)
+        session1 = manager.createSession(self.teamBuildOrdersList)
+        session2 = manager.createSession(self.teamBuildOrdersList)
+        #Using session 1 means session 2 is now least recently used
+        self.assertEqual(manager.getSession(session1.mSessionID), session1)
+        session3 = manager.createSession(self.teamBuildOrdersList)
+        self.assertEqual(manager.getNumSessions(), 2)
+        self.assertEqual(manager.getSession(session2.mSessionID), None)
+
+        manager.mMaxTotalActions = numActions
+        self.assertEqual(manager.getSession(session1.mSessionID), session1)
+        self.assertEqual(manager.getSession(session3.mSessionID), None)
+
+        self.assertTrue(manager.deleteSession(session1.mSessionID))
+        self.assertFalse(manager.deleteSession(session1.mSessionID))
+
+    def testManagerDropsIdleSessions(self):
+        manager = SimulationSessionManager(maxSessions = 10, maxTotalActions = 10000, idleTimeoutSec = 60)
+        session = manager.createSession(self.teamBuildOrdersList)
+        session.mLastAccessTime = time.monotonic() - 61
+        self.assertEqual(manager.getSession(session.mSessionID), None)
+        self.assertEqual(manager.getNumSessions(), 0)
@@ -0,0 +1,70 @@
+import unittest
+import json
+
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationStats import SimulationStats
+from SimEngine.SimulationConstants import Race
+from SimEngine.Trigger import TriggerType
+
+class TestSimulationStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            cls.huntBuildOrderDict = json.loads(file.read())[0]
+
+    def testNotCollectedByDefault(self):
+        self.assertEqual(BuildOrder(Race.NIGHT_ELF).getStats(), None)
+        self.assertEqual(BuildOrder.simulateBuildOrderFromDict(self.huntBuildOrderDict).getStats(), None)
+
+    def testCountsMatchEventsExecuted(self):
+        buildOrder = BuildOrder.simulateBuildOrderFromDict(self.huntBuildOrderDict, collectStats = True)
+        stats = buildOrder.getStats()
+        eventsExecutedInOrder = buildOrder.mEventHandler.mEventsExecutedInOrder
+
+        self.assertEqual(stats.mEventsExecuted, sum(1 for eventID in eventsExecutedInOrder if not eventID.startswith('R')))
+        self.assertEqual(stats.mEventsReversed, sum(1 for eventID in eventsExecutedInOrder if eventID.startswith('R')))
+        self.assertGreater(stats.mEventsReversed, 0)
+        self.assertGreater(stats.mTicksReversed, 0)
+        self.assertGreater(stats.mEventsRecurred, 0)
+        self.assertGreater(stats.mEmptyTicks, 0)
+        self.assertGreater(stats.mTicksAdvanced, stats.mEmptyTicks)
+        self.assertGreaterEqual(stats.mDelaySpawnedEvents, stats.mEventsDelayed)
+
+        self.assertEqual(sum(stats.mActionsByTriggerType.values()), len(self.huntBuildOrderDict['orderedActionList']))
+        self.assertEqual(stats.mActionsByTriggerType.keys(), stats.mSimulateActionSecByTriggerType.keys())
+        for triggerTypeName in stats.mActionsByTriggerType:
+            self.assertIn(triggerTypeName, TriggerType.__members__)
+
+    #Collecting stats shouldn't change what's simulated
+    def testSameResultsWithStats(self):
+        buildOrder = BuildOrder.simulateBuildOrderFromDict(self.huntBuildOrderDict)
+        buildOrderWithStats = BuildOrder.simulateBuildOrderFromDict(self.huntBuildOrderDict, collectStats = True)
+        self.assertEqual(buildOrderWithStats.getSimTimeAndTimelinesAsDictForSerialization(), buildOrder.getSimTimeAndTimelinesAsDictForSerialization())
+        self.assertEqual(buildOrderWithStats.mEventHandler.mEventsExecutedInOrder, buildOrder.mEventHandler.mEventsExecutedInOrder)
+
+    def testMerge(self):
+        stats = SimulationStats()
+        stats.mEventsExecuted = 3
+        stats.addTick(True)
+        stats.addAction(TriggerType.ASAP, 1.5)
+        otherStats = SimulationStats()
+        otherStats.mEventsExecuted = 4
+        otherStats.addTick(False)
+        otherStats.addAction(TriggerType.ASAP, 0.5)
+        otherStats.addAction(TriggerType.GOLD_AMOUNT, 1)
+
+        stats.merge(otherStats)
+        self.assertEqual(stats.mEventsExecuted, 7)
+        self.assertEqual(stats.mTicksAdvanced, 2)
+        self.assertEqual(stats.mEmptyTicks, 1)
+        self.assertEqual(stats.mActionsByTriggerType, { 'ASAP' : 2, 'GOLD_AMOUNT' : 1 })
+        self.assertEqual(stats.mSimulateActionSecByTriggerType, { 'ASAP' : 2, 'GOLD_AMOUNT' : 1 })
+
+        statsDict = stats.getAsDictForSerialization()
+        self.assertEqual(statsDict['eventsExecuted'], 7)
+        self.assertEqual(statsDict['actionsByTriggerType'], { 'ASAP' : 2, 'GOLD_AMOUNT' : 1 })
+        #Should be encodable as JSON
+        json.dumps(statsDict)
+
+if __name__ == '__main__':
+    unittest.main()
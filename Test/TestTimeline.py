@@ -4,6 +4,7 @@ from SimEngine.Timeline import Timeline
 from SimEngine.Action import Action
 from SimEngine.Worker import Worker
 from SimEngine.Trigger import Trigger, TriggerType
+from SimEngine.TimelineFilter import TimelineFilter
 
 class TestTimeline(unittest.TestCase):
     def testAddAction(self):
@@ -182,3 +183,48 @@ class TestTimeline(unittest.TestCase):
 
         prevAction = timeline.getPrevAction(0)
         self.assertEqual(None, prevAction)
+
+    #Only actions that overlap the filter's simtime window should be serialized
+    def testGetAsDictForSerializationWithTimeWindow(self):
+        timeline = Timeline(timelineType=Worker.Wisp.name, timelineID=0, eventHandler=None)
+
+        #Actions at 0-10, 20-30, 40-50 and one at 60 with no duration (lasts until the next action)
+        for actionID, startTime, duration in [(1, 0, 10), (2, 20, 10), (3, 40, 10), (4, 60, None)]:
+            action = Action(actionID=actionID, name="", goldCost=0, lumberCost=0, trigger=Trigger(TriggerType.ASAP), travelTime=0, duration=duration, requiredTimelineType=Worker.Wisp.name)
+            action.setStartTime(startTime)
+            self.assertEqual(timeline.addAction(action), True)
+
+        def getActionIDs(timelineFilter):
+            return [actionDict['actionID'] for actionDict in timeline.getAsDictForSerialization(timelineFilter)['actions']]
+
+        self.assertEqual(getActionIDs(None), [1, 2, 3, 4])
+        self.assertEqual(getActionIDs(TimelineFilter()), [1, 2, 3, 4])
+        #Action 2 is still going at 25, but action 1 is already done
+        self.assertEqual(getActionIDs(TimelineFilter(startTime=25, endTime=45)), [2, 3])
+        #End of the window is exclusive
+        self.assertEqual(getActionIDs(TimelineFilter(startTime=10, endTime=40)), [2])
+        self.assertEqual(getActionIDs(TimelineFilter(startTime=12, endTime=18)), [])
+        #Action with no duration is still going
+        self.assertEqual(getActionIDs(TimelineFilter(startTime=1000)), [4])
+        self.assertEqual(getActionIDs(TimelineFilter(endTime=20)), [1])
+
+    #The version tag should only change when the timeline's serialized content changes
+    def testVersionTag(self):
+        timeline = Timeline(timelineType=Worker.Wisp.name, timelineID=0, eventHandler=None)
+        otherTimeline = Timeline(timelineType=Worker.Wisp.name, timelineID=1, eventHandler=None)
+        emptyVersionTag = timeline.getVersionTag()
+        self.assertEqual(otherTimeline.getVersionTag(), emptyVersionTag)
+
+        action = Action(actionID=1, name="", goldCost=0, lumberCost=0, trigger=Trigger(TriggerType.ASAP), travelTime=0, duration=10, requiredTimelineType=Worker.Wisp.name)
+        action.setStartTime(0)
+        timeline.addAction(action)
+        self.assertEqual(timeline.mVersion, 1)
+        self.assertNotEqual(timeline.getVersionTag(), emptyVersionTag)
+
+        #Same actions in a separate timeline (like from a separate simulation) gives the same tag
+        otherTimeline.addAction(action)
+        self.assertEqual(otherTimeline.getVersionTag(), timeline.getVersionTag())
+
+        timeline.removeAction(1)
+        self.assertEqual(timeline.mVersion, 2)
+        self.assertEqual(timeline.getVersionTag(), emptyVersionTag)
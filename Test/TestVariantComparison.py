@@ -0,0 +1,56 @@
+import unittest
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from SimEngine.VariantComparison import compareVariants
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationConstants import Race
+
+class TestVariantComparison(unittest.TestCase):
+    def setUp(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            buildOrderDict = json.loads(file.read())[0]
+        self.race = Race[buildOrderDict['race']]
+        self.actionDicts = buildOrderDict['orderedActionList']
+
+    #Each variant should come out the same as simulating the shared actions and the variant's actions from scratch
+    def _checkCompareVariants(self, executor):
+        numSharedActions = len(self.actionDicts) - 3
+        prefixActionDicts = self.actionDicts[:numSharedActions]
+        variantActionDictLists = [self.actionDicts[numSharedActions:], self.actionDicts[numSharedActions:-1], []]
+        summaryActionIndexes = [numSharedActions - 1, len(self.actionDicts) - 1]
+
+        comparison = compareVariants(self.race, prefixActionDicts, variantActionDictLists, summaryActionIndexes, executor)
+        self.assertEqual(comparison['numSharedActions'], numSharedActions)
+        self.assertEqual(len(comparison['variants']), len(variantActionDictLists))
+
+        for variantActionDicts, variantResult in zip(variantActionDictLists, comparison['variants']):
+            buildOrder = BuildOrder.simulateBuildOrderFromDict({ 'race' : self.race.name, 'orderedActionList' : prefixActionDicts + variantActionDicts })
+            self.assertTrue(variantResult['simulationSucceeded'])
+            self.assertEqual(variantResult['timelines'], buildOrder.getSimTimeAndTimelinesAsDictForSerialization())
+            self.assertEqual(variantResult['endTime'], buildOrder.getEndTime())
+
+        #Only the full variant reaches the last summary action
+        fullVariant, shorterVariant, emptyVariant = comparison['variants']
+        self.assertEqual([summary['actionIndex'] for summary in fullVariant['resourcesAtActions']], summaryActionIndexes)
+        self.assertEqual([summary['actionIndex'] for summary in emptyVariant['resourcesAtActions']], summaryActionIndexes[:1])
+        noResourcesDiff = { 'currentGold' : 0, 'currentLumber' : 0, 'currentFood' : 0, 'currentFoodMax' : 0 }
+        self.assertEqual(fullVariant['diffFromFirstVariant'], { 'endTime' : 0, 'resourcesAtActions' : [
+            { 'actionIndex' : actionIndex, 'simTime' : 0, 'resources' : noResourcesDiff } for actionIndex in summaryActionIndexes
+        ] })
+        self.assertEqual(shorterVariant['diffFromFirstVariant']['endTime'], shorterVariant['endTime'] - fullVariant['endTime'])
+        self.assertEqual(len(emptyVariant['diffFromFirstVariant']['resourcesAtActions']), 1)
+
+    def testCompareVariants(self):
+        self._checkCompareVariants(None)
+
+    def testCompareVariantsInWorkerProcesses(self):
+        with ProcessPoolExecutor(max_workers = 2) as executor:
+            self._checkCompareVariants(executor)
+
+    #If the shared actions fail, none of the variants are simulated any further
+    def testCompareVariantsWithFailedPrefix(self):
+        #A later action depends on this one
+        prefixActionDicts = self.actionDicts[:5] + self.actionDicts[6:-1]
+        comparison = compareVariants(self.race, prefixActionDicts, [self.actionDicts[-1:]])
+        self.assertFalse(comparison['variants'][0]['simulationSucceeded'])
@@ -0,0 +1,33 @@
+import unittest
+
+import sys
+import json
+import subprocess
+
+from SimEngine.WorkerPool import createProcessPoolExecutor
+
+#Modules that are slow to import, and shouldn't be imported along with the engine
+SLOW_IMPORT_MODULES = ["flask", "jsonschema", "orjson", "pydoc", "multiprocessing", "numpy"]
+
+#Get which of the slow modules a new interpreter has imported after importing a module
+def _getSlowModulesImportedBy(moduleName):
+    code = "import sys, json, " + moduleName + "; print(json.dumps([name for name in " + json.dumps(SLOW_IMPORT_MODULES) + " if name in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True)
+    return json.loads(result.stdout)
+
+def _getLoadedModules(moduleNames):
+    return [name for name in moduleNames if name in sys.modules]
+
+class TestWorkerPool(unittest.TestCase):
+    def testEngineImportsAreLean(self):
+        for moduleName in ["SimEngine.BuildOrder", "SimEngine.SimulationEngine", "main"]:
+            self.assertEqual(_getSlowModulesImportedBy(moduleName), [], moduleName)
+
+    #Workers should be forked with the engine already imported
+    def testWorkersHaveEngineImported(self):
+        with createProcessPoolExecutor(2) as executor:
+            loadedModules = list(executor.map(_getLoadedModules, [["SimEngine.BuildOrder", "SimEngine.SimulationEngine"]] * 2))
+        self.assertEqual(loadedModules, [["SimEngine.BuildOrder", "SimEngine.SimulationEngine"]] * 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import json
+import numpy as np
+
+from SimEngine.WorkerSplitOptimizer import WorkerSplitOptimizer
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
+
+class TestWorkerSplitOptimizer(unittest.TestCase):
+    def setUp(self):
+        with open('Test/TestInput/HuntBuildSimulationInput.json', 'r') as file:
+            self.actionDicts = json.loads(file.read())[0]['orderedActionList']
+
+    def testEnumerateSchedules(self):
+        optimizer = WorkerSplitOptimizer(Race.NIGHT_ELF, self.actionDicts)
+        self.assertEqual(optimizer.enumerateSchedules(2).tolist(), [[0, 0], [1, 0], [0, 1], [1, 1]])
+        with self.assertRaises(ValueError):
+            optimizer.enumerateSchedules(17)
+
+    #Check the projection against income worked out by hand
+    def testScoreSchedules(self):
+        optimizer = WorkerSplitOptimizer(Race.NIGHT_ELF, [])
+        #Wisps mine 10 gold every 5 seconds, and get 5 lumber every 8 seconds
+        optimizer.mGoldNeeded = 200
+        optimizer.mLumberNeeded = 50
+        #Two wisps arriving at 0 and 10 seconds: both on gold, split, and both on lumber
+        scores = optimizer.scoreSchedules(np.array([[1, 1], [1, 0], [0, 0]]), [0, 10 * SECONDS_TO_SIMTIME], [])
+        #Both on gold: 20 gold in the first 10 seconds, then 4 gold a second for the other 180. No lumber ever
+        self.assertEqual(scores[0], np.inf)
+        #Split: 2 gold a second takes 100 seconds. 50 lumber at 5 / 8 a second takes 80 seconds after arriving at 10 seconds
+        self.assertAlmostEqual(scores[1], 100 * SECONDS_TO_SIMTIME)
+        self.assertEqual(scores[2], np.inf)
+
+        #Nothing needed, so affordable right away
+        optimizer.mGoldNeeded = 0
+        optimizer.mLumberNeeded = 0
+        self.assertEqual(optimizer.scoreSchedules(np.array([[1, 1]]), [0, 10 * SECONDS_TO_SIMTIME], []).tolist(), [0])
+
+    #Too many Night Elf workers can't go in the mine
+    def testScoreSchedulesFullMine(self):
+        optimizer = WorkerSplitOptimizer(Race.NIGHT_ELF, [])
+        scores = optimizer.scoreSchedules(np.ones((1, 6)), [0] * 6, [])
+        self.assertEqual(scores[0], np.inf)
+
+    #The best confirmed split should simulate to what it reports, and be no later than the build's own split
+    def testOptimize(self):
+        optimizer = WorkerSplitOptimizer(Race.NIGHT_ELF, self.actionDicts)
+        result = optimizer.optimize()
+        self.assertEqual(result['numSchedulesScored'], 2 ** len(optimizer.getAssignableMovementIndexes()))
+        self.assertGreater(len(result['confirmedSchedules']), 0)
+
+        originalEndTime = BuildOrder.simulateBuildOrderFromDict({ 'race' : Race.NIGHT_ELF.name, 'orderedActionList' : self.actionDicts }).getEndTime()
+        self.assertLessEqual(result['endTime'], originalEndTime)
+        optimizedEndTime = BuildOrder.simulateBuildOrderFromDict({ 'race' : Race.NIGHT_ELF.name, 'orderedActionList' : result['orderedActionList'] }).getEndTime()
+        self.assertEqual(optimizedEndTime, result['endTime'])
+
+    def testOptimizeFailedBuild(self):
+        with self.assertRaises(ValueError):
+            WorkerSplitOptimizer(Race.NIGHT_ELF, self.actionDicts[:5] + self.actionDicts[6:]).optimize()
@@ -0,0 +1,163 @@
+from bench.Workloads import WORKLOADS, getWorkload
+
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tracemalloc
+
+#Runs the benchmark workloads, and compares the results to a saved baseline so slowdowns show up before they get to production
+#Run from the main directory:
+#py -m bench.BenchmarkRunner                    Run every workload and compare to the baseline
+#py -m bench.BenchmarkRunner --save-baseline    Run every workload and save the results as the new baseline
+#py -m bench.BenchmarkRunner --workloads hunt_build,team_game_4v4 --threshold 0.1
+
+DEFAULT_BASELINE_FILE = 'bench/Baselines/baseline.json'
+
+#A metric has regressed if it's more than this fraction above the baseline
+DEFAULT_REGRESSION_THRESHOLD = 0.25
+
+DEFAULT_NUM_REPEATS = 5
+
+#Metrics compared to the baseline. Lower is better for all of them
+BENCHMARK_METRICS = ['wallTimeSec', 'eventsExecuted', 'peakMemoryBytes']
+
+#Describes the machine results were recorded on. Times from different machines can't really be compared
+def getMachineInfo():
+    return {
+        'platform' : platform.platform(),
+        'processor' : platform.processor() or platform.machine(),
+        'python' : platform.python_version()
+    }
+
+#Run a workload and measure it
+#The wall time is the median of the repeats, after a warm up run. Peak memory is measured in a separate run, since tracing
+#allocations slows everything down
+#@return { "wallTimeSec", "wallTimeSecMin", "eventsExecuted", "peakMemoryBytes" }
+def runWorkload(workload, numRepeats = DEFAULT_NUM_REPEATS):
+    eventsExecuted = workload.run()
+
+    wallTimesSec = []
+    for i in range(numRepeats):
+        startTime = time.perf_counter()
+        workload.run()
+        wallTimesSec.append(time.perf_counter() - startTime)
+
+    tracemalloc.start()
+    try:
+        workload.run()
+        currentBytes, peakMemoryBytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wallTimeSec' : statistics.median(wallTimesSec),
+        'wallTimeSecMin' : min(wallTimesSec),
+        'eventsExecuted' : eventsExecuted,
+        'peakMemoryBytes' : peakMemoryBytes
+    }
+
+#Get the metrics of the results that are more than the threshold above the baseline
+#Workloads or metrics missing from either side are skipped
+#@return List of { "workload", "metric", "baseline", "current", "change" : <fraction above the baseline> }
+def findRegressions(baselineResults, currentResults, threshold = DEFAULT_REGRESSION_THRESHOLD):
+    regressions = []
+    for workloadName, currentMetrics in currentResults.items():
+        baselineMetrics = baselineResults.get(workloadName)
+        if baselineMetrics == None:
+            continue
+        for metric in BENCHMARK_METRICS:
+            baselineValue = baselineMetrics.get(metric)
+            currentValue = currentMetrics.get(metric)
+            if baselineValue == None or currentValue == None or baselineValue <= 0:
+                continue
+            change = (currentValue - baselineValue) / baselineValue
+            if change > threshold:
+                regressions.append({ 'workload' : workloadName, 'metric' : metric, 'baseline' : baselineValue, 'current' : currentValue, 'change' : change })
+    return regressions
+
+def loadBaseline(baselineFile):
+    try:
+        with open(baselineFile, 'r') as file:
+            return json.loads(file.read())
+    except FileNotFoundError:
+        return None
+
+def saveBaseline(baselineFile, results):
+    with open(baselineFile, 'w') as file:
+        file.write(json.dumps({ 'machine' : getMachineInfo(), 'workloads' : results }, indent = 4, sort_keys = True) + "\n")
+
+#Format results as a table, with a line for each workload, and how much each metric changed from the baseline
+def formatResults(results, baselineResults):
+    def formatChange(workloadName, metric):
+        baselineValue = baselineResults.get(workloadName, {}).get(metric)
+        currentValue = results[workloadName].get(metric)
+        if baselineValue == None or currentValue == None or baselineValue == 0:
+            return ""
+        return "({:+.0%})".format((currentValue - baselineValue) / baselineValue)
+
+    header = ["workload", "wall ms", "", "events", "", "peak KiB", ""]
+    lines = [header]
+    for workloadName, metrics in results.items():
+        lines.append([workloadName,
+                      "{:.2f}".format(metrics['wallTimeSec'] * 1000), formatChange(workloadName, 'wallTimeSec'),
+                      str(metrics['eventsExecuted']) if metrics['eventsExecuted'] != None else "-", formatChange(workloadName, 'eventsExecuted'),
+                      "{:.0f}".format(metrics['peakMemoryBytes'] / 1024), formatChange(workloadName, 'peakMemoryBytes')])
+
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join(" ".join([line[0].ljust(widths[0])] + [cell.rjust(width) for cell, width in zip(line[1:], widths[1:])]) for line in lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run the simulation engine benchmarks and compare them to a baseline")
+    parser.add_argument("--workloads", help = "Comma-separated names of the workloads to run (default all): " + ", ".join(workload.mName for workload in WORKLOADS))
+    parser.add_argument("--repeat", type = int, default = DEFAULT_NUM_REPEATS, help = "Number of timed runs of each workload")
+    parser.add_argument("--baseline", default = DEFAULT_BASELINE_FILE, help = "Baseline JSON file")
+    parser.add_argument("--save-baseline", action = "store_true", help = "Save the results as the new baseline instead of comparing to it")
+    parser.add_argument("--threshold", type = float, default = DEFAULT_REGRESSION_THRESHOLD, help = "Fraction above the baseline that counts as a regression")
+    parser.add_argument("--output", help = "Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    workloads = WORKLOADS
+    if args.workloads:
+        workloads = []
+        for name in args.workloads.split(','):
+            workload = getWorkload(name)
+            if workload == None:
+                parser.error("Unknown workload: " + name)
+            workloads.append(workload)
+
+    results = {}
+    for workload in workloads:
+        results[workload.mName] = runWorkload(workload, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(json.dumps({ 'machine' : getMachineInfo(), 'workloads' : results }, indent = 4, sort_keys = True) + "\n")
+
+    if args.save_baseline:
+        #Keep the baseline of any workloads that weren't run this time
+        baseline = loadBaseline(args.baseline)
+        baselineResults = baseline['workloads'] if baseline != None else {}
+        baselineResults.update(results)
+        saveBaseline(args.baseline, baselineResults)
+        print(formatResults(results, {}))
+        print("Saved baseline to " + args.baseline)
+        sys.exit(0)
+
+    baseline = loadBaseline(args.baseline)
+    if baseline == None:
+        print(formatResults(results, {}))
+        print("No baseline at " + args.baseline + ". Run with --save-baseline to make one")
+        sys.exit(0)
+
+    print(formatResults(results, baseline['workloads']))
+    if baseline.get('machine') != getMachineInfo():
+        print("Warning: the baseline was recorded on a different machine (" + json.dumps(baseline.get('machine')) + "), so times may not be comparable")
+
+    regressions = findRegressions(baseline['workloads'], results, args.threshold)
+    for regression in regressions:
+        print("REGRESSION: " + regression['workload'] + " " + regression['metric'] + " went from " + str(regression['baseline']) + " to " +
+              str(regression['current']) + " ({:+.0%})".format(regression['change']))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,223 @@
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME, STARTING_FOOD, STARTING_FOOD_MAX_MAP, STARTING_LUMBER
+
+import sys
+import json
+import random
+import argparse
+
+#Generates large, random (but seeded) build orders, for stress and scaling tests of the engine
+#The builds follow OrderedActionListSchema.json, and are put together like a real build would be: workers trained and sent to gather,
+#food and production buildings built as they're needed, units trained from the production buildings, and items bought to use up
+#gold when there's nothing else to spend it on
+#Run from the main directory to print a generated build:
+#py -m bench.BuildGenerator --race NIGHT_ELF --seed 1 --actions 500 --workers 120 --productionBuildings 20 --durationSec 3600
+
+#Per race: the worker, the main hall that trains it, the food building, the production building and the units it trains
+#Costs are (gold, lumber, food, duration in simtime). Food buildings have (gold, lumber, food provided, duration)
+RACE_BUILD_SPECS = {
+    Race.NIGHT_ELF : {
+        'worker' : ("Wisp", 60, 0, 1, 140), 'hall' : "Tree of Life",
+        'foodBuilding' : ("Moon Well", 180, 40, 10, 500),
+        'productionBuilding' : ("Ancient of War", 150, 60, 0, 600),
+        'units' : [("Archer", 130, 10, 2, 200), ("Huntress", 195, 20, 3, 300)]
+    },
+    Race.ORC : {
+        'worker' : ("Peon", 75, 0, 1, 150), 'hall' : "Great Hall",
+        'foodBuilding' : ("Orc Burrow", 160, 40, 10, 500),
+        'productionBuilding' : ("Barracks", 180, 50, 0, 600),
+        'units' : [("Grunt", 200, 0, 3, 300), ("Troll Headhunter", 135, 20, 2, 200)]
+    },
+    Race.HUMAN : {
+        'worker' : ("Peasant", 75, 0, 1, 150), 'hall' : "Town Hall",
+        'foodBuilding' : ("Farm", 80, 20, 6, 350),
+        'productionBuilding' : ("Barracks", 160, 60, 0, 600),
+        'units' : [("Footman", 135, 0, 2, 200), ("Rifleman", 205, 30, 3, 260)]
+    },
+    Race.UNDEAD : {
+        'worker' : ("Acolyte", 75, 0, 1, 150), 'hall' : "Necropolis",
+        'foodBuilding' : ("Ziggurat", 150, 50, 10, 350),
+        'productionBuilding' : ("Crypt", 200, 50, 0, 600),
+        'units' : [("Ghoul", 120, 0, 2, 180), ("Crypt Fiend", 215, 40, 4, 300)]
+    }
+}
+
+#Items bought from the Goblin Merchant, which every race can use. (name, gold cost)
+SHOP_ITEMS = [("Potion of Healing", 150), ("Potion of Mana", 200), ("Scroll of Town Portal", 350)]
+SHOP_TIMELINE_TYPE = "Goblin Merchant"
+
+#Races whose workers the engine can simulate gathering lumber for. The rest only ever have their starting lumber
+LUMBER_GATHERING_RACES = [Race.NIGHT_ELF]
+
+#Max workers gathering gold at once, and the gold each of them gathers per second
+MAX_GOLD_WORKERS = 5
+GOLD_PER_WORKER_PER_SEC = 2
+
+NUM_STARTING_WORKERS = 5
+
+class _BuildGeneratorState:
+    def __init__(self, race, rng):
+        self.mRace = race
+        self.mSpec = RACE_BUILD_SPECS[race]
+        self.mRng = rng
+        self.mActionDicts = []
+        self.mNumWorkers = NUM_STARTING_WORKERS
+        self.mNumGoldWorkers = 0
+        self.mNumLumberWorkers = 0
+        self.mNumProductionBuildings = 0
+        self.mFoodUsed = STARTING_FOOD
+        self.mFoodMax = STARTING_FOOD_MAX_MAP[race]
+        self.mLumberSpent = 0
+        self.mGoldSpent = 0
+
+    def _addActionDict(self, actionType, trigger, requiredTimelineType, **fields):
+        actionDict = { 'actionType' : actionType, 'trigger' : trigger, 'actionID' : len(self.mActionDicts), 'requiredTimelineType' : requiredTimelineType, 'startTime' : None }
+        actionDict.update(fields)
+        self.mActionDicts.append(actionDict)
+        self.mGoldSpent += fields.get('goldCost', 0)
+        self.mLumberSpent += fields.get('lumberCost', 0)
+        return actionDict
+
+    def _getTravelTime(self, minSec, maxSec):
+        return self.mRng.randint(minSec * SECONDS_TO_SIMTIME, maxSec * SECONDS_TO_SIMTIME)
+
+    #Whether lumber can be spent without it becoming impossible to afford. Races that can gather it just need someone gathering it
+    def canAffordLumber(self, lumberCost):
+        if lumberCost == 0:
+            return True
+        if self.mRace in LUMBER_GATHERING_RACES and self.mNumLumberWorkers > 0:
+            return True
+        return self.mLumberSpent + lumberCost <= STARTING_LUMBER
+
+    #The engine doesn't check food yet, but a real build can't use more than it has. There's no food cap, so stress builds
+    #can go past a real game's 100 food
+    def hasFoodFor(self, foodCost):
+        return self.mFoodUsed + foodCost <= self.mFoodMax
+
+    def addWorkerMovement(self, trigger, currentWorkerTask, desiredWorkerTask):
+        workerName = self.mSpec['worker'][0]
+        self._addActionDict('WorkerMovementAction', trigger, workerName, travelTime = self._getTravelTime(1, 3),
+                            currentWorkerTask = currentWorkerTask, desiredWorkerTask = desiredWorkerTask, workerTimelineID = None)
+        if desiredWorkerTask == 'GOLD':
+            self.mNumGoldWorkers += 1
+        elif desiredWorkerTask == 'LUMBER':
+            self.mNumLumberWorkers += 1
+
+    #Train a worker, and send it to gather as soon as it's out. Gold first, until the mine is full
+    def addWorker(self):
+        workerName, goldCost, lumberCost, foodCost, duration = self.mSpec['worker']
+        self._addActionDict('BuildUnitAction', { 'triggerType' : 'ASAP' }, self.mSpec['hall'], name = workerName, duration = duration,
+                            goldCost = goldCost, lumberCost = lumberCost, foodCost = foodCost)
+        self.mNumWorkers += 1
+        self.mFoodUsed += foodCost
+
+        desiredWorkerTask = 'GOLD'
+        if self.mNumGoldWorkers >= MAX_GOLD_WORKERS and self.mRace in LUMBER_GATHERING_RACES:
+            desiredWorkerTask = 'LUMBER'
+        self.addWorkerMovement({ 'triggerType' : 'NEXT_WORKER_BUILT', 'value' : workerName }, 'IN_PRODUCTION', desiredWorkerTask)
+
+    #Build a structure with a worker taken off a resource. The worker goes back to that resource once it's done, like in a real build
+    #@return False if no worker can be spared
+    def addStructure(self, name, goldCost, lumberCost, foodProvided, duration):
+        #Only take a worker off gold if the mine has more than it needs, or if there's no lumber to take one from. Always leave
+        #someone on each resource, so the build can still afford what comes after
+        if self.mNumLumberWorkers > 1:
+            currentWorkerTask = 'LUMBER'
+            self.mNumLumberWorkers -= 1
+        elif self.mNumGoldWorkers > MAX_GOLD_WORKERS or (self.mRace not in LUMBER_GATHERING_RACES and self.mNumGoldWorkers > 1):
+            currentWorkerTask = 'GOLD'
+            self.mNumGoldWorkers -= 1
+        else:
+            return False
+
+        structureActionDict = self._addActionDict('BuildStructureAction', { 'triggerType' : 'ASAP' }, self.mSpec['worker'][0], name = name, duration = duration,
+                                                  travelTime = self._getTravelTime(2, 8), goldCost = goldCost, lumberCost = lumberCost,
+                                                  currentWorkerTask = currentWorkerTask, foodProvided = foodProvided, consumesWorker = False)
+        self.mFoodMax += foodProvided
+        self.addWorkerMovement({ 'triggerType' : 'PERCENT_OF_ONGOING_ACTION', 'value' : 100, 'actionID' : structureActionDict['actionID'] }, 'IDLE', currentWorkerTask)
+        return True
+
+    def addUnit(self, name, goldCost, lumberCost, foodCost, duration):
+        self._addActionDict('BuildUnitAction', { 'triggerType' : 'ASAP' }, self.mSpec['productionBuilding'][0], name = name, duration = duration,
+                            goldCost = goldCost, lumberCost = lumberCost, foodCost = foodCost)
+        self.mFoodUsed += foodCost
+
+    def addShopItem(self):
+        name, goldCost = self.mRng.choice(SHOP_ITEMS)
+        self._addActionDict('ShopAction', { 'triggerType' : 'ASAP' }, SHOP_TIMELINE_TYPE, name = name, goldCost = goldCost, travelTime = 0)
+
+    #Add the next step of the build. Steps are picked at random from the ones that still make sense
+    def addNextStep(self, numWorkers, numProductionBuildings):
+        foodBuilding = self.mSpec['foodBuilding']
+        productionBuilding = self.mSpec['productionBuilding']
+        affordableUnits = [unit for unit in self.mSpec['units'] if self.canAffordLumber(unit[2]) and self.hasFoodFor(unit[3])]
+
+        #A real build gets more food before it runs out
+        if self.mFoodMax - self.mFoodUsed < 4 and self.canAffordLumber(foodBuilding[2]) and self.addStructure(*foodBuilding):
+            return
+
+        steps = []
+        if self.mNumWorkers < numWorkers and self.hasFoodFor(self.mSpec['worker'][3]):
+            steps.append(self.addWorker)
+        if self.mNumProductionBuildings < numProductionBuildings and self.canAffordLumber(productionBuilding[2]):
+            steps.append(self._addProductionBuilding)
+        if self.mNumProductionBuildings > 0 and affordableUnits:
+            steps.append(lambda: self.addUnit(*self.mRng.choice(affordableUnits)))
+
+        #Steps return False if they couldn't be added after all. Then get another worker, or spend the gold on an item if there's nothing else to do
+        if steps and self.mRng.choice(steps)() != False:
+            return
+        if self.mNumWorkers < numWorkers and self.hasFoodFor(self.mSpec['worker'][3]):
+            self.addWorker()
+        else:
+            self.addShopItem()
+
+    def _addProductionBuilding(self):
+        if not self.addStructure(*self.mSpec['productionBuilding']):
+            return False
+        self.mNumProductionBuildings += 1
+        return True
+
+    #Roughly how long the build takes, from how much gold it spends and how fast its gold workers gather it
+    def getEstimatedDurationSec(self):
+        goldPerSec = min(self.mNumGoldWorkers, MAX_GOLD_WORKERS) * GOLD_PER_WORKER_PER_SEC
+        return self.mGoldSpent / goldPerSec if goldPerSec > 0 else 0
+
+#Generate a build order for one player
+#@param seed - Seed for the random choices. The same seed and knobs always give the same build
+#@param numActions - Number of actions in the build (before any added to reach durationSec)
+#@param numWorkers - Number of workers to have by the end, including the starting ones
+#@param numProductionBuildings - Number of production buildings to build
+#@param durationSec - If passed in, items are bought at the end of the build until it lasts roughly this long
+#@return { "race", "orderedActionList" }
+#The engine can't simulate Undead (it has no starting units for them) yet, so their builds are only useful for schema and request handling
+def generateBuildOrder(race, seed, numActions = 200, numWorkers = 30, numProductionBuildings = 4, durationSec = None):
+    state = _BuildGeneratorState(race, random.Random(str(seed) + ":" + race.name))
+    for i in range(NUM_STARTING_WORKERS):
+        state.addWorkerMovement({ 'triggerType' : 'ASAP' }, 'IDLE', 'GOLD')
+
+    while len(state.mActionDicts) < numActions:
+        state.addNextStep(numWorkers, numProductionBuildings)
+    if durationSec != None:
+        while state.getEstimatedDurationSec() < durationSec:
+            state.addShopItem()
+
+    return { 'race' : race.name, 'orderedActionList' : state.mActionDicts }
+
+#Generate a build order for each player of a team game. Each player gets its own seed from the team's
+#@return List of { "race", "orderedActionList" }, like the body of /simulation-results/timelines
+def generateTeamBuildOrders(races, seed, numActions = 200, numWorkers = 30, numProductionBuildings = 4, durationSec = None):
+    return [generateBuildOrder(race, str(seed) + ":" + str(i), numActions, numWorkers, numProductionBuildings, durationSec) for i, race in enumerate(races)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Print a generated build order list, as JSON that follows OrderedActionListSchema.json")
+    parser.add_argument("--race", default = "NIGHT_ELF", help = "Comma-separated races, one for each player: " + ", ".join(race.name for race in RACE_BUILD_SPECS))
+    parser.add_argument("--seed", default = "0", help = "Seed for the random choices")
+    parser.add_argument("--actions", type = int, default = 200, help = "Number of actions in each build")
+    parser.add_argument("--workers", type = int, default = 30, help = "Number of workers each build ends with")
+    parser.add_argument("--productionBuildings", type = int, default = 4, help = "Number of production buildings in each build")
+    parser.add_argument("--durationSec", type = int, help = "Buy items at the end of each build until it lasts roughly this long")
+    args = parser.parse_args()
+
+    races = [Race[raceName] for raceName in args.race.split(',')]
+    json.dump(generateTeamBuildOrders(races, args.seed, args.actions, args.workers, args.productionBuildings, args.durationSec), sys.stdout, indent = 4)
+    print()
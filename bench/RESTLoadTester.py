@@ -0,0 +1,129 @@
+from bench.BuildGenerator import generateTeamBuildOrders
+from SimEngine.SimulationConstants import Race
+
+import os
+import json
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+#Sends generated builds to /simulation-results/timelines from several threads at once, and reports the latency and throughput
+#Run from the main directory. Without --url, requests go to the app in this process through Flask's test client:
+#py -m bench.RESTLoadTester --requests 50 --threads 4 --races NIGHT_ELF,NIGHT_ELF,HUMAN,HUMAN
+#py -m bench.RESTLoadTester --url http://localhost:5000 --requests 200 --threads 16
+#The app in this process doesn't use its result cache unless given --result-cache, since every request after the first --bodies would be a cache hit
+
+TIMELINES_PATH = "/simulation-results/timelines"
+
+DEFAULT_LATENCY_PERCENTILES = [50, 90, 99]
+
+#Get the request bodies to send. Each one is a team's generated builds, with its own seed so the server can't just cache one result
+#@return List of JSON strings, like the body of /simulation-results/timelines
+def getRequestBodies(races, seed, numBodies, numActions, numWorkers, numProductionBuildings, durationSec = None):
+    return [json.dumps(generateTeamBuildOrders(races, str(seed) + ":" + str(i), numActions, numWorkers, numProductionBuildings, durationSec))
+            for i in range(numBodies)]
+
+#Import the REST app, to send requests to in this process. It's only imported when it's needed, since it sets up executors and the saved build store
+#@param useResultCache - Whether timelines requests are looked up in the app's result cache (WC3_RESULT_CACHE_FILE) and added to it.
+#Off by default, so requests are simulated rather than being cache hits, and nothing is written to the cache
+#@return The RestAPI.app module
+def importRESTApp(useResultCache = False):
+    if not useResultCache:
+        #Turned off before the app is imported, so the cache file isn't even opened
+        os.environ["WC3_RESULT_CACHE_MAX_MB"] = "0"
+    import RestAPI.app
+    if not useResultCache:
+        #In case the app was already imported
+        RestAPI.app.resultCache = None
+    return RestAPI.app
+
+#Get a function that sends a body to the app in this process, and returns the status code
+#Each thread gets its own test client
+#@param useResultCache - See importRESTApp
+def getTestClientSender(useResultCache = False):
+    app = importRESTApp(useResultCache).app
+    threadLocal = threading.local()
+
+    def send(body):
+        if not hasattr(threadLocal, 'client'):
+            threadLocal.client = app.test_client()
+        #The endpoint takes the action lists as a JSON string
+        return threadLocal.client.get(TIMELINES_PATH, json = body).status_code
+    return send
+
+#Get a function that sends a body to a running server, and returns the status code
+#@param url - Base URL of the server, like http://localhost:5000
+def getURLSender(url):
+    def send(body):
+        request = urllib.request.Request(url.rstrip('/') + TIMELINES_PATH, data = json.dumps(body).encode("utf-8"), method = 'GET',
+                                         headers = { 'Content-Type' : 'application/json' })
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return send
+
+#Send the bodies (cycling through them) from several threads at once
+#@param send - Function that sends a body and returns the status code (see getTestClientSender and getURLSender)
+#@return { "numRequests", "numFailed", "elapsedSec", "requestsPerSec", "latencyMs" : { <percentile> : <latency>, "mean", "max" } }
+#A request failed if it raised, or its status code was 400 or more
+def runLoadTest(send, requestBodies, numRequests, numThreads, percentiles = DEFAULT_LATENCY_PERCENTILES):
+    def sendTimed(body):
+        startTime = time.perf_counter()
+        try:
+            succeeded = send(body) < 400
+        except Exception as e:
+            print("Request failed -", e)
+            succeeded = False
+        return time.perf_counter() - startTime, succeeded
+
+    startTime = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = numThreads) as executor:
+        results = list(executor.map(sendTimed, (requestBodies[i % len(requestBodies)] for i in range(numRequests))))
+    elapsedSec = time.perf_counter() - startTime
+
+    latenciesMs = np.array([latencySec * 1000 for latencySec, succeeded in results])
+    latencyMs = { str(percentile) : float(value) for percentile, value in zip(percentiles, np.percentile(latenciesMs, percentiles)) }
+    latencyMs['mean'] = float(latenciesMs.mean())
+    latencyMs['max'] = float(latenciesMs.max())
+    return {
+        'numRequests' : numRequests,
+        'numFailed' : sum(1 for latencySec, succeeded in results if not succeeded),
+        'elapsedSec' : elapsedSec,
+        'requestsPerSec' : numRequests / elapsedSec,
+        'latencyMs' : latencyMs
+    }
+
+def formatResults(results):
+    latencies = ", ".join(("p" + name if name.isdigit() else name) + " {:.1f}".format(value) for name, value in results['latencyMs'].items())
+    return (str(results['numRequests']) + " requests (" + str(results['numFailed']) + " failed) in {:.2f}s, {:.1f} requests/s\n".format(results['elapsedSec'], results['requestsPerSec']) +
+            "Latency ms: " + latencies)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Load test /simulation-results/timelines with generated builds")
+    parser.add_argument("--url", help = "Base URL of a running server. Without it, requests go to the app in this process")
+    parser.add_argument("--requests", type = int, default = 50, help = "Number of requests to send")
+    parser.add_argument("--threads", type = int, default = 4, help = "Number of requests in flight at once")
+    parser.add_argument("--races", default = "NIGHT_ELF", help = "Comma-separated races of the builds in each request, one for each player")
+    parser.add_argument("--seed", default = "0", help = "Seed for the generated builds")
+    parser.add_argument("--bodies", type = int, default = 10, help = "Number of different request bodies to cycle through")
+    parser.add_argument("--actions", type = int, default = 100, help = "Number of actions in each build")
+    parser.add_argument("--workers", type = int, default = 20, help = "Number of workers each build ends with")
+    parser.add_argument("--productionBuildings", type = int, default = 2, help = "Number of production buildings in each build")
+    parser.add_argument("--durationSec", type = int, help = "Buy items at the end of each build until it lasts roughly this long")
+    parser.add_argument("--result-cache", action = "store_true", help = "Without --url, use the app's result cache (off by default, since most requests "
+                        "would be cache hits rather than simulations)")
+    parser.add_argument("--json", action = "store_true", help = "Print the results as JSON")
+    args = parser.parse_args()
+
+    races = [Race[raceName] for raceName in args.races.split(',')]
+    requestBodies = getRequestBodies(races, args.seed, args.bodies, args.actions, args.workers, args.productionBuildings, args.durationSec)
+    send = getURLSender(args.url) if args.url else getTestClientSender(args.result_cache)
+    results = runLoadTest(send, requestBodies, args.requests, args.threads)
+    print(json.dumps(results) if args.json else formatResults(results))
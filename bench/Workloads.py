@@ -0,0 +1,172 @@
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.SimulationEngine import SimulationEngine
+from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
+from Test.TestRealBuildOrders import executeStandardElfStart
+from Test.UniqueIDHandler import UniqueIDHandler
+from SimEngine.ResultCache import ResultCache
+from bench.BuildGenerator import generateBuildOrder
+from bench.RESTLoadTester import importRESTApp
+
+import io
+import os
+import sys
+import json
+import contextlib
+import tempfile
+import subprocess
+
+#Workloads for the benchmark runner. Each one is a representative thing the engine does, and reports how many events it executed,
+#since that's what most of the simulation time goes to
+
+HUNT_BUILD_FILE = 'Test/TestInput/HuntBuildSimulationInput.json'
+
+#Number of build orders in a 4v4 game
+TEAM_GAME_NUM_BUILD_ORDERS = 8
+
+#Length of the synthetic long games
+LONG_GAME_SIMTIME = 30 * 60 * SECONDS_TO_SIMTIME
+
+def loadHuntBuildOrderDict():
+    with open(HUNT_BUILD_FILE, 'r') as file:
+        return json.loads(file.read())[0]
+
+#Get the number of events executed (forwards or in reverse) by all of a team's build orders
+def getNumEventsExecuted(buildOrders):
+    return sum(len(buildOrder.mEventHandler.mEventsExecutedInOrder) for buildOrder in buildOrders)
+
+#Get the action dicts for a Human or Orc opening: every starting worker to gold, then a few more workers trained
+def _getGoldOpeningActionDicts(workerName, townHallName):
+    actionDicts = []
+    for i in range(5):
+        actionDicts.append({ 'actionType' : 'WorkerMovementAction', 'trigger' : { 'triggerType' : 'ASAP' }, 'actionID' : len(actionDicts), 'travelTime' : 10 + 2 * i,
+                             'requiredTimelineType' : workerName, 'currentWorkerTask' : 'IDLE', 'desiredWorkerTask' : 'GOLD', 'workerTimelineID' : None })
+    for i in range(5):
+        actionDicts.append({ 'actionType' : 'BuildUnitAction', 'trigger' : { 'triggerType' : 'ASAP' }, 'actionID' : len(actionDicts), 'name' : workerName,
+                             'duration' : 150, 'goldCost' : 75, 'lumberCost' : 0, 'requiredTimelineType' : townHallName, 'foodCost' : 1 })
+    return actionDicts
+
+class Workload:
+    #@param name - Name of the workload in results and baselines
+    #@param runFunc - Function that does the work once, and returns the number of events executed (or None if it can't tell)
+    def __init__(self, name, description, runFunc):
+        self.mName = name
+        self.mDescription = description
+        self.mRunFunc = runFunc
+
+    def run(self):
+        #Some workloads have builds that fail partway, which is printed. That's expected, and would drown out the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.mRunFunc()
+
+def _runHuntBuild():
+    buildOrder = BuildOrder.simulateBuildOrderFromDict(loadHuntBuildOrderDict())
+    return getNumEventsExecuted([buildOrder])
+
+#The standard Night Elf start from TestRealBuildOrders, then simulated until the first Huntress would be out
+def _runNightElfOpening():
+    buildOrder = BuildOrder(Race.NIGHT_ELF)
+    executeStandardElfStart(buildOrder, UniqueIDHandler(), 5)
+    buildOrder.simulate(156 * SECONDS_TO_SIMTIME)
+    return getNumEventsExecuted([buildOrder])
+
+def _runGoldOpening(race, workerName, townHallName):
+    buildOrder = BuildOrder.simulateBuildOrderFromDict({ 'race' : race.name, 'orderedActionList' : _getGoldOpeningActionDicts(workerName, townHallName) })
+    buildOrder.simulate(156 * SECONDS_TO_SIMTIME)
+    return getNumEventsExecuted([buildOrder])
+
+#The hunt build, then the rest of a 30 minute game with its workers still gathering
+def _runLongGame():
+    buildOrder = BuildOrder.simulateBuildOrderFromDict(loadHuntBuildOrderDict())
+    buildOrder.simulate(LONG_GAME_SIMTIME)
+    return getNumEventsExecuted([buildOrder])
+
+#A generated build, much bigger than any of the real ones. The build is generated outside of the timing, since it's always the same
+def _getSyntheticRunFunc(race, seed, **knobs):
+    buildOrderDict = generateBuildOrder(race, seed, **knobs)
+    def runSyntheticBuild():
+        buildOrder = BuildOrder.simulateBuildOrderFromDict(buildOrderDict)
+        return getNumEventsExecuted([buildOrder])
+    return runSyntheticBuild
+
+def _runTeamGame():
+    simEngine = SimulationEngine()
+    simEngine.loadStateFromActionLists([loadHuntBuildOrderDict()] * TEAM_GAME_NUM_BUILD_ORDERS)
+    simEngine.getJSONStateAsTimelines(pretty = False)
+    return getNumEventsExecuted(simEngine.getTeamBuildOrders())
+
+#The app's result cache is off (see importRESTApp), so the rest_* workloads time simulating rather than cache hits, and don't write to
+#the user's cache
+def _getTestClient():
+    return importRESTApp().app.test_client()
+
+#@param resultCache - ResultCache for the app to use for the request, or None to simulate it
+def _runRESTTimelines(resultCache = None):
+    restApp = importRESTApp()
+    restApp.resultCache = resultCache
+    try:
+        #The endpoint takes the action lists as a JSON string
+        response = restApp.app.test_client().get("/simulation-results/timelines", json = json.dumps([loadHuntBuildOrderDict()]))
+    finally:
+        restApp.resultCache = None
+    if response.status_code != 200:
+        raise RuntimeError("Timelines request failed with status " + str(response.status_code))
+    return None
+
+#rest_timelines with a result cache in a temp directory. It's made by the first (warm up) run, which puts the timelines in it, so the
+#timed runs are cache hits
+def _getRESTTimelinesCachedRunFunc():
+    cacheState = {}
+    def runRESTTimelinesCached():
+        if 'resultCache' not in cacheState:
+            cacheState['tempDir'] = tempfile.TemporaryDirectory()
+            cacheState['resultCache'] = ResultCache(os.path.join(cacheState['tempDir'].name, "ResultCache.db"))
+        return _runRESTTimelines(cacheState['resultCache'])
+    return runRESTTimelinesCached
+
+#Create a session, append an action to it and get its timelines, like an editor would
+def _runRESTSession():
+    client = _getTestClient()
+    huntBuildOrderDict = loadHuntBuildOrderDict()
+    orderedActionList = huntBuildOrderDict['orderedActionList']
+    response = client.post("/sessions", json = json.dumps([dict(huntBuildOrderDict, orderedActionList = orderedActionList[:-1])]))
+    if response.status_code != 201:
+        raise RuntimeError("Session request failed with status " + str(response.status_code))
+    sessionID = response.get_json()['sessionID']
+    for response in [client.patch("/sessions/" + sessionID + "/actions", json = { 'op' : 'append', 'action' : orderedActionList[-1] }),
+                     client.get("/sessions/" + sessionID + "/timelines"),
+                     client.delete("/sessions/" + sessionID)]:
+        if response.status_code >= 400:
+            raise RuntimeError("Session request failed with status " + str(response.status_code))
+    return None
+
+#Start a new interpreter and import a module, like a CLI or worker process starting up. It has to be a new process, since this one
+#has already imported everything
+def _getStartupRunFunc(moduleName):
+    def runStartup():
+        subprocess.run([sys.executable, "-c", "import " + moduleName], check = True)
+        return None
+    return runStartup
+
+WORKLOADS = [
+    Workload("hunt_build", "Simulate the hunt build from Test/TestInput", _runHuntBuild),
+    Workload("opening_night_elf", "Standard Night Elf opening, simulated for 2.5 minutes", _runNightElfOpening),
+    Workload("opening_orc", "Peons to gold and more peons trained, simulated for 2.5 minutes", lambda: _runGoldOpening(Race.ORC, "Peon", "Great Hall")),
+    Workload("opening_human", "Peasants to gold and more peasants trained, simulated for 2.5 minutes", lambda: _runGoldOpening(Race.HUMAN, "Peasant", "Town Hall")),
+    Workload("long_game_30min", "The hunt build, then simulated to 30 minutes", _runLongGame),
+    Workload("team_game_4v4", "Eight hunt builds simulated together and encoded as timelines JSON", _runTeamGame),
+    Workload("synthetic_night_elf", "Generated Night Elf build with 200 actions, 30 workers and 4 production buildings",
+             _getSyntheticRunFunc(Race.NIGHT_ELF, 0, numActions = 200, numWorkers = 30, numProductionBuildings = 4)),
+    Workload("synthetic_night_elf_hour", "Generated Night Elf build with 100 actions, then items bought until it lasts an hour",
+             _getSyntheticRunFunc(Race.NIGHT_ELF, 0, numActions = 100, numWorkers = 30, numProductionBuildings = 4, durationSec = 3600)),
+    Workload("synthetic_human", "Generated Human build with 60 actions", _getSyntheticRunFunc(Race.HUMAN, 0, numActions = 60, numWorkers = 15)),
+    Workload("rest_timelines", "Round trip of the hunt build through /simulation-results/timelines", _runRESTTimelines),
+    Workload("rest_timelines_cached", "Round trip of the hunt build through /simulation-results/timelines, found in the result cache",
+             _getRESTTimelinesCachedRunFunc()),
+    Workload("rest_session", "Create a session, append an action, get its timelines and delete it", _runRESTSession),
+    Workload("startup_engine", "Start Python and import the engine, like a worker process", _getStartupRunFunc("SimEngine.BuildOrder")),
+    Workload("startup_batch_cli", "Start Python and import the batch simulator in main.py", _getStartupRunFunc("main")),
+    Workload("startup_rest_app", "Start Python and import the REST app", _getStartupRunFunc("RestAPI.app"))
+]
+
+def getWorkload(name):
+    return next((workload for workload in WORKLOADS if workload.mName == name), None)
@@ -1,17 +1,217 @@
 from SimEngine.SimulationConstants import Race, SECONDS_TO_SIMTIME
-from SimEngine.SimulationEngine import SimulationEngine
+from SimEngine.BuildOrder import BuildOrder
+from SimEngine.Action import Action
+from SimEngine.JSONEncoding import encodeJSON
+from SimEngine.Profiler import profileCall, PROFILER_TYPES
+from SimEngine.BuildFiles import iterBuilds
 
-def main():
-    simEngine = SimulationEngine()
-    simEngine.newBuildOrder([Race.NIGHT_ELF])
+import io
+import os
+import json
+import sys
+import time
+import argparse
+import contextlib
+import collections
+
+#Simulates builds in bulk, for offline analysis and throughput testing. Doesn't need Flask or anything else from the REST API
+#Each input is a build file (a list of build orders like the body of /simulation-results/timelines, or a single build order), a directory
+#of them, or a JSONL file with one on each line ("-" reads JSONL from stdin). Run from the main directory:
+#py main.py Test/TestInput/HuntBuildSimulationInput.json                              Print a summary line for the build
+#py main.py SavedBuilds --jobs 8 --until 600 --format timelines --outputDir Timelines  Write the timelines of every build in a directory
+#py main.py builds.jsonl --profile sample --profileOutput builds.collapsed             Profile simulating the builds, as collapsed stacks
+#py main.py builds.jsonl --openingBook OpeningBook.pickle                              Simulate builds that start with a book opening from there
+#py main.py builds.jsonl --format timelines --resultCache ResultCache.db               Reuse timelines simulated by earlier runs (or the REST service)
+
+OUTPUT_FORMATS = ["summary", "timelines"]
+
+#Number of builds submitted to the worker processes ahead of the one being written, so a long JSONL stream isn't all read into memory
+MAX_JOBS_IN_FLIGHT_PER_WORKER = 4
+
+#Opening book file -> the book loaded from it, so each process only loads a book once
+_openingBooksByFile = {}
+
+def _getOpeningBook(openingBookFile):
+    if openingBookFile not in _openingBooksByFile:
+        #Only imported when there's a book, like the other modules that aren't needed to just simulate
+        from SimEngine.OpeningBook import OpeningBook
+        _openingBooksByFile[openingBookFile] = OpeningBook.load(openingBookFile)
+    return _openingBooksByFile[openingBookFile]
+
+#Result cache file -> the cache, so each process only opens a cache once
+_resultCachesByFile = {}
+
+def _getResultCache(resultCacheFile):
+    if resultCacheFile not in _resultCachesByFile:
+        from SimEngine.ResultCache import ResultCache
+        _resultCachesByFile[resultCacheFile] = ResultCache(resultCacheFile)
+    return _resultCachesByFile[resultCacheFile]
+
+#Simulate each of a build's build orders
+#@return (the build orders, their summaries)
+def _simulateBuildOrders(teamBuildOrdersList, untilSimTime, openingBookFile):
+    openingBook = _getOpeningBook(openingBookFile) if openingBookFile != None else None
+    buildOrders = []
+    summaries = []
+    for buildOrderDict in teamBuildOrdersList:
+        race = Race[buildOrderDict['race']]
+        actions = [Action.getActionFromDict(actionDict) for actionDict in buildOrderDict['orderedActionList']]
+        buildOrder, numActionsFromOpeningBook = openingBook.getBuildOrderForActions(race, actions) if openingBook != None else (None, 0)
+        if buildOrder == None:
+            buildOrder = BuildOrder(race)
+        #Builds that fail partway are reported in the summary, so don't print why
+        with contextlib.redirect_stdout(io.StringIO()):
+            succeeded = buildOrder.simulateOrderedActionList(actions[numActionsFromOpeningBook:])
+            if untilSimTime != None and untilSimTime > buildOrder.getCurrentSimTime():
+                buildOrder.simulate(untilSimTime)
+        buildOrders.append(buildOrder)
+        summaries.append({ 'race' : buildOrder.mRace.name, 'numActions' : len(actions), 'numActionsFromOpeningBook' : numActionsFromOpeningBook,
+                           'simulationSucceeded' : succeeded,
+                           'endTime' : buildOrder.getEndTime(), 'currentSimTime' : buildOrder.getCurrentSimTime(),
+                           'currentResources' : buildOrder.getCurrentResources().getAsDictForSerialization() })
+    return buildOrders, summaries
+
+def _getTimelinesJSON(buildOrders, pretty):
+    return encodeJSON([buildOrder.getSimTimeAndTimelinesAsDictForSerialization() for buildOrder in buildOrders], pretty)
 
-    for i in range(1, 121):
-        simEngine.simulate(i * SECONDS_TO_SIMTIME)
-        print("Time:", i, "seconds")
-        simEngine.mBuildOrder.getCurrentResources().print()
+#Get a build's compact timelines JSON from the result cache, or simulate them and add them to it
+def _getCachedTimelinesJSON(resultCacheFile, teamBuildOrdersList, untilSimTime, openingBookFile):
+    from SimEngine.ResultCache import getResultKey, compressTimelines, decompressTimelines
+    resultCache = _getResultCache(resultCacheFile)
+    #Full timelines of builds that aren't simulated any further share their entries with the REST service's
+    resultKey = getResultKey(teamBuildOrdersList, { 'untilSimTime' : untilSimTime } if untilSimTime != None else None)
+    compressedTimelines = resultCache.get(resultKey)
+    if compressedTimelines != None:
+        return decompressTimelines(compressedTimelines)
+    timelinesJSON = _getTimelinesJSON(_simulateBuildOrders(teamBuildOrdersList, untilSimTime, openingBookFile)[0], False)
+    resultCache.put(resultKey, compressTimelines(timelinesJSON))
+    return timelinesJSON
+
+#Simulate a build. Module-level, so it can run in a worker process
+#@param untilSimTime - If not None, keep simulating each build order until this simtime after its actions are done
+#@param openingBookFile - If not None, build orders that start with one of this book's openings are simulated from there (see SimEngine/OpeningBook.py)
+#@param resultCacheFile - If not None, timelines are looked up in this result cache before simulating, and added to it after (see
+#SimEngine/ResultCache.py). Not used for summaries, which are of the simulation itself
+#@return { "name", "output" : <the output str>, "error" : <why the build couldn't be simulated, or None> }
+#Summaries are { "name", "elapsedSec", "buildOrders" : [{ "race", "numActions", "numActionsFromOpeningBook", "simulationSucceeded", "endTime",
+#"currentSimTime", "currentResources" }, ...] }
+def simulateBuild(name, teamBuildOrdersList, untilSimTime, outputFormat, pretty, openingBookFile = None, resultCacheFile = None):
+    startTime = time.perf_counter()
+    try:
+        if outputFormat == "timelines" and resultCacheFile != None:
+            output = _getCachedTimelinesJSON(resultCacheFile, teamBuildOrdersList, untilSimTime, openingBookFile)
+            if pretty:
+                output = encodeJSON(json.loads(output), pretty)
+            return { 'name' : name, 'output' : output, 'error' : None }
+        buildOrders, summaries = _simulateBuildOrders(teamBuildOrdersList, untilSimTime, openingBookFile)
+    except Exception as e:
+        return { 'name' : name, 'output' : None, 'error' : type(e).__name__ + ": " + str(e) }
+
+    if outputFormat == "timelines":
+        output = _getTimelinesJSON(buildOrders, pretty)
+    else:
+        output = encodeJSON({ 'name' : name, 'elapsedSec' : time.perf_counter() - startTime, 'buildOrders' : summaries }, False)
+    return { 'name' : name, 'output' : output, 'error' : None }
+
+#Simulate every build, in worker processes if there's an executor, and yield the results in the same order as the builds
+def iterSimulatedBuilds(builds, untilSimTime, outputFormat, pretty, executor = None, maxJobsInFlight = 1, openingBookFile = None, resultCacheFile = None):
+    if executor == None:
+        for name, teamBuildOrdersList in builds:
+            yield simulateBuild(name, teamBuildOrdersList, untilSimTime, outputFormat, pretty, openingBookFile, resultCacheFile)
+        return
+
+    futures = collections.deque()
+    for name, teamBuildOrdersList in builds:
+        futures.append(executor.submit(simulateBuild, name, teamBuildOrdersList, untilSimTime, outputFormat, pretty, openingBookFile, resultCacheFile))
+        if len(futures) >= maxJobsInFlight:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+#Write the results of simulating the builds
+#To stdout, summaries are one JSON line each, and timelines are one { "name", "timelines" } JSON line each
+#To an output directory, summaries go in summary.jsonl, and timelines go in <name>.timelines.json
+#@return (number of builds, number of builds that couldn't be simulated)
+def writeResults(results, outputFormat, outputDir = None):
+    numBuilds = 0
+    numErrors = 0
+    summaryFile = None
+    if outputDir != None:
+        os.makedirs(outputDir, exist_ok = True)
+        if outputFormat == "summary":
+            summaryFile = open(os.path.join(outputDir, "summary.jsonl"), 'w')
+    try:
+        for result in results:
+            numBuilds += 1
+            if result['error'] != None:
+                numErrors += 1
+                print("Could not simulate " + result['name'] + " - " + result['error'], file = sys.stderr)
+                continue
+
+            if outputFormat == "summary":
+                (summaryFile or sys.stdout).write(result['output'] + "\n")
+            elif outputDir != None:
+                #Names of builds in JSONL have a colon, which can't be in file names on Windows
+                with open(os.path.join(outputDir, result['name'].replace(":", "_") + ".timelines.json"), 'w') as file:
+                    file.write(result['output'])
+            else:
+                sys.stdout.write('{"name":' + encodeJSON(result['name'], False) + ',"timelines":' + result['output'] + "}\n")
+    finally:
+        if summaryFile != None:
+            summaryFile.close()
+    return numBuilds, numErrors
+
+#Simulate and write every build in the inputs
+#@param jobs - Number of worker processes. 1 simulates everything in this process
+#@return (number of builds, number of builds that couldn't be simulated)
+#@param openingBookFile - If not None, simulate build orders that start with one of this book's openings from there
+#@param resultCacheFile - If not None, reuse the timelines in this result cache, and add the ones simulated to it
+def runBatch(inputPaths, jobs = 1, untilSec = None, outputFormat = "summary", compact = False, outputDir = None, openingBookFile = None, resultCacheFile = None):
+    untilSimTime = round(untilSec * SECONDS_TO_SIMTIME) if untilSec != None else None
+    #Timelines on stdout have to be compact, since there's one build on each line
+    pretty = not compact and outputDir != None
+    builds = iterBuilds(inputPaths)
+    if jobs <= 1:
+        return writeResults(iterSimulatedBuilds(builds, untilSimTime, outputFormat, pretty, openingBookFile = openingBookFile,
+                                                resultCacheFile = resultCacheFile), outputFormat, outputDir)
+    #Only imported when needed, since multiprocessing is slow to import and a single job doesn't need it
+    from SimEngine.WorkerPool import createProcessPoolExecutor
+    with createProcessPoolExecutor(jobs) as executor:
+        return writeResults(iterSimulatedBuilds(builds, untilSimTime, outputFormat, pretty, executor, jobs * MAX_JOBS_IN_FLIGHT_PER_WORKER, openingBookFile,
+                                                resultCacheFile), outputFormat, outputDir)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Simulate build files, directories of them or JSONL streams of them, and write their summaries or timelines")
+    parser.add_argument("inputs", nargs = "+", help = "Build files (.json), JSONL files (.jsonl) with a build on each line, directories of either, or - for JSONL on stdin")
+    parser.add_argument("--jobs", type = int, default = os.cpu_count() or 1, help = "Number of worker processes (default the number of CPUs)")
+    parser.add_argument("--until", type = float, help = "Keep simulating each build until this many seconds of game time, after its actions are done")
+    parser.add_argument("--format", choices = OUTPUT_FORMATS, default = "summary", help = "Write a summary line for each build, or its timelines")
+    parser.add_argument("--compact", action = "store_true", help = "Write timeline files as compact JSON instead of indented")
+    parser.add_argument("--outputDir", help = "Write to files in this directory instead of stdout")
+    parser.add_argument("--openingBook", help = "Opening book file (see SimEngine/OpeningBook.py). Builds that start with one of its openings are simulated from there")
+    parser.add_argument("--resultCache", help = "Result cache file (see SimEngine/ResultCache.py), shared with the REST service and other runs. "
+                        "Timelines already in it aren't simulated again, and the ones simulated are added. Summaries don't use it")
+    parser.add_argument("--profile", choices = PROFILER_TYPES, help = "Profile the simulations and write collapsed stacks, instead of using worker processes")
+    parser.add_argument("--profileOutput", help = "File to write the collapsed stacks to (default stderr)")
+    args = parser.parse_args()
 
-    simEngine.printScheduledEvents()
+    startTime = time.perf_counter()
+    run = lambda jobs: runBatch(args.inputs, jobs, args.until, args.format, args.compact, args.outputDir, args.openingBook, args.resultCache)
+    if args.profile:
+        #Worker processes wouldn't be profiled, so simulate everything in this process
+        (numBuilds, numErrors), collapsedStacks = profileCall(lambda: run(1), args.profile)
+        if args.profileOutput:
+            with open(args.profileOutput, 'w') as file:
+                file.write(collapsedStacks)
+        else:
+            sys.stderr.write(collapsedStacks)
+    else:
+        numBuilds, numErrors = run(args.jobs)
 
+    elapsedSec = time.perf_counter() - startTime
+    print("Simulated " + str(numBuilds - numErrors) + " of " + str(numBuilds) + " builds in {:.2f}s ({:.1f} builds/s)".format(elapsedSec, numBuilds / elapsedSec if elapsedSec > 0 else 0),
+          file = sys.stderr)
+    sys.exit(1 if numErrors > 0 else 0)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file